@@ -21,6 +21,8 @@ interface TxItem {
   docs_link?: string;
 }
 
+const PAGE_SIZE = 20;
+
 export default function SurveyorPage() {
   const [query, setQuery] = useState("");
   const [email, setEmail] = useState<string>("");
@@ -29,6 +31,9 @@ export default function SurveyorPage() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string>("");
   const [busy, setBusy] = useState<string | null>(null);
+  const [token, setToken] = useState<string>("");
+  const [hasMore, setHasMore] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     // Auto-fill saved surveyor email
@@ -57,27 +62,50 @@ export default function SurveyorPage() {
       if (!res.success) { setError(res.message || 'Not a surveyor'); return; }
       setProfile(res.profile || { email });
       try { localStorage.setItem('surveyorEmail', email.trim()); } catch {}
-      await loadPending(email.trim());
+      setToken(res.token || '');
+      await loadPending(res.token || '');
     } catch (e: any) {
       setError(e?.message || 'Login failed');
     }
   }
 
-  async function loadPending(em: string) {
+  async function loadPending(token: string) {
     setLoading(true); setError("");
     try {
-      const res = await apiClient.listSurveyorPending(em);
-      if (res.success) setItems(res.transactions || []);
+      const res = await apiClient.listSurveyorPending(token, 1, PAGE_SIZE);
+      if (res.success) {
+        setItems(res.transactions || []);
+        setHasMore(!!res.has_more);
+      }
       else setError(res.message || 'Failed to load');
     } catch (e: any) { setError(e?.message || 'Failed to load'); }
     finally { setLoading(false); }
   }
 
+  async function loadMore() {
+    // Approved items leave the queue, so the next unseen item sits at offset items.length:
+    // fetch the page containing it and skip the ones already shown.
+    setLoadingMore(true); setError("");
+    try {
+      const page = Math.floor(items.length / PAGE_SIZE) + 1;
+      const res = await apiClient.listSurveyorPending(token, page, PAGE_SIZE);
+      if (res.success) {
+        setItems(prev => {
+          const seen = new Set(prev.map(i => i.id));
+          return [...prev, ...(res.transactions || []).filter((t: TxItem) => !seen.has(t.id))];
+        });
+        setHasMore(!!res.has_more);
+      }
+      else setError(res.message || 'Failed to load');
+    } catch (e: any) { setError(e?.message || 'Failed to load'); }
+    finally { setLoadingMore(false); }
+  }
+
   async function approve(txId: string) {
     if (!profile?.email) return;
     setBusy(txId);
     try {
-      const resp = await apiClient.surveyorApprove(txId, profile.email);
+      const resp = await apiClient.surveyorApprove(txId, token);
       if (resp.success) {
         setItems(prev => prev.filter(i => i.id !== txId));
       } else {
@@ -181,6 +209,15 @@ export default function SurveyorPage() {
                 ))}
               </div>
             )}
+
+            {!loading && hasMore && (
+              <div className="flex justify-center">
+                <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </Button>
+              </div>
+            )}
+            {error && <div className="text-sm text-red-500">{error}</div>}
           </CardContent>
         </Card>
       )}
@@ -78,6 +78,14 @@ export class ApiClient {
     return this.request<MarketplaceResponse>('/api/property/marketplace/');
   }
 
+  async searchMarketplace(query: { q?: string; min_price?: number; max_price?: number; min_area?: number; max_area?: number; category?: string; sort?: string; page?: number; page_size?: number }) {
+    const params = new URLSearchParams();
+    Object.entries(query).forEach(([key, value]) => {
+      if (value !== undefined && value !== '') params.set(key, String(value));
+    });
+    return this.request<{ success: boolean; results: any[]; total: number; page: number; page_size: number; has_more: boolean; message?: string }>(`/api/property/marketplace/search/?${params.toString()}`);
+  }
+
   async unlistProperty(property_id: string) {
     return this.request<{ success: boolean; message?: string }>(`/api/property/unlist-property/`, {
       method: 'POST',
@@ -148,10 +156,11 @@ export class ApiClient {
     });
   }
 
-  async surveyorApprove(transaction_id: string, surveyor_email: string, report_url?: string) {
+  async surveyorApprove(transaction_id: string, token: string, report_url?: string) {
     return this.request<TxResponse>('/api/property/transactions/surveyor-approve/', {
       method: 'POST',
-      body: JSON.stringify({ transaction_id, surveyor_email, report_url }),
+      headers: { Authorization: `Bearer ${token}` },
+      body: JSON.stringify({ transaction_id, report_url }),
     });
   }
 
@@ -175,16 +184,17 @@ export class ApiClient {
 
   // Surveyor APIs
   async loginSurveyor(email: string) {
-    return this.request<{ success: boolean; profile?: any; message?: string }>('/api/property/surveyor/login/', {
+    return this.request<{ success: boolean; profile?: any; token?: string; message?: string }>('/api/property/surveyor/login/', {
       method: 'POST',
       body: JSON.stringify({ email }),
     });
   }
 
-  async listSurveyorPending(email: string) {
-    return this.request<{ success: boolean; transactions: any[]; count: number; message?: string }>('/api/property/surveyor/pending/', {
+  async listSurveyorPending(token: string, page: number = 1, page_size: number = 20) {
+    return this.request<{ success: boolean; transactions: any[]; count: number; page?: number; has_more?: boolean; message?: string }>('/api/property/surveyor/pending/', {
       method: 'POST',
-      body: JSON.stringify({ email }),
+      headers: { Authorization: `Bearer ${token}` },
+      body: JSON.stringify({ page, page_size }),
     });
   }
 }
@@ -1,13 +1,17 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-import json, random
+from django.conf import settings
+import json, logging, random
 
 from project.utils.cloudant_client import find_user_by_aadhaar, find_user_by_pan
 from project.utils.mailer import send_otp_email
+from project.utils import login_prefetch
 
 
 from django.shortcuts import render
 
+logger = logging.getLogger(__name__)
+
 def test_form(request):
     return render(request, "form.html")
 
@@ -41,7 +45,7 @@ def verify_aadhaar_pan(request):
         email_key = email.strip().lower() if email else ""
         OTP_STORE[email_key] = otp
 
-        # Try to send OTP via email; if it fails, still print to console for dev
+        # Try to send OTP via email; if it fails, still log it in DEBUG for dev
         try:
             from project.utils.mailer import render_otp_html
             user_name = user.get("Name") or email.split('@')[0]
@@ -56,7 +60,9 @@ def verify_aadhaar_pan(request):
             html_body=html,
         )
         if not sent:
-            print(f"DEBUG OTP for {email}: {otp}")
+            logger.warning("OTP email to %s could not be queued", email)
+            if settings.DEBUG:
+                logger.info("DEBUG OTP for %s: %s", email, otp)
 
         return JsonResponse ({"success": True, "message": "OTP sent", "email": email})
 
@@ -73,13 +79,12 @@ def verify_otp(request):
         email_key = email.strip().lower() if email else ""
         otp_str = str(otp).strip() if otp else ""
 
-        print(f"DEBUG TRYING TO VERIFY:")
-        print(f"Incoming Email Key: '{email_key}'")
-        print(f"Incoming OTP: '{otp_str}'")
-        print(f"Current OTP_STORE: {OTP_STORE}")
+        logger.debug("Verifying OTP for %s", email_key)
 
         if email_key in OTP_STORE and OTP_STORE[email_key] == otp_str:
             del OTP_STORE[email_key]  # ek bar use hone ke baad hata do
+            # Warm the dashboard's first requests (profile, properties, chats)
+            login_prefetch.prefetch(email.strip())
             return JsonResponse({"success": True, "message": "OTP verified"})
         else:
             return JsonResponse({"success": False, "message": "Invalid OTP"})
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 from decouple import config
+from corsheaders.defaults import default_headers
+from project.utils.log import parse_levels
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -52,15 +54,23 @@ CLOUDANT = {
 }
 
 MIDDLEWARE = [
+    'project.utils.tracing.TracingMiddleware',
+    'project.utils.log.RequestLogMiddleware',
+    'project.utils.metrics.MetricsMiddleware',
+    'project.utils.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',  
 
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    # Body-hash ETags + 304s for GETs; views with a cheaper version set their own ETag first
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last: it runs @idempotent views itself, after every other process_view hook
+    'project.utils.idempotency.IdempotencyMiddleware',
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -69,6 +79,7 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
 ROOT_URLCONF = 'project.urls'
 
 TEMPLATES = [
@@ -154,3 +165,34 @@ EMAIL_TIMEOUT = 15  # seconds, to avoid long hangs if SMTP is unreachable
 
 # For development, you can also use console backend to test without actual email
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Structured logging: JSON lines written from a background queue listener.
+# LOG_LEVEL sets the default, LOG_LEVELS="property.chat_views=DEBUG,project.utils=WARNING"
+# overrides per module, LOG_DEBUG_SAMPLE_RATE keeps a fraction of DEBUG records.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_context': {'()': 'project.utils.log.RequestContextFilter'},
+        'debug_sampling': {
+            '()': 'project.utils.log.SamplingFilter',
+            'rate': config('LOG_DEBUG_SAMPLE_RATE', default=1.0, cast=float),
+        },
+    },
+    'formatters': {
+        'json': {'()': 'project.utils.log.JsonFormatter'},
+    },
+    'handlers': {
+        'async_json': {
+            'class': 'project.utils.log.AsyncQueueHandler',
+            'formatter': 'json',
+            'filters': ['request_context', 'debug_sampling'],
+        },
+    },
+    'root': {'handlers': ['async_json'], 'level': config('LOG_LEVEL', default='INFO')},
+    'loggers': {
+        'django': {'handlers': ['async_json'], 'level': 'INFO', 'propagate': False},
+        'django.server': {'handlers': ['async_json'], 'level': 'INFO', 'propagate': False},
+        **parse_levels(config('LOG_LEVELS', default='')),
+    },
+}
@@ -17,8 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path , include
 from . import urls
+from .utils.metrics import metrics_view
+from .utils.query_stats import query_stats_view
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('authentication.urls')),
     path('api/property/', include('property.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('query-stats', query_stats_view, name='query_stats'),
 ]
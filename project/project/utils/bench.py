@@ -0,0 +1,281 @@
+"""
+Endpoint load-testing helpers.
+
+Drives the real Django URL routes in-process (django.test.Client) against the
+SQLite PostgREST stand-in, so latency, throughput and backend calls per request
+can be measured and compared run-to-run without Supabase, SMTP or the mint service.
+Used by the `bench_endpoints` management command.
+"""
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from django.core import mail
+from django.test import Client
+from django.test.utils import override_settings
+
+from project.utils import (cloudant_client, idempotency, login_prefetch, market_stats, marketplace_snapshot,
+                           owner_directory, query_stats, resilience, search_index, transaction_analytics,
+                           transaction_log)
+from project.utils.synthetic_data import generate_dataset
+
+SURVEYOR_EMAIL = "surveyor@bench.local"
+SURVEYOR_AADHAAR = "568945895487"  # matches transaction_views.SURVEYOR_AADHAAR_OVERRIDE
+
+
+def seed_bench_data(stub, users=50, properties=200, listed_ratio=0.5, chats_per_user=3, txs_per_user=2, seed=42):
+    """
+    Load a small deterministic dataset straight into the stub (see synthetic_data).
+    Returns the tracked keys (emails, wallets, owners, listed ids) for scenario generators.
+    """
+    return generate_dataset(
+        stub.load_rows,
+        citizens=users,
+        app_users=users,
+        surveyors=0,
+        properties=properties,
+        listed_ratio=listed_ratio,
+        chats=users * chats_per_user,
+        max_messages=10,
+        transactions=users * txs_per_user,
+        seed=seed,
+        domain="bench.local",
+        extra_citizens=[{"email": SURVEYOR_EMAIL, "name": "Bench Surveyor", "aadhaar": SURVEYOR_AADHAAR, "role": "SURVEYOR"}],
+        track=True,
+    )
+
+
+def reset_read_models():
+    """Drop every in-process read model and cache, so each suite starts cold on its fresh data."""
+    transaction_log.projections.reset()
+    transaction_analytics.analytics.reset()
+    marketplace_snapshot.snapshot.reset()
+    search_index.index.reset()
+    market_stats.stats.reset()
+    owner_directory.directory.clear()
+    login_prefetch.clear()
+    resilience.last_good.clear()
+    resilience.get_breaker("postgrest").reset()
+    idempotency.reset_store()
+    query_stats.reset()
+
+
+# --- scenarios: each takes (client, rng, dataset) and returns a list of (step, status),
+#     or None when the iteration has nothing to measure ---
+
+def _post(client, path, payload):
+    return client.post(path, data=json.dumps(payload), content_type="application/json")
+
+
+def scenario_marketplace(client, rng, ds):
+    return [("marketplace", client.get("/api/property/marketplace/").status_code)]
+
+
+def scenario_user_properties(client, rng, ds):
+    w = rng.choice(ds["wallets"])
+    return [("user-properties", client.get("/api/property/user-properties/", {"wallet_address": w}).status_code)]
+
+
+def scenario_user_chats(client, rng, ds):
+    email = rng.choice(ds["emails"])
+    return [("user-chats", _post(client, "/api/property/chats/user-chats/", {"user_email": email}).status_code)]
+
+
+def scenario_transactions_list(client, rng, ds):
+    email = rng.choice(ds["emails"])
+    return [("transactions-list", _post(client, "/api/property/transactions/list/", {"user_email": email}).status_code)]
+
+
+def scenario_surveyor_queue(client, rng, ds):
+    from project.utils.session_tokens import issue_token
+
+    token = issue_token(SURVEYOR_EMAIL, "SURVEYOR")
+    r = client.post("/api/property/surveyor/pending/", data=json.dumps({"page": 1, "page_size": 20}),
+                    content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {token}")
+    return [("surveyor-queue", r.status_code)]
+
+
+def scenario_price_check(client, rng, ds):
+    pid = rng.choice(list(ds["owners"]))
+    r = client.get("/api/property/marketplace/price-check/", {"property_id": pid, "price": rng.randint(100000, 5000000)})
+    return [("price-check", r.status_code)]
+
+
+_transferable_lock = threading.Lock()
+
+
+def scenario_transfer_flow(client, rng, ds):
+    """initiate -> seller OTP -> buyer OTP -> surveyor approval -> buyer agreement."""
+    from project.utils.session_tokens import issue_token
+    from property import transaction_views as tv
+
+    # A property can only be in one live transfer at a time and the flow leaves its transfer
+    # open, so each property is used once; when none is left the iteration is skipped
+    with _transferable_lock:
+        free = ds.setdefault("transferable", [p for p in (ds["listed"] or list(ds["owners"]))
+                                              if p not in ds["in_transfer"]])
+        if not free:
+            return None
+        pid = free.pop(rng.randrange(len(free)))
+    seller = ds["owners"][pid]
+    buyer = (seller + 1 + rng.randrange(ds["users"] - 1)) % ds["users"]
+    se, be = ds["emails"][seller], ds["emails"][buyer]
+    steps = []
+
+    r = _post(client, "/api/property/transactions/initiate/", {"property_id": pid, "seller_email": se, "buyer_email": be})
+    if r.status_code == 409:
+        return None  # a transfer the dataset did not track is still live: expected, not measured
+    steps.append(("initiate", r.status_code))
+    tx_id = (r.json().get("transaction") or {}).get("id") if r.status_code == 200 else None
+    if not tx_id:
+        return steps
+    r = _post(client, "/api/property/transactions/verify-seller-otp/", {"transaction_id": tx_id, "seller_email": se, "otp": tv.TX_OTP_SELLER.get(tx_id)})
+    steps.append(("verify-seller-otp", r.status_code))
+    r = _post(client, "/api/property/transactions/request-buyer-otp/", {"transaction_id": tx_id, "buyer_email": be})
+    steps.append(("request-buyer-otp", r.status_code))
+    r = _post(client, "/api/property/transactions/verify-buyer-otp/", {"transaction_id": tx_id, "buyer_email": be, "otp": tv.TX_OTP_BUYER.get(tx_id)})
+    steps.append(("verify-buyer-otp", r.status_code))
+    r = _post(client, "/api/property/transactions/surveyor-approve/",
+              {"transaction_id": tx_id, "token": issue_token(SURVEYOR_EMAIL, "SURVEYOR")})
+    steps.append(("surveyor-approve", r.status_code))
+    r = _post(client, "/api/property/transactions/buyer-agree/", {"transaction_id": tx_id, "buyer_email": be, "agree": True})
+    steps.append(("buyer-agree", r.status_code))
+    return steps
+
+
+SCENARIOS = {
+    "marketplace": scenario_marketplace,
+    "user-properties": scenario_user_properties,
+    "user-chats": scenario_user_chats,
+    "transactions-list": scenario_transactions_list,
+    "surveyor-queue": scenario_surveyor_queue,
+    "price-check": scenario_price_check,
+    "transfer-flow": scenario_transfer_flow,
+}
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = (len(s) - 1) * (p / 100.0)
+    lo, hi = int(k), min(int(k) + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+
+def _summarize(latencies_ms, wall_s, errors, backend_calls, http_requests, skipped=0):
+    n = len(latencies_ms)
+    return {
+        "iterations": n,
+        "skipped": skipped,
+        "http_requests": http_requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "mean_ms": round(statistics.fmean(latencies_ms), 3) if n else 0.0,
+        "max_ms": round(max(latencies_ms), 3) if n else 0.0,
+        "throughput_rps": round(n / wall_s, 2) if wall_s else 0.0,
+        "backend_calls_per_request": round(backend_calls / http_requests, 2) if http_requests else 0.0,
+    }
+
+
+def run_scenario(name, iterations, concurrency, dataset, stub, seed=0):
+    fn = SCENARIOS[name]
+    latencies, errors, http_requests, skipped = [], 0, 0, 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i):
+        nonlocal errors, http_requests, skipped
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = Client()
+        rng = random.Random(seed * 1_000_003 + i)
+        t0 = time.perf_counter()
+        steps = fn(client, rng, dataset)
+        dt = (time.perf_counter() - t0) * 1000.0
+        if steps is None:
+            with lock:
+                skipped += 1
+            return
+        with lock:
+            latencies.append(dt)
+            http_requests += len(steps)
+            errors += sum(1 for _, status in steps if status >= 400)
+
+    calls_before = stub.request_count
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(iterations)))
+    wall = time.perf_counter() - t0
+    return _summarize(latencies, wall, errors, stub.request_count - calls_before, http_requests, skipped)
+
+
+def run_suite(scenarios, iterations=200, concurrency=8, latency_ms=0.0, jitter_ms=0.0, seed=42, db_path=":memory:", **seed_kwargs):
+    """Install a fresh stub, seed it, run each scenario and return a JSON-serialisable report."""
+    stub = cloudant_client.install_stub(db_path, latency_ms=latency_ms, jitter_ms=jitter_ms, seed=seed)
+    stub.reset()
+    dataset = seed_bench_data(stub, seed=seed, **seed_kwargs)
+    reset_read_models()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "iterations": iterations,
+            "concurrency": concurrency,
+            "latency_ms": latency_ms,
+            "jitter_ms": jitter_ms,
+            "seed": seed,
+            "dataset": {k: v for k, v in seed_kwargs.items()},
+        },
+        "scenarios": {},
+    }
+    # SMTP is replaced by the in-memory backend so OTP mails do not leave the process
+    with override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"):
+        for name in scenarios:
+            mail.outbox = []
+            report["scenarios"][name] = run_scenario(name, iterations, concurrency, dataset, stub, seed=seed)
+    report["queries"] = query_stats.snapshot(limit=50)
+    return report
+
+
+def run_scaling(scenario, sizes, properties_per_user=4, **suite_kwargs):
+    """
+    Run one scenario against markets of increasing size (number of properties). Users grow
+    in proportion, so each wallet's own portfolio stays about the same and only the size of
+    the rest of the market changes; an endpoint that scales with the user's data stays flat.
+    Returns {"meta": ..., "sizes": [{"properties", "users", **summary}]}.
+    """
+    rows = []
+    for size in sizes:
+        users = max(2, size // properties_per_user)
+        report = run_suite([scenario], properties=size, users=users, **suite_kwargs)
+        rows.append({"properties": size, "users": users, **report["scenarios"][scenario]})
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "scenario": scenario,
+            "properties_per_user": properties_per_user,
+            **{k: v for k, v in suite_kwargs.items() if k != "db_path"},
+        },
+        "sizes": rows,
+    }
+
+
+def compare_reports(current, baseline):
+    """Per-scenario relative change (%) of the headline metrics versus a baseline report."""
+    out = {}
+    for name, cur in current.get("scenarios", {}).items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        out[name] = {}
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "backend_calls_per_request"):
+            b, c = base.get(key) or 0.0, cur.get(key) or 0.0
+            out[name][key] = round((c - b) / b * 100.0, 1) if b else None
+    return out
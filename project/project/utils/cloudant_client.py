@@ -1,17 +1,89 @@
+import json
+import logging
+import threading
+
 import requests
 from decouple import config
 
+from project.utils import metrics
+from project.utils.metrics import track
+from project.utils.tracing import inject_headers
+from project.utils.query_stats import record_query
+from project.utils.resilience import BackendUnavailable, QueryError, get_breaker
+from project.utils.singleflight import SingleFlight
+
 SUPABASE_URL = config("SUPABASE_URL", default="").rstrip("/")
 SUPABASE_KEY = config("SUPABASE_KEY", default="")
 BASE_URL = f"{SUPABASE_URL}/rest/v1" if SUPABASE_URL else ""
 
+# Offline PostgREST stand-in (SQLite path or ":memory:"); takes precedence over SUPABASE_URL
+POSTGREST_STUB = config("POSTGREST_STUB", default="")
+logger = logging.getLogger(__name__)
+
+POSTGREST_TIMEOUT_S = config("POSTGREST_TIMEOUT_S", default=10.0, cast=float)
+# Share one in-flight GET among concurrent identical reads (see project.utils.singleflight)
+SINGLE_FLIGHT = config("SINGLE_FLIGHT", default=True, cast=bool)
+
+# One pooled session for all PostgREST calls (keep-alive, and the mount point for the stub)
+_http = requests.Session()
+_stub = None
+
+def install_stub(db_path=":memory:", latency_ms=0.0, jitter_ms=0.0, seed=0):
+    """Route all data-client calls to an in-process SQLite-backed PostgREST stand-in."""
+    global BASE_URL, _stub
+    from project.utils.postgrest_stub import PostgrestStub, PostgrestStubAdapter, STUB_BASE_URL
+    _stub = PostgrestStub(db_path, latency_ms=latency_ms, jitter_ms=jitter_ms, seed=seed)
+    _http.mount(STUB_BASE_URL, PostgrestStubAdapter(_stub))
+    BASE_URL = STUB_BASE_URL
+    return _stub
+
+def get_stub():
+    return _stub
+
+if POSTGREST_STUB:
+    install_stub(
+        POSTGREST_STUB,
+        latency_ms=config("POSTGREST_STUB_LATENCY_MS", default=0.0, cast=float),
+        jitter_ms=config("POSTGREST_STUB_JITTER_MS", default=0.0, cast=float),
+    )
+
+_breaker = get_breaker("postgrest")
+metrics.declare_counter("blockestate_chat_message_write_failures_total",
+                        "Background chat message writes that failed, by step (message, last_message_at).", ("step",))
+
+def _request(method, table, **kwargs):
+    """One PostgREST round trip through the circuit breaker; raises BackendUnavailable on outages."""
+    if not _breaker.allow():
+        raise BackendUnavailable(f"postgrest circuit open; {method} {table} not attempted")
+    kwargs.setdefault("timeout", POSTGREST_TIMEOUT_S)
+    try:
+        resp = _http.request(method, f"{BASE_URL}/{table}", **kwargs)
+    except requests.RequestException as e:
+        _breaker.record_failure()
+        raise BackendUnavailable(f"postgrest {method} {table} failed: {e}") from e
+    if resp.status_code >= 500 or resp.status_code == 429:
+        _breaker.record_failure()
+    else:
+        _breaker.record_success()
+    return resp
+
+def _raise_for_status(resp, op, table):
+    if resp.status_code >= 500 or resp.status_code == 429:
+        raise BackendUnavailable(f"postgrest {op} {table} returned {resp.status_code}", resp.status_code)
+    if resp.status_code >= 400:
+        try:
+            code = resp.json().get("code")
+        except (ValueError, AttributeError):
+            code = None
+        raise QueryError(f"postgrest {op} {table} returned {resp.status_code}: {resp.text[:200]}", resp.status_code, code)
+
 def get_headers(prefer="return=representation"):
-    return {
+    return inject_headers({
         "apikey": SUPABASE_KEY,
         "Authorization": f"Bearer {SUPABASE_KEY}",
         "Content-Type": "application/json",
         "Prefer": prefer
-    }
+    })
 
 def get_table_name(db_name: str):
     mapping = {
@@ -68,16 +140,84 @@ def add_cloudant_id(d):
         
     return d
 
-def _select(table, params=None):
+# Named column projections (PostgREST `select=`) so each use case only pulls what it emits.
+# Keep "id" in every projection: add_cloudant_id derives "_id" from it.
+PROJECTIONS = {
+    "tx_summary": "id,property_id,status,seller_email,buyer_email,updated_at,created_at",
+    "tx_surveyor_queue": "id,property_id,status,seller_email,buyer_email,updated_at,created_at,docs_link",
+    "tx_projection": "id,property_id,status,seller_email,buyer_email,surveyor_email,docs_link,updated_at,created_at",
+    "sale_status": "id,property_id,asking_price,status",
+}
+
+def _projection(columns):
+    if not columns: return None
+    if isinstance(columns, (list, tuple)): return ",".join(columns)
+    return PROJECTIONS.get(columns, columns)
+
+_flight = SingleFlight("postgrest_select")
+# Per-table write generation: a read that starts after a local write never joins a flight
+# that started before it, so coalescing cannot hand back pre-write rows.
+_write_gen = {}
+_write_gen_lock = threading.Lock()
+
+def _bump_write_gen(table):
+    with _write_gen_lock:
+        _write_gen[table] = _write_gen.get(table, 0) + 1
+
+def write_generation(table):
+    """Counter bumped by every write this process makes to table (for cache validation)."""
+    return _write_gen.get(table, 0)
+
+def _fetch_rows(table, params):
+    """One tracked GET; returns (raw JSON body, decoded rows)."""
+    with track("postgrest", "select", table) as call:
+        resp = _request("GET", table, headers=get_headers(), params=params)
+        call.ok = resp.status_code == 200
+    _raise_for_status(resp, "select", table)
+    rows = resp.json()
+    record_query("select", table, params, len(rows), len(resp.content), call.seconds)
+    return resp.content, rows
+
+def _select(table, params=None, columns=None):
+    """Rows matching params; [] means no rows. Raises BackendError if the query failed."""
     if not BASE_URL: return []
-    resp = requests.get(f"{BASE_URL}/{table}", headers=get_headers(), params=params)
-    if resp.status_code == 200:
-        return [add_cloudant_id(r) for r in resp.json()]
-    return []
+    params = dict(params or {})
+    select = _projection(columns)
+    if select: params["select"] = select
+    if not SINGLE_FLIGHT:
+        return [add_cloudant_id(r) for r in _fetch_rows(table, params)[1]]
+    # Coalesced callers share only the immutable body and decode their own rows;
+    # the leader keeps the rows it already decoded.
+    own = {}
+    def fetch():
+        body, own["rows"] = _fetch_rows(table, params)
+        return body
+    key = (table, tuple(sorted(params.items())), _write_gen.get(table, 0))
+    body = _flight.do(key, fetch)
+    rows = own["rows"] if "rows" in own else json.loads(body)
+    return [add_cloudant_id(r) for r in rows]
+
+def _count(table, params=None):
+    """Exact row count via a HEAD request with Prefer: count=exact (no rows transferred)."""
+    if not BASE_URL: return 0
+    with track("postgrest", "count", table) as call:
+        resp = _request("HEAD", table, headers=get_headers(prefer="count=exact"), params=params)
+        call.ok = resp.status_code in (200, 206)
+    _raise_for_status(resp, "count", table)
+    record_query("count", table, params, 0, 0, call.seconds)
+    if resp.status_code in (200, 206):
+        # Content-Range looks like "0-24/3573" or "*/0"
+        total = (resp.headers.get("Content-Range") or "").rpartition("/")[2]
+        if total.isdigit(): return int(total)
+    return 0
 
 def _insert(table, data, prefer="return=representation"):
     if not BASE_URL: return {"error": "no credentials"}
-    resp = requests.post(f"{BASE_URL}/{table}", headers=get_headers(prefer=prefer), json=data, timeout=5)
+    with track("postgrest", "insert", table) as call:
+        resp = _request("POST", table, headers=get_headers(prefer=prefer), json=data, timeout=5)
+        _bump_write_gen(table)
+        call.ok = resp.status_code in (200, 201)
+    record_query("insert", table, None, 1, len(resp.content), call.seconds)
     if resp.status_code in (200, 201):
         try:
             j = resp.json()
@@ -86,10 +226,52 @@ def _insert(table, data, prefer="return=representation"):
             return {}
     return {"error": f"insert failed: {resp.text}"}
 
+def _upsert(table, data, on_conflict, prefer="return=representation", resolution="merge-duplicates"):
+    """
+    Insert, or merge into the row that conflicts on the on_conflict column(s), in one call
+    (PostgREST upsert; needs a unique constraint on those columns). Returns the resulting row;
+    with resolution="ignore-duplicates" an existing row is left alone and {} is returned.
+    Raises BackendError if the request failed.
+    """
+    if not BASE_URL: return {"error": "no credentials"}
+    params = {"on_conflict": on_conflict}
+    with track("postgrest", "upsert", table) as call:
+        resp = _request("POST", table, headers=get_headers(prefer=f"resolution={resolution},{prefer}"),
+                        params=params, json=data, timeout=5)
+        _bump_write_gen(table)
+        call.ok = resp.status_code in (200, 201)
+    record_query("upsert", table, params, 1, len(resp.content), call.seconds)
+    _raise_for_status(resp, "upsert", table)
+    try:
+        j = resp.json()
+        return add_cloudant_id(j[0]) if isinstance(j, list) and j else {}
+    except ValueError:
+        return {}
+
+def _bulk_insert(table, rows, batch_size=500):
+    """Insert many rows with one POST per batch (Prefer: return=minimal). Returns rows written."""
+    if not BASE_URL: return 0
+    written = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        with track("postgrest", "bulk_insert", table) as call:
+            resp = _request("POST", table, headers=get_headers(prefer="return=minimal"), json=batch, timeout=60)
+            _bump_write_gen(table)
+            call.ok = resp.status_code in (200, 201, 204)
+        record_query("bulk_insert", table, None, len(batch), 0, call.seconds)
+        if resp.status_code not in (200, 201, 204):
+            raise RuntimeError(f"bulk insert into {table} failed: {resp.text}")
+        written += len(batch)
+    return written
+
 def _update(table, match_col, match_val, data):
     if not BASE_URL: return {"error": "no credentials"}
     params = {f"{match_col}": f"eq.{match_val}"}
-    resp = requests.patch(f"{BASE_URL}/{table}", headers=get_headers(), params=params, json=data)
+    with track("postgrest", "update", table) as call:
+        resp = _request("PATCH", table, headers=get_headers(), params=params, json=data)
+        _bump_write_gen(table)
+        call.ok = resp.status_code in (200, 204)
+    record_query("update", table, params, 1, len(resp.content), call.seconds)
     if resp.status_code in (200, 204):
         try:
             j = resp.json()
@@ -98,6 +280,38 @@ def _update(table, match_col, match_val, data):
             return {}
     return {"error": f"update failed: {resp.text}"}
 
+def _quote_value(v):
+    v = str(v)
+    if any(c in v for c in ',.()" \\'):
+        return '"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return v
+
+def _in_list(values):
+    """PostgREST in.(...) operand; values with reserved characters are double-quoted."""
+    return "in.(" + ",".join(_quote_value(v) for v in values) + ")"
+
+# --- Change notifications ---
+# Read models (e.g. the marketplace snapshot) subscribe to the writes they derive from.
+_listeners = []
+
+def subscribe(listener):
+    """
+    listener(event, payload) runs after a successful write:
+      "listing_added"    payload = {"listing": the new registered_for_sale row,
+                                    "property": its property_details row, or None if the caller had none}
+      "listing_removed"  payload = property_id (all its listings left "active")
+      "property_updated" payload = the updated property_details row
+    """
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+def _notify(event, payload):
+    for listener in list(_listeners):
+        try:
+            listener(event, payload)
+        except Exception:
+            logger.exception("change listener %r failed on %s", listener, event)
+
 # --- Cloudant Mappings ---
 def ensure_db(db_name: str): pass
 def ensure_index(db_name: str, fields, name: str | None = None): pass
@@ -139,11 +353,11 @@ def find_app_user_by_aadhaar(aadhaar):
     rows = _select("app_users", {"aadhaar": f"eq.{aadhaar}"})
     return rows[0] if rows else None
 
-def find_user_by_email(email):
-    rows = _select("app_users", {"email": f"eq.{email}"})
-    if rows: return rows[0]
-    rows = _select("govt_citizens", {"email": f"eq.{email}"})
-    return rows[0] if rows else None
+def find_user_by_email(email, tables=("app_users", "govt_citizens")):
+    for table in tables:
+        rows = _select(table, {"email": f"eq.{email}"})
+        if rows: return rows[0]
+    return None
 
 def find_user_by_wallet(wallet_address):
     if not wallet_address: return None
@@ -154,15 +368,31 @@ def find_user_by_wallet(wallet_address):
             if rows: return rows[0]
     return None
 
-def find_properties_by_wallet(wallet_address):
-    return _select("property_details", {"wallet": f"eq.{wallet_address}"})
+def find_properties_by_wallet(wallet_address, columns=None):
+    return _select("property_details", {"wallet": f"eq.{wallet_address}"}, columns=columns)
+
+def count_properties_by_wallet(wallet_address):
+    return _count("property_details", {"wallet": f"eq.{wallet_address}"})
 
 def get_property_by_id(property_id):
-    rows = _select("property_details", {"id": f"eq.{property_id}"})
-    if rows: return rows[0]
+    # Numeric values are usually the primary key and fall back to property_id when no row has
+    # that id; everything else ("P-...") can only be a property_id, so id= is never probed.
+    if str(property_id).isdigit():
+        rows = _select("property_details", {"id": f"eq.{property_id}"})
+        if rows: return rows[0]
     rows = _select("property_details", {"property_id": f"eq.{property_id}"})
     return rows[0] if rows else None
 
+def get_properties_by_ids(property_ids, columns=None, chunk_size=100):
+    """property_id -> row for many properties, one in.(...) query per chunk instead of one per id."""
+    ids = list(dict.fromkeys(str(i) for i in property_ids if i))
+    found = {}
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        for row in _select("property_details", {"property_id": _in_list(chunk)}, columns=columns):
+            found.setdefault(str(row.get("property_id")), row)
+    return found
+
 def get_all_properties():
     rows = _select("property_details")
     return {"rows": [{"doc": d} for d in rows]}
@@ -181,9 +411,13 @@ def update_property(property_data):
     d.pop("_rev", None)
     if not i: return {"error": "Missing _id"}
     match_col = "property_id" if d.get("property_id") else "id"
-    return _update("property_details", match_col, i, d)
+    res = _update("property_details", match_col, i, d)
+    if res and "error" not in res:
+        _notify("property_updated", res)
+    return res
 
-def insert_property_for_sale(property_id, asking_price, wallet_address=None):
+def insert_property_for_sale(property_id, asking_price, wallet_address=None, property_row=None):
+    """property_row (the property_details row the caller already read) is passed on to listeners."""
     from datetime import datetime
     d = {
         "property_id": property_id,
@@ -192,26 +426,113 @@ def insert_property_for_sale(property_id, asking_price, wallet_address=None):
         "listed_date": datetime.now().isoformat(),
         "status": "active"
     }
-    return _insert("registered_for_sale", d)
-
-def get_all_properties_for_sale():
-    return _select("registered_for_sale", {"status": "eq.active"})
+    res = _insert("registered_for_sale", d)
+    if "error" not in res:
+        _notify("listing_added", {"listing": res or d, "property": property_row})
+    return res
+
+def get_all_properties_for_sale(columns=None):
+    return _select("registered_for_sale", {"status": "eq.active"}, columns=columns)
+
+def get_active_sales_for_properties(property_ids, columns=None, chunk_size=100):
+    """property_id -> active listing for just these properties (one in.(...) query per chunk)."""
+    ids = list(dict.fromkeys(str(i) for i in property_ids if i))
+    found = {}
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        for row in _select("registered_for_sale", {"property_id": _in_list(chunk), "status": "eq.active"}, columns=columns):
+            found.setdefault(str(row.get("property_id")), row)
+    return found
 
 def remove_property_from_sale(property_id):
-    return _update("registered_for_sale", "property_id", property_id, {"status": "sold"})
+    res = _update("registered_for_sale", "property_id", property_id, {"status": "sold"})
+    if "error" not in res:
+        _notify("listing_removed", property_id)
+    return res
 
 def unlist_property_from_sale(property_id):
-    return _update("registered_for_sale", "property_id", property_id, {"status": "inactive"})
+    res = _update("registered_for_sale", "property_id", property_id, {"status": "inactive"})
+    if "error" not in res:
+        _notify("listing_removed", property_id)
+    return res
 
 def get_property_sale_details(property_id):
     rows = _select("registered_for_sale", {"property_id": f"eq.{property_id}", "status": "eq.active"})
     return rows[0] if rows else None
 
+# --- Property lock leases ---
+# Rows in property_locks (property_id primary key, token, expires_at epoch seconds) act as
+# advisory locks shared by every worker; see project.utils.property_locks.
+def try_acquire_property_lease(property_id, token, expires_at, now):
+    """Take the lease if it is free or expired; True if this token now holds it."""
+    if not BASE_URL: return True
+    row = {"property_id": str(property_id), "token": token, "expires_at": expires_at}
+    params = {"on_conflict": "property_id"}
+    with track("postgrest", "lease_acquire", "property_locks") as call:
+        resp = _request("POST", "property_locks", params=params, json=row,
+                        headers=get_headers(prefer="resolution=ignore-duplicates,return=representation"))
+        call.ok = resp.status_code in (200, 201)
+    _raise_for_status(resp, "lease_acquire", "property_locks")
+    if resp.json():
+        return True
+    # Held by someone: take it over only if that lease has expired
+    params = {"property_id": f"eq.{property_id}", "expires_at": f"lt.{now}"}
+    with track("postgrest", "lease_takeover", "property_locks") as call:
+        resp = _request("PATCH", "property_locks", params=params, json={"token": token, "expires_at": expires_at},
+                        headers=get_headers())
+        call.ok = resp.status_code in (200, 204)
+    _raise_for_status(resp, "lease_takeover", "property_locks")
+    return bool(resp.json())
+
+def release_property_lease(property_id, token):
+    """Drop the lease if this token still holds it."""
+    if not BASE_URL: return
+    params = {"property_id": f"eq.{property_id}", "token": f"eq.{token}"}
+    with track("postgrest", "lease_release", "property_locks") as call:
+        resp = _request("DELETE", "property_locks", params=params, headers=get_headers(prefer="return=minimal"))
+        call.ok = resp.status_code in (200, 204)
+    _raise_for_status(resp, "lease_release", "property_locks")
+
 # --- Chat System ---
+def chat_key(property_id, email_a, email_b):
+    """Deterministic identity of a chat: the property plus its participants in sorted order."""
+    a, b = sorted(e.strip().lower() if isinstance(e, str) else str(e) for e in (email_a, email_b))
+    return f"{property_id}|{a}|{b}"
+
+# Cleared if property_chats has no chat_key unique constraint yet (see WARP.md): Postgres
+# answers 42P10 (no unique constraint matches ON CONFLICT) or 42703 (no chat_key column)
+_chat_upsert_supported = True
+_UPSERT_UNSUPPORTED_CODES = ("42P10", "42703")
+
 def create_or_get_chat(property_id, buyer_email, seller_email):
     b = buyer_email.strip().lower() if isinstance(buyer_email, str) else buyer_email
     s = seller_email.strip().lower() if isinstance(seller_email, str) else seller_email
     
+    global _chat_upsert_supported
+    if _chat_upsert_supported:
+        # Insert unless a row with this chat_key exists, and read that row otherwise. The
+        # existing row is never merged into: buyer_email / seller_email (and the order of
+        # participants) depend on which side opened the chat, and the first one stays.
+        key = chat_key(property_id, b, s)
+        try:
+            created = _upsert("property_chats", {
+                "chat_key": key,
+                "property_id": property_id,
+                "participants": [b, s],
+                "buyer_email": b,
+                "seller_email": s,
+            }, on_conflict="chat_key", resolution="ignore-duplicates")
+            if created:
+                return created
+            rows = _select("property_chats", {"chat_key": f"eq.{key}"})
+            if rows:
+                return rows[0]
+        except QueryError as e:
+            if e.code not in _UPSERT_UNSUPPORTED_CODES:
+                raise
+            _chat_upsert_supported = False
+            logger.warning("property_chats upsert rejected, falling back to select + insert: %s", e)
+    
     rows = _select("property_chats", {
         "property_id": f"eq.{property_id}",
         "participants": f"cs.{{{b},{s}}}"
@@ -235,6 +556,7 @@ def create_or_get_chat(property_id, buyer_email, seller_email):
 def send_message(chat_id, sender_email, message_text):
     import uuid
     import threading
+    import contextvars
     s = sender_email.strip().lower() if isinstance(sender_email, str) else sender_email
     from datetime import datetime
     now_iso = datetime.now().isoformat()
@@ -248,13 +570,26 @@ def send_message(chat_id, sender_email, message_text):
         "read": False
     }
     
-    # 1. Fire and forget the message insert (don't wait for heavy DB serialization)
-    threading.Thread(target=_insert, args=("chat_messages", d, "return=minimal"), daemon=True).start()
-    
-    # 2. Fire and forget the chat timestamp update
-    threading.Thread(target=_update, args=("property_chats", "id", chat_id, {"last_message_at": now_iso}), daemon=True).start()
+    # 1. Fire and forget the message insert and then the chat timestamp update (don't wait for
+    #    heavy DB serialization). They run in order on one thread: last_message_at is the chat's
+    #    version for conditional GETs, so it must never move before the message is readable.
+    #    copy_context keeps the writes attached to the request's trace.
+    def write():
+        step = "message"
+        try:
+            res = _insert("chat_messages", d, "return=minimal")
+            if "error" not in res:
+                step = "last_message_at"
+                res = _update("property_chats", "id", chat_id, {"last_message_at": now_iso})
+            if "error" in res:
+                logger.warning("chat %s: %s write for message %s failed: %s", chat_id, step, msg_id, res["error"])
+                metrics.inc("blockestate_chat_message_write_failures_total", (step,))
+        except BackendUnavailable as e:
+            logger.warning("chat %s: %s write for message %s not done: %s", chat_id, step, msg_id, e)
+            metrics.inc("blockestate_chat_message_write_failures_total", (step,))
+    threading.Thread(target=contextvars.copy_context().run, args=(write,), daemon=True).start()
     
-    # 3. Immediately return the optimistic payload back to the frontend!
+    # 2. Immediately return the optimistic payload back to the frontend!
     return {
         "_id": msg_id,
         "chat_id": chat_id,
@@ -267,6 +602,9 @@ def get_chat_messages(chat_id, limit=50):
     params = {"chat_id": f"eq.{chat_id}", "order": "timestamp.asc", "limit": str(limit)}
     return _select("chat_messages", params)
 
+def count_unread_messages(chat_id):
+    return _count("chat_messages", {"chat_id": f"eq.{chat_id}", "read": "eq.false"})
+
 def get_user_chats(user_email):
     u = user_email.strip().lower() if isinstance(user_email, str) else user_email
     params = {
@@ -289,7 +627,11 @@ def mark_messages_as_read(chat_id, reader_email):
         "sender_email": f"neq.{r}"
     }
     h = get_headers()
-    resp = requests.patch(f"{BASE_URL}/chat_messages", headers=h, params=params, json={"read": True})
+    with track("postgrest", "update", "chat_messages") as call:
+        resp = _request("PATCH", "chat_messages", headers=h, params=params, json={"read": True})
+        _bump_write_gen("chat_messages")
+        call.ok = resp.status_code == 200
+    record_query("update", "chat_messages", params, 0, len(resp.content), call.seconds)
     return len(resp.json()) if resp.status_code == 200 and isinstance(resp.json(), list) else 0
 
 def get_wallet_from_user_doc(user_doc):
@@ -343,7 +685,7 @@ def update_transaction_doc(tx_doc):
     d["updated_at"] = datetime.now().isoformat()
     return _update("in_transaction", "id", i, d)
 
-def find_transactions_for_user(user_email, role=None, status=None):
+def find_transactions_for_user(user_email, role=None, status=None, columns=None):
     e = str(user_email).lower() if user_email else ""
     params = {"order": "updated_at.desc"}
     if role == 'seller':
@@ -355,4 +697,48 @@ def find_transactions_for_user(user_email, role=None, status=None):
         
     if status:
         params["status"] = f"eq.{status}"
-    return _select("in_transaction", params)
+    return _select("in_transaction", params, columns=columns)
+
+def find_live_transactions_for_property(property_id):
+    """Transactions on the property still in progress (neither COMPLETED nor ON_HOLD), newest first."""
+    return _select("in_transaction", {"property_id": f"eq.{property_id}", "status": "not.in.(COMPLETED,ON_HOLD)",
+                                      "order": "updated_at.desc"}, columns="tx_summary")
+
+def get_all_transactions(columns="tx_projection", page_size=1000):
+    """
+    Every transaction, paged by id. PostgREST caps a response at its max-rows setting
+    (1000 on Supabase), which may be below page_size, so paging stops at an empty page.
+    """
+    rows, offset = [], 0
+    while True:
+        page = _select("in_transaction", {"order": "id.asc", "limit": str(page_size), "offset": str(offset)},
+                       columns=columns)
+        if not page:
+            return rows
+        rows.extend(page)
+        offset += len(page)
+
+# --- Transaction event log (append-only; see project.utils.transaction_log) ---
+def insert_transaction_events(events):
+    """Append events with one POST per batch. Returns rows written."""
+    return _bulk_insert("transaction_events", events)
+
+def get_transaction_events(since=None, transaction_id=None, limit=1000, offset=0):
+    """Events in recording order; since is an ISO timestamp compared with recorded_at (inclusive)."""
+    params = {"order": "recorded_at.asc,event_id.asc", "limit": str(limit), "offset": str(offset)}
+    if since:
+        params["recorded_at"] = f"gte.{since}"
+    if transaction_id:
+        params["transaction_id"] = f"eq.{transaction_id}"
+    return _select("transaction_events", params)
+
+def find_pending_for_surveyor(surveyor_email, limit=20, offset=0):
+    """Pending surveyor approvals assigned to one surveyor, newest first, one page at a time."""
+    params = {
+        "status": "eq.PENDING_SURVEYOR_APPROVAL",
+        "surveyor_email": f"eq.{surveyor_email}",
+        "order": "updated_at.desc",
+        "limit": str(limit),
+        "offset": str(offset),
+    }
+    return _select("in_transaction", params, columns="tx_surveyor_queue")
@@ -0,0 +1,91 @@
+"""
+Dependency-aware concurrent fan-out for independent backend lookups in a view.
+
+    fan = FanOut("initiate_transfer")
+    fan.add("seller", lambda: find_user_by_email(seller_email))
+    fan.add("prop", lambda: get_property_by_id(property_id))
+    fan.add("seller_by_wallet", lambda seller, prop: ..., deps=("seller", "prop"))
+    results = fan.run()
+
+Each task receives its dependencies' results as positional arguments, in `deps` order.
+Dependencies must be added before the tasks that use them, so declaration order is
+always a valid sequential order. run() starts every task whose dependencies are done:
+all but one go to a shared thread pool and the calling thread runs the remaining one,
+so the endpoint waits for the critical path instead of the sum of the lookups.
+
+Tasks run in a copy of the caller's context, so their backend calls still count against
+the request (Server-Timing, per-request call metrics) and nest under its trace span.
+The first exception is re-raised by run(); dependents of a failed task never start.
+A fan-out started from inside a pool task runs sequentially (no pool-starvation
+deadlock), as does everything when FANOUT_MAX_WORKERS is 0.
+"""
+import contextvars
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from decouple import config
+
+from project.utils import metrics
+
+FANOUT_MAX_WORKERS = config("FANOUT_MAX_WORKERS", default=16, cast=int)
+
+metrics.declare_counter("blockestate_fanout_tasks_total",
+                        "Fan-out tasks by where they ran (pool thread or the calling thread).", ("group", "thread"))
+
+_pool = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="fanout") if FANOUT_MAX_WORKERS > 0 else None
+_worker = threading.local()
+
+
+def _run_in_worker(ctx, fn, args):
+    _worker.active = True
+    try:
+        return ctx.run(fn, *args)
+    finally:
+        _worker.active = False
+
+
+class FanOut:
+    def __init__(self, group):
+        self.group = group
+        self._tasks = {}  # name -> (fn, deps), in declaration order
+
+    def add(self, name, fn, deps=()):
+        if name in self._tasks:
+            raise ValueError(f"duplicate fan-out task {name!r}")
+        for dep in deps:
+            if dep not in self._tasks:
+                raise ValueError(f"fan-out task {name!r} depends on undeclared task {dep!r}")
+        self._tasks[name] = (fn, tuple(deps))
+        return self
+
+    def run(self):
+        """Run every task; returns {name: result}."""
+        if _pool is None or getattr(_worker, "active", False):
+            return self._run_sequential()
+        results, pending, running = {}, dict(self._tasks), {}
+        while pending or running:
+            ready = [name for name, (_, deps) in pending.items() if all(d in results for d in deps)]
+            for name in ready:
+                del pending[name]
+            for name in ready[1:]:
+                fn, deps = self._tasks[name]
+                future = _pool.submit(_run_in_worker, contextvars.copy_context(), fn, [results[d] for d in deps])
+                running[future] = name
+                metrics.inc("blockestate_fanout_tasks_total", (self.group, "pool"))
+            if ready:
+                fn, deps = self._tasks[ready[0]]
+                results[ready[0]] = fn(*(results[d] for d in deps))
+                metrics.inc("blockestate_fanout_tasks_total", (self.group, "caller"))
+            if running:
+                # Only block when the calling thread has nothing left to run
+                done, _ = wait(running, timeout=0 if ready else None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        return results
+
+    def _run_sequential(self):
+        results = {}
+        for name, (fn, deps) in self._tasks.items():
+            results[name] = fn(*(results[d] for d in deps))
+            metrics.inc("blockestate_fanout_tasks_total", (self.group, "caller"))
+        return results
@@ -0,0 +1,62 @@
+"""
+Conditional GET helpers.
+
+ConditionalGetMiddleware (settings.MIDDLEWARE) already gives every GET a body-hash
+ETag and answers If-None-Match / If-Modified-Since with 304. Views that can derive
+a version cheaply (a timestamp, a counter, a row count) use version_etag() and
+conditional_response() to answer 304 *before* fetching the full rows.
+"""
+import hashlib
+import time
+from datetime import datetime
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def version_etag(*parts):
+    """Weak ETag from the parts that fully determine a representation."""
+    digest = hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def parse_timestamp(value):
+    """ISO-8601 column value -> epoch seconds (naive values are in settings.TIME_ZONE), or None."""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt.timestamp()
+
+
+def stable_last_modified(ts):
+    """
+    Last-Modified has one-second resolution; only advertise it once the second has passed,
+    so a second change within the same second cannot be masked by If-Modified-Since.
+    """
+    if ts is None or time.time() - ts < 1.0:
+        return None
+    return int(ts)
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """Attach validators and make clients revalidate on every use."""
+    if etag:
+        response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_response(request, etag=None, last_modified=None):
+    """A 304 (or 412 for failed If-Match) if the request's preconditions decide it, else None."""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None and response.status_code == 304:
+        set_validators(response, etag, last_modified)
+    return response
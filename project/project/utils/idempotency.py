@@ -0,0 +1,266 @@
+"""
+Idempotency-Key support for mutating endpoints.
+
+Clients on flaky networks retry POSTs. A view decorated with @idempotent runs at most
+once per Idempotency-Key header: IdempotencyMiddleware records a fingerprint of the
+request, runs the view, stores the response and replays it (with
+"Idempotent-Replayed: true") for every retry of that key, without running the view again.
+
+- Keys are scoped to method + path; reusing a key with a different body is answered
+  with 422, and a retry that arrives while the first attempt is still running gets 409
+  with Retry-After.
+- Responses are stored for IDEMPOTENCY_TTL_S, except retryable ones (409, 429, 5xx)
+  and exceptions, which free the key so the client's retry runs the view again. A reservation whose worker died expires after
+  IDEMPOTENCY_LOCK_TTL_S.
+- Requests without the header, and views without @idempotent, are not affected.
+
+IDEMPOTENCY_STORE picks where records live: "memory" (default; per process),
+"sqlite:///relative.sqlite3" or "sqlite:////abs/path.sqlite3" (shared by the workers
+of one host), or "redis://host:6379/0" (any Redis-compatible server; needs the redis
+package).
+"""
+import base64
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from decouple import config
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, JsonResponse
+
+from project.utils import metrics
+
+IDEMPOTENCY_STORE = config("IDEMPOTENCY_STORE", default="memory")
+IDEMPOTENCY_TTL_S = config("IDEMPOTENCY_TTL_S", default=86400, cast=int)
+IDEMPOTENCY_LOCK_TTL_S = config("IDEMPOTENCY_LOCK_TTL_S", default=120, cast=int)
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# "Try again" answers (e.g. 409 while another request holds the property lock) are never replayed
+RETRYABLE_STATUSES = (409, 429)
+
+metrics.declare_counter("blockestate_idempotency_requests_total",
+                        "Requests carrying an Idempotency-Key by outcome "
+                        "(stored, replayed, in_progress, mismatch, not_stored).", ("result",))
+
+
+def idempotent(view_func):
+    """Mark a view as safe to deduplicate by Idempotency-Key."""
+    view_func.idempotent = True
+    return view_func
+
+
+class MemoryStore:
+    """Per-process store; retries that reach another worker are not deduplicated."""
+
+    def __init__(self):
+        self._records = {}  # key -> (value, expires_at monotonic)
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+
+    def _live(self, key, now):
+        entry = self._records.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._records[key]
+            entry = None
+        return entry
+
+    def _purge(self, now):
+        if now >= self._next_purge:
+            for key in [k for k, (_, exp) in self._records.items() if exp <= now]:
+                del self._records[key]
+            self._next_purge = now + 60
+
+    def add(self, key, value, ttl):
+        """Store value only if key is absent; True if stored."""
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            if self._live(key, now) is not None:
+                return False
+            self._records[key] = (value, now + ttl)
+            return True
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            return entry[0] if entry else None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._records[key] = (value, time.monotonic() + ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+
+
+class SQLiteStore:
+    """Records in a SQLite file, shared by every worker process on the host."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS idempotency_keys "
+                           "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires ON idempotency_keys (expires_at)")
+        self._next_purge = 0.0
+
+    def add(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            if now >= self._next_purge:
+                self._conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (now,))
+                self._next_purge = now + 60
+            else:
+                self._conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND expires_at <= ?", (key, now))
+            cur = self._conn.execute("INSERT OR IGNORE INTO idempotency_keys (key, value, expires_at) VALUES (?, ?, ?)",
+                                     (key, json.dumps(value), now + ttl))
+            return cur.rowcount == 1
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM idempotency_keys WHERE key = ? AND expires_at > ?",
+                                     (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO idempotency_keys (key, value, expires_at) VALUES (?, ?, ?)",
+                               (key, json.dumps(value), time.time() + ttl))
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+
+
+class RedisStore:
+    """Records in a Redis-compatible server (SET NX EX), shared by every host."""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("IDEMPOTENCY_STORE=redis://... requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+
+    def add(self, key, value, ttl):
+        return bool(self._client.set(key, json.dumps(value), nx=True, ex=ttl))
+
+    def get(self, key):
+        raw = self._client.get(key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key, value, ttl):
+        self._client.set(key, json.dumps(value), ex=ttl)
+
+    def delete(self, key):
+        self._client.delete(key)
+
+
+def make_store(url):
+    if url == "memory":
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):] or ":memory:")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    raise ImproperlyConfigured(f"Unknown IDEMPOTENCY_STORE {url!r}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = make_store(IDEMPOTENCY_STORE)
+    return _store
+
+
+def reset_store():
+    """Drop the process's store object; the next request makes a new one (an in-memory store starts empty)."""
+    global _store
+    with _store_lock:
+        _store = None
+
+
+def _fingerprint(request):
+    digest = hashlib.sha256()
+    digest.update((request.content_type or "").encode("utf-8"))
+    digest.update(b"\x1f")
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _replay(record):
+    response = HttpResponse(base64.b64decode(record["body"]), status=record["status"],
+                            content_type=record["content_type"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+class IdempotencyMiddleware:
+    """Runs @idempotent views at most once per Idempotency-Key; keep it last in MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not getattr(view_func, "idempotent", False) or request.method in ("GET", "HEAD", "OPTIONS"):
+            return None
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse({"success": False, "message": f"{IDEMPOTENCY_HEADER} is too long"}, status=400)
+
+        store = get_store()
+        store_key = "idem:" + hashlib.sha256(f"{request.method} {request.path}\x1f{key}".encode("utf-8")).hexdigest()
+        fingerprint = _fingerprint(request)
+        if not store.add(store_key, {"fp": fingerprint, "state": "pending"}, IDEMPOTENCY_LOCK_TTL_S):
+            # None: expired since add() failed; let the client retry like any in-flight duplicate
+            record = store.get(store_key) or {"fp": fingerprint, "state": "pending"}
+            return self._existing(record, fingerprint)
+
+        try:
+            response = view_func(request, *view_args, **view_kwargs)
+        except BaseException:
+            store.delete(store_key)
+            raise
+        if (response.status_code >= 500 or response.status_code in RETRYABLE_STATUSES
+                or getattr(response, "streaming", False)):
+            store.delete(store_key)
+            metrics.inc("blockestate_idempotency_requests_total", ("not_stored",))
+            return response
+        store.set(store_key, {
+            "fp": fingerprint,
+            "state": "done",
+            "status": response.status_code,
+            "content_type": response.get("Content-Type", "application/json"),
+            "body": base64.b64encode(response.content).decode("ascii"),
+        }, IDEMPOTENCY_TTL_S)
+        metrics.inc("blockestate_idempotency_requests_total", ("stored",))
+        return response
+
+    def _existing(self, record, fingerprint):
+        if record.get("fp") != fingerprint:
+            metrics.inc("blockestate_idempotency_requests_total", ("mismatch",))
+            return JsonResponse({"success": False,
+                                 "message": f"{IDEMPOTENCY_HEADER} was already used for a different request"},
+                                status=422)
+        if record.get("state") != "done":
+            metrics.inc("blockestate_idempotency_requests_total", ("in_progress",))
+            response = JsonResponse({"success": False,
+                                     "message": "A request with this Idempotency-Key is still being processed"},
+                                    status=409)
+            response["Retry-After"] = "1"
+            return response
+        metrics.inc("blockestate_idempotency_requests_total", ("replayed",))
+        return _replay(record)
@@ -0,0 +1,149 @@
+"""
+Structured, non-blocking logging.
+
+- AsyncQueueHandler: callers only enqueue records; a background QueueListener
+  formats them and writes to stdout, so request threads never block on I/O.
+- JsonFormatter: one JSON object per line with timestamp, level, logger, message,
+  request id, endpoint, trace id and any `extra=` fields (e.g. duration_ms).
+- RequestContextFilter + RequestLogMiddleware: attach the current request's id
+  (X-Request-Id, generated if absent) and endpoint to every record, and emit one
+  access line per request with its status and duration.
+- SamplingFilter: keeps only a fraction (LOG_DEBUG_SAMPLE_RATE) of DEBUG records.
+- parse_levels: per-module levels from LOG_LEVELS="property.chat_views=DEBUG,...".
+
+This module must stay importable from settings.py (no Django imports at module level).
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+_request = ContextVar("log_request", default=None)
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id", "endpoint", "trace_id"}
+
+
+def parse_levels(spec):
+    """'a.b=DEBUG, c=WARNING' -> {"a.b": {"level": "DEBUG"}, "c": {"level": "WARNING"}}"""
+    out = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            out[name.strip()] = {"level": level.strip().upper()}
+    return out
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach request_id / endpoint / trace_id from the request being served (if any)."""
+
+    def filter(self, record):
+        ctx = _request.get()
+        if ctx is not None:
+            record.request_id = ctx["id"]
+            match = getattr(ctx["request"], "resolver_match", None)
+            record.endpoint = match.route if match else ctx["request"].path
+        try:
+            from project.utils.tracing import current_span
+            span = current_span()
+            if span is not None:
+                record.trace_id = span.trace_id
+        except ImportError:
+            pass
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Pass all records at INFO and above, and only `rate` (0.0-1.0) of DEBUG records."""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        doc = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key in ("request_id", "endpoint", "trace_id"):
+            value = getattr(record, key, None)
+            if value:
+                doc[key] = value
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                doc[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            doc["exc"] = record.exc_text
+        return json.dumps(doc, default=str)
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records and write them from a background thread.
+    Formatting (JSON encoding) also happens on the listener thread; only the message
+    interpolation and traceback rendering are done by the caller.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self._target = logging.StreamHandler(stream or sys.stdout)
+        self._listener = logging.handlers.QueueListener(self.queue, self._target, respect_handler_level=False)
+        self._listener.start()
+        atexit.register(self._listener.stop)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self._target.setFormatter(fmt)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RequestLogMiddleware:
+    """Bind a request id for log correlation and emit one structured access record per request."""
+
+    logger = logging.getLogger("project.access")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get("X-Request-Id") or uuid.uuid4().hex
+        token = _request.set({"id": request_id, "request": request})
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            self.logger.info(
+                "%s %s %s", request.method, request.path, response.status_code,
+                extra={"status": response.status_code, "method": request.method, "duration_ms": duration_ms},
+            )
+            response["X-Request-Id"] = request_id
+            return response
+        finally:
+            _request.reset(token)
@@ -0,0 +1,149 @@
+"""
+Login prefetch: warm a per-user cache bundle right after OTP verification.
+
+After verify_otp the dashboard immediately asks for the profile, the owned properties
+and the chat inbox (the transaction list is served from project.utils.transaction_log).
+prefetch(email) loads all of them in a background thread (through FanOut, so independent parts load concurrently) and keeps
+them for LOGIN_PREFETCH_TTL_S seconds; the views read through cached(key, compute).
+
+- Parts are registered by the views that serve them (register()), so this module does
+  not depend on the view layer. A part may depend on other parts (owned properties
+  need the wallet from the profile).
+- A request that arrives while its part is still loading waits for it (up to
+  LOGIN_PREFETCH_WAIT_S) instead of issuing the same queries again.
+- An entry is only served if no write this process made to the tables it was read from
+  happened since it started loading (cloudant_client.write_generation), so the
+  dashboard never sees its own writes undone. Values are deep-copied on every read.
+"""
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from decouple import config
+
+from project.utils import cloudant_client, metrics
+from project.utils.fanout import FanOut
+
+LOGIN_PREFETCH_TTL_S = config("LOGIN_PREFETCH_TTL_S", default=30.0, cast=float)
+LOGIN_PREFETCH_WAIT_S = config("LOGIN_PREFETCH_WAIT_S", default=3.0, cast=float)
+LOGIN_PREFETCH_MAX_ENTRIES = config("LOGIN_PREFETCH_MAX_ENTRIES", default=5000, cast=int)
+
+logger = logging.getLogger(__name__)
+
+metrics.declare_counter("blockestate_login_prefetch_reads_total",
+                        "Reads of prefetched login data by part and result (hit, miss, invalidated).",
+                        ("part", "result"))
+
+_parts = {}  # name -> (key_fn, load_fn, tables, deps), in registration order
+_entries = OrderedDict()  # cache key -> _Entry
+_lock = threading.Lock()
+
+
+class _Entry:
+    __slots__ = ("future", "generations", "expires_at")
+
+    def __init__(self, tables):
+        self.future = Future()
+        self.generations = {t: cloudant_client.write_generation(t) for t in tables}
+        self.expires_at = time.monotonic() + LOGIN_PREFETCH_TTL_S
+
+    def valid(self):
+        return all(cloudant_client.write_generation(t) == g for t, g in self.generations.items())
+
+
+def register(name, key, load, tables, deps=()):
+    """
+    key(email, *dep_values) -> cache key (None to skip); load(email, *dep_values) -> value.
+    dep_values are the loaded values of the named parts in deps. tables are the tables
+    load() reads; a local write to any of them invalidates the entry.
+    """
+    _parts[name] = (key, load, tuple(tables), tuple(deps))
+
+
+def _start(key, tables):
+    with _lock:
+        now = time.monotonic()
+        while _entries:
+            oldest = next(iter(_entries.values()))
+            if oldest.expires_at > now and len(_entries) < LOGIN_PREFETCH_MAX_ENTRIES:
+                break
+            _entries.popitem(last=False)
+        entry = _entries[key] = _Entry(tables)
+        _entries.move_to_end(key)
+        return entry
+
+
+def prefetch(email):
+    """Start loading every registered part for email in the background."""
+    if not email or not _parts:
+        return
+    # Parts without dependencies get their entries now, so a request that races the
+    # background thread waits for it instead of loading the same data again
+    entries = {}
+    for name, (key_fn, _, tables, deps) in _parts.items():
+        key = None if deps else key_fn(email)
+        if key is not None:
+            entries[name] = _start(key, tables)
+    # Not copy_context(): the prefetch outlives the verify_otp request
+    threading.Thread(target=_run, args=(email, entries), name="login-prefetch", daemon=True).start()
+
+
+def _run(email, entries):
+    fan = FanOut("login_prefetch")
+    for name, (key_fn, load_fn, tables, deps) in _parts.items():
+        fan.add(name, _loader(email, entries.get(name), key_fn, load_fn, tables), deps=deps)
+    try:
+        fan.run()
+    except Exception as e:
+        # The failed part's entry carries the exception; its readers load the data themselves
+        logger.info("login prefetch for %s incomplete: %s", email, e)
+
+
+def _loader(email, entry, key_fn, load_fn, tables):
+    def load(*dep_values):
+        nonlocal entry
+        if entry is None:
+            key = key_fn(email, *dep_values)
+            if key is None:
+                return None
+            entry = _start(key, tables)
+        try:
+            value = load_fn(email, *dep_values)
+        except BaseException as e:
+            entry.future.set_exception(e)
+            raise
+        entry.future.set_result(value)
+        return value
+    return load
+
+
+def cached(key, compute):
+    """The prefetched value for key if still valid, else compute()."""
+    part = key.partition(":")[0]
+    with _lock:
+        entry = _entries.get(key)
+    if entry is None or entry.expires_at <= time.monotonic():
+        metrics.inc("blockestate_login_prefetch_reads_total", (part, "miss"))
+        return compute()
+    try:
+        value = entry.future.result(timeout=LOGIN_PREFETCH_WAIT_S)
+        usable = entry.valid()
+    except Exception:
+        usable = False  # failed or too slow: load it ourselves
+    if not usable:
+        with _lock:
+            if _entries.get(key) is entry:
+                del _entries[key]
+        metrics.inc("blockestate_login_prefetch_reads_total", (part, "invalidated"))
+        return compute()
+    metrics.inc("blockestate_login_prefetch_reads_total", (part, "hit"))
+    return copy.deepcopy(value)
+
+
+def clear():
+    """Drop every prefetched entry."""
+    with _lock:
+        _entries.clear()
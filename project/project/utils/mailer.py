@@ -1,7 +1,13 @@
 from django.conf import settings
 from django.core.mail import send_mail
+import contextvars
+import logging
 import threading
 
+from project.utils.metrics import track
+
+logger = logging.getLogger(__name__)
+
 
 def render_otp_html(name: str, otp: str, title: str = "Your Login OTP", subtitle: str = "Secure Land Registry Platform", intro: str | None = None) -> str:
     safe_name = name or "User"
@@ -81,24 +87,25 @@ def send_otp_email(to_email: str, otp: str, subject: str = "Your BlockEstate OTP
     def _send():
         try:
             from_email = getattr(settings, 'EMAIL_HOST_USER', None) or getattr(settings, 'DEFAULT_FROM_EMAIL', None)
-            send_mail(
-                subject=subj,
-                message=body,
-                from_email=from_email,
-                recipient_list=[to_email],
-                fail_silently=False,
-                html_message=html_body,
-            )
+            with track("smtp", "send_mail"):
+                send_mail(
+                    subject=subj,
+                    message=body,
+                    from_email=from_email,
+                    recipient_list=[to_email],
+                    fail_silently=False,
+                    html_message=html_body,
+                )
         except Exception as e:
-            print(f"send_otp_email failed for {to_email}: {e}")
+            logger.error("send_otp_email failed for %s: %s", to_email, e)
 
     if async_send:
         try:
-            t = threading.Thread(target=_send, daemon=True)
+            t = threading.Thread(target=contextvars.copy_context().run, args=(_send,), daemon=True)
             t.start()
             return True
         except Exception as e:
-            print(f"Failed to start async email thread: {e}")
+            logger.error("Failed to start async email thread: %s", e)
             # Fall through to synchronous send
 
     # Synchronous path
@@ -115,19 +122,20 @@ def send_notification_email(to_email: str, subject: str, body: str, html_body: s
     def _send():
         try:
             from_email = getattr(settings, 'EMAIL_HOST_USER', None) or getattr(settings, 'DEFAULT_FROM_EMAIL', None)
-            send_mail(
-                subject=subject,
-                message=body,
-                from_email=from_email,
-                recipient_list=[to_email],
-                fail_silently=False,
-                html_message=html_body,
-            )
+            with track("smtp", "send_mail"):
+                send_mail(
+                    subject=subject,
+                    message=body,
+                    from_email=from_email,
+                    recipient_list=[to_email],
+                    fail_silently=False,
+                    html_message=html_body,
+                )
         except Exception as e:
-            print(f"send_notification_email failed for {to_email}: {e}")
+            logger.error("send_notification_email failed for %s: %s", to_email, e)
 
     if async_send:
-        t = threading.Thread(target=_send, daemon=True)
+        t = threading.Thread(target=contextvars.copy_context().run, args=(_send,), daemon=True)
         t.start()
         return True
     
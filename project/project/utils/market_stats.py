@@ -0,0 +1,352 @@
+"""
+Market statistics over listed properties (GET marketplace/stats/, marketplace/price-check/).
+
+MarketStats is a derived view of the marketplace snapshot, like search_index: built from
+the snapshot on first use and maintained from its per-entry change feed. Each listing is
+parsed once into a row of NumPy columns (asking price, area and declared value as
+numbers; district, state and category as integer codes); a removed listing frees its row
+for the next one.
+
+Aggregates are computed in bulk from the columns: sorting by group gives the price per
+unit area percentiles, median price and median price / declared value of every district,
+state and category, and every listing is flagged at once against Tukey fences on the log
+scale (Q1 / (Q3/Q1)^k, Q3 x (Q3/Q1)^k with k = MARKET_OUTLIER_IQR) of its district, or of
+its state when the district has fewer than MARKET_MIN_GROUP priced listings. After a
+change they are recomputed on the next read, at most every MARKET_STATS_REFRESH_S seconds.
+
+check_price() compares a proposed asking price with those fences; flag-property-for-sale
+reports the result and, with MARKET_PRICE_POLICY=reject, refuses outliers.
+"""
+import threading
+import time
+
+import numpy as np
+from decouple import config
+
+from project.utils import metrics
+from project.utils.marketplace_snapshot import snapshot
+from project.utils.search_index import entry_area, parse_number
+from project.utils.vector_stats import Codes, grouped_percentiles
+
+MARKET_STATS_REFRESH_S = config("MARKET_STATS_REFRESH_S", default=1.0, cast=float)
+MARKET_MIN_GROUP = config("MARKET_MIN_GROUP", default=5, cast=int)
+MARKET_OUTLIER_IQR = config("MARKET_OUTLIER_IQR", default=1.5, cast=float)
+MARKET_PRICE_POLICY = config("MARKET_PRICE_POLICY", default="warn")  # warn | reject
+
+PERCENTILES = (10, 25, 50, 75, 90)
+DIMENSIONS = ("district", "state", "category")
+# Entry fields per dimension, first non-empty wins (seeded and imported records differ in case)
+FIELDS = {"district": ("District", "district"), "state": ("State", "state"), "category": ("Category", "category")}
+
+metrics.declare_counter("blockestate_market_price_checks_total",
+                        "Asking prices checked against market statistics by result (ok, high, low, no_data).",
+                        ("result",))
+
+
+def _field(entry, dimension):
+    for name in FIELDS[dimension]:
+        value = entry.get(name)
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+
+def group_keys(entry):
+    """{dimension: group key} of a property or listing; a district is qualified by its state."""
+    state, district = _field(entry, "state"), _field(entry, "district")
+    return {"district": (district, state) if district else None, "state": state,
+            "category": _field(entry, "category")}
+
+
+def declared_value(entry):
+    for field in ("value", "Value"):
+        if entry.get(field) not in (None, ""):
+            return parse_number(entry[field])
+    return None
+
+
+def _round(value, digits=2):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+class GroupStats:
+    """Price-per-area distribution of every group of one dimension, looked up by group code."""
+
+    def __init__(self, codes, ppa, prices, values, n_codes):
+        # code -> group position; the extra last slot keeps code -1 (no group) at -1
+        self.index = np.full(n_codes + 1, -1, np.int64)
+        self.outliers = np.zeros(0, np.int64)
+        self.groups, self.starts, self.counts, self.values, self.pct = grouped_percentiles(codes, ppa, PERCENTILES)
+        self.index[self.groups] = np.arange(len(self.groups))
+        self.means = np.add.reduceat(self.values, self.starts) / self.counts if len(self.groups) else np.empty(0)
+        self.median_price = grouped_percentiles(codes, prices, (50,))[4][:, 0]
+        # Asking price / declared value, over the listings that declare a value
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ratios = prices / values
+        known = np.isfinite(ratios)
+        ratio_groups, _, _, _, ratio_pct = grouped_percentiles(codes[known], ratios[known], (50,))
+        self.price_to_value = np.full(len(self.groups), np.nan)
+        self.price_to_value[self.index[ratio_groups]] = ratio_pct[:, 0]
+        q1, q3 = self.pct[:, 1], self.pct[:, 3]
+        spread = (q3 / q1) ** MARKET_OUTLIER_IQR
+        enough = self.counts >= MARKET_MIN_GROUP
+        self.low = np.where(enough, q1 / spread, np.nan)
+        self.high = np.where(enough, q3 * spread, np.nan)
+
+    def find(self, code):
+        return int(self.index[code]) if 0 <= code < len(self.index) - 1 else -1
+
+    def fences(self, codes):
+        """(low, high) fence of each row's group; NaN where the group is too small."""
+        i = self.index[codes]
+        known = i >= 0
+        low, high = np.full(len(codes), np.nan), np.full(len(codes), np.nan)
+        low[known], high[known] = self.low[i[known]], self.high[i[known]]
+        return low, high
+
+    def rank(self, i, value):
+        """Percentage of the group's listings priced (per area) below value."""
+        start, count = self.starts[i], self.counts[i]
+        return 100.0 * np.searchsorted(self.values[start:start + count], value) / count
+
+    def describe(self, i):
+        return {
+            "count": int(self.counts[i]),
+            "price_per_area": {**{f"p{p}": _round(self.pct[i, j]) for j, p in enumerate(PERCENTILES)},
+                               "mean": _round(self.means[i])},
+            "median_price": _round(self.median_price[i]),
+            "median_price_to_value": _round(self.price_to_value[i], 3),
+            "low_fence": _round(self.low[i]),
+            "high_fence": _round(self.high[i]),
+            "outliers": int(self.outliers[i]),
+        }
+
+
+class Aggregates:
+    def __init__(self, version, groups, totals, outliers, computed_at):
+        self.version = version
+        self.groups = groups        # dimension -> GroupStats
+        self.totals = totals
+        self.outliers = outliers    # outlying listings, furthest from their group median first
+        self.computed_at = computed_at
+
+
+class MarketStats:
+    COLUMNS = (("price", np.float64), ("area", np.float64), ("value", np.float64),
+               ("district", np.int32), ("state", np.int32), ("category", np.int32))
+
+    def __init__(self, source=snapshot):
+        self.source = source
+        self.version = 0
+        self._built = False
+        self._built_version = 0
+        self._lock = threading.RLock()
+        self._clear()
+        source.subscribe(self.on_change)
+
+    def _clear(self):
+        self._codes = {d: Codes() for d in DIMENSIONS}
+        self._rows = {}          # listing key -> row
+        self._keys = []          # row -> listing key, None for a free row
+        self._property_ids = []  # row -> property_id
+        self._free = []
+        self._row_version = {}
+        self._cols = {name: np.empty(0, dtype) for name, dtype in self.COLUMNS}
+        self._aggregates = None
+
+    # --- maintenance ---
+    def _ensure_built(self):
+        if self._built:
+            return
+        with self._lock:
+            if self._built:
+                return
+            keyed, version, _ = self.source.read_keyed()
+            self._clear()
+            parsed = [self._parse(entry) for _, entry in keyed]
+            for name, _ in self.COLUMNS:
+                self._cols[name] = np.array([p[name] for p in parsed], dtype=self._cols[name].dtype)
+            self._keys = [key for key, _ in keyed]
+            self._property_ids = [entry.get("property_id") for _, entry in keyed]
+            self._rows = {key: row for row, key in enumerate(self._keys)}
+            self._row_version = dict.fromkeys(self._rows, version)
+            self.version = self._built_version = version
+            self._built = True
+
+    def reset(self):
+        """Forget everything; the next read rebuilds from the snapshot."""
+        with self._lock:
+            self._clear()
+            self._built = False
+
+    def on_change(self, version, changes):
+        with self._lock:
+            if not self._built or version <= self._built_version:
+                return  # the build (first read) reads the snapshot at or after this version
+            for key, entry in changes:
+                if version < self._row_version.get(key, 0):
+                    continue
+                self._row_version[key] = version
+                if entry is None:
+                    self._remove(key)
+                else:
+                    self._upsert(key, entry)
+            self.version = max(self.version, version)
+
+    def _parse(self, entry):
+        nan = np.nan
+        price, area, value = parse_number(entry.get("asking_price")), entry_area(entry), declared_value(entry)
+        row = {"price": nan if price is None else price, "area": nan if area is None else area,
+               "value": nan if value is None else value}
+        for dimension, key in group_keys(entry).items():
+            row[dimension] = self._codes[dimension].code(key)
+        return row
+
+    def _upsert(self, key, entry):
+        row = self._rows.get(key)
+        if row is None:
+            row = self._free.pop() if self._free else self._grow()
+            self._rows[key] = row
+            self._keys[row] = key
+        self._property_ids[row] = entry.get("property_id")
+        for name, value in self._parse(entry).items():
+            self._cols[name][row] = value
+
+    def _remove(self, key):
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        self._keys[row] = self._property_ids[row] = None
+        for name in ("price", "area", "value"):
+            self._cols[name][row] = np.nan
+        self._free.append(row)
+
+    def _grow(self):
+        row = len(self._keys)
+        self._keys.append(None)
+        self._property_ids.append(None)
+        if row >= len(self._cols["price"]):
+            capacity = max(1024, 2 * len(self._cols["price"]))
+            for name, col in self._cols.items():
+                grown = np.full(capacity, np.nan) if col.dtype == np.float64 else np.full(capacity, -1, col.dtype)
+                grown[:len(col)] = col
+                self._cols[name] = grown
+        return row
+
+    # --- bulk computation ---
+    def _current(self):
+        """Aggregates for the current columns, recomputed when stale (caller holds the lock)."""
+        self._ensure_built()
+        agg = self._aggregates
+        if agg is None or (agg.version != self.version and time.monotonic() - agg.computed_at >= MARKET_STATS_REFRESH_S):
+            agg = self._aggregates = self._aggregate()
+        return agg
+
+    def _aggregate(self):
+        n = len(self._keys)
+        cols = {name: col[:n] for name, col in self._cols.items()}
+        price, area = cols["price"], cols["area"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ppa = np.where((price > 0) & (area > 0), price / area, np.nan)
+        priced = np.flatnonzero(np.isfinite(ppa))
+        groups = {}
+        for dimension in DIMENSIONS:
+            codes = cols[dimension][priced]
+            rows = priced[codes >= 0]
+            groups[dimension] = GroupStats(cols[dimension][rows], ppa[rows], price[rows], cols["value"][rows],
+                                           len(self._codes[dimension].names))
+
+        # Fences of each priced listing's district, or of its state for small districts
+        district, state, values = cols["district"][priced], cols["state"][priced], ppa[priced]
+        low, high = groups["district"].fences(district)
+        by_state = np.isnan(low)
+        state_low, state_high = groups["state"].fences(state)
+        low[by_state], high[by_state] = state_low[by_state], state_high[by_state]
+        flags = np.where(values < low, -1, np.where(values > high, 1, 0))
+
+        flagged = flags != 0
+        for dimension, stats in groups.items():
+            codes = cols[dimension][priced][flagged]
+            per_code = np.bincount(codes[codes >= 0], minlength=len(self._codes[dimension].names))
+            stats.outliers = per_code[stats.groups]
+        outliers = self._describe_outliers(groups, priced[flagged], values[flagged], flags[flagged],
+                                           by_state[flagged])
+        totals = {"listings": len(self._rows), "priced": int(len(priced)), "outliers": int(flagged.sum())}
+        return Aggregates(self.version, groups, totals, outliers, time.monotonic())
+
+    def _describe_outliers(self, groups, rows, values, flags, by_state):
+        medians = np.empty(len(rows))
+        for dimension, mask in (("district", ~by_state), ("state", by_state)):
+            stats = groups[dimension]
+            medians[mask] = stats.pct[stats.index[self._cols[dimension][rows[mask]]], 2]
+        result = []
+        for j in np.argsort(-np.abs(np.log(values / medians))):
+            row = rows[j]
+            district, state = self._cols["district"][row], self._cols["state"][row]
+            result.append({
+                "property_id": self._property_ids[row],
+                "asking_price": _round(self._cols["price"][row]),
+                "area": _round(self._cols["area"][row]),
+                "price_per_area": _round(values[j]),
+                "district": self._codes["district"].names[district][0] if district >= 0 else None,
+                "state": self._codes["state"].names[state] if state >= 0 else None,
+                "compared_with": "state" if by_state[j] else "district",
+                "group_median": _round(medians[j]),
+                "direction": "high" if flags[j] > 0 else "low",
+            })
+        return result
+
+    # --- reads ---
+    def summary(self, by="district", state=None, min_count=1):
+        """(per-group price-per-area distributions of one dimension, largest first; totals; version)."""
+        with self._lock:
+            agg = self._current()
+            stats, names = agg.groups[by], self._codes[by].names
+            result = []
+            for i, code in enumerate(stats.groups.tolist()):
+                if stats.counts[i] < min_count:
+                    continue
+                label = {"district": names[code][0], "state": names[code][1]} if by == "district" else {by: names[code]}
+                if state and by != "category" and (label["state"] or "").lower() != state.lower():
+                    continue
+                result.append({**label, **stats.describe(i)})
+            result.sort(key=lambda g: -g["count"])
+            return result, dict(agg.totals), agg.version
+
+    def outliers(self, limit=100):
+        """Listings outside their group's fences, furthest from the group median first."""
+        with self._lock:
+            return self._current().outliers[:limit]
+
+    def check_price(self, entry, price):
+        """How an asking price for a property compares with listed properties of its district (or state)."""
+        area = entry_area(entry)
+        if not area or area <= 0 or not price or price <= 0:
+            metrics.inc("blockestate_market_price_checks_total", ("no_data",))
+            return {"result": "no_data", "reason": "area unknown"}
+        ppa = price / area
+        keys = group_keys(entry)
+        with self._lock:
+            agg = self._current()
+            for dimension in ("district", "state"):
+                group = agg.groups[dimension]
+                i = group.find(self._codes[dimension].get(keys[dimension]))
+                if i >= 0 and group.counts[i] >= MARKET_MIN_GROUP:
+                    break
+            else:
+                metrics.inc("blockestate_market_price_checks_total", ("no_data",))
+                return {"result": "no_data", "reason": "too few comparable listings",
+                        "price_per_area": _round(ppa)}
+            result = "high" if ppa > group.high[i] else "low" if ppa < group.low[i] else "ok"
+            key = keys[dimension]
+            metrics.inc("blockestate_market_price_checks_total", (result,))
+            return {
+                "result": result,
+                "price_per_area": _round(ppa),
+                "percentile": _round(group.rank(i, ppa), 1),
+                "compared_with": {"district": key[0], "state": key[1]} if dimension == "district" else {"state": key},
+                "market": group.describe(i),
+            }
+
+
+stats = MarketStats()
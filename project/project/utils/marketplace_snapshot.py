@@ -0,0 +1,268 @@
+"""
+Materialized marketplace read model.
+
+The marketplace used to be recomputed on every GET by joining registered_for_sale to
+property_details (1 + N backend calls). MarketplaceSnapshot keeps the joined result in
+process memory instead:
+
+- built once, lazily, with one query for active listings and one in.(...) query per
+  100 property ids;
+- updated incrementally from cloudant_client change notifications (listing added or
+  removed, property updated), so writes made by this process are visible immediately;
+- reconciled by a background thread every MARKETPLACE_RECONCILE_S seconds (0 disables),
+  which catches writes made by other processes or outside the app. If reconciliation
+  fails the last snapshot keeps being served, flagged stale.
+
+Every change bumps `version`; together with the per-process `epoch` it is the marketplace
+ETag, so unchanged polls are answered with 304 without touching the snapshot.
+Derived indexes (search) subscribe() to per-entry changes instead of re-reading it all.
+"""
+import logging
+import threading
+import time
+import uuid
+
+from decouple import config
+
+from project.utils import cloudant_client, metrics
+from project.utils.resilience import BackendError
+
+MARKETPLACE_RECONCILE_S = config("MARKETPLACE_RECONCILE_S", default=60.0, cast=float)
+
+logger = logging.getLogger(__name__)
+
+metrics.declare_counter("blockestate_marketplace_snapshot_events_total",
+                        "Incremental updates applied to the marketplace snapshot.", ("event",))
+metrics.declare_counter("blockestate_marketplace_reconcile_total",
+                        "Marketplace snapshot rebuilds by outcome (clean, drift, failed).", ("outcome",))
+
+
+def enrich(listing, details):
+    """One marketplace entry: property details overlaid with the sale listing."""
+    property_id = listing.get("property_id")
+    if details:
+        return {
+            **details,  # All original property data
+            "asking_price": listing.get("asking_price"),
+            "listed_date": listing.get("listed_date"),
+            "sale_status": listing.get("status", "active"),
+            "listed_for_sale": True,
+            "status": "FOR_SALE"
+        }
+    # Still include basic sale info even if details missing
+    return {
+        "property_id": property_id,
+        "asking_price": listing.get("asking_price"),
+        "listed_date": listing.get("listed_date"),
+        "sale_status": listing.get("status", "active"),
+        "listed_for_sale": True,
+        "status": "FOR_SALE",
+        "title": f"Property {property_id}",
+        "location": "Details unavailable",
+        "type": "Unknown"
+    }
+
+
+def _listing_key(listing):
+    return str(listing.get("id") or listing.get("_id") or listing.get("property_id"))
+
+
+class MarketplaceSnapshot:
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.built_at = None
+        self.last_error = None
+        self._listings = {}  # listing key -> registered_for_sale row, in listing order
+        self._details = {}   # property_id -> property_details row (None if missing)
+        self._keyed = None   # materialized [(key, entry)]; rebuilt lazily after a change
+        self._items = None   # (version, entries) view of _keyed
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._building = False
+        self._pending = []   # events seen while a rebuild was fetching, replayed after the swap
+        self._reconciler = None
+        self._subscribers = []
+
+    # --- reads ---
+    def read(self):
+        """(entries, version, stale_meta); builds the snapshot on first use."""
+        keyed, version, stale = self.read_keyed()
+        with self._lock:
+            if self._items is None or self._items[0] != version:
+                self._items = (version, [entry for _, entry in keyed])
+            return self._items[1], version, stale
+
+    def read_keyed(self):
+        """([(listing key, entry)], version, stale_meta)."""
+        if self.built_at is None:
+            self.rebuild(initial=True)
+        self._ensure_reconciler()
+        with self._lock:
+            if self._keyed is None:
+                self._keyed = [(k, self._entry(k)) for k in self._listings]
+            return self._keyed, self.version, self._stale_meta()
+
+    def _entry(self, key):
+        listing = self._listings[key]
+        return enrich(listing, self._details.get(listing.get("property_id")))
+
+    def subscribe(self, listener):
+        """listener(version, [(listing key, entry or None for removed)]) after each change."""
+        if listener not in self._subscribers:
+            self._subscribers.append(listener)
+
+    def _publish(self, version, changes):
+        for listener in list(self._subscribers):
+            try:
+                listener(version, changes)
+            except Exception:
+                logger.exception("marketplace snapshot subscriber %r failed", listener)
+
+    def _stale_meta(self):
+        if self.last_error is None or self.built_at is None:
+            return None
+        return {
+            "stale": True,
+            "cached_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.built_at)),
+            "stale_age_s": round(time.time() - self.built_at, 1),
+        }
+
+    def reset(self):
+        """Forget everything; the next read rebuilds (e.g. after reseeding). Versions keep increasing."""
+        with self._build_lock, self._lock:
+            self.epoch = uuid.uuid4().hex[:8]
+            self._listings, self._details = {}, {}
+            self._keyed = self._items = None
+            self._pending = []
+            self.built_at = self.last_error = None
+
+    # --- full rebuild / reconciliation ---
+    def rebuild(self, initial=False):
+        """Reload from the backend and swap in atomically. Returns the number of drifted entries."""
+        with self._build_lock:
+            if initial and self.built_at is not None:
+                return 0  # another request finished the first build while we waited
+            with self._lock:
+                self._building = True
+                self._pending = []
+            try:
+                listings = cloudant_client.get_all_properties_for_sale()
+                details = cloudant_client.get_properties_by_ids(l.get("property_id") for l in listings)
+            except Exception as e:
+                with self._lock:
+                    self._building = False
+                    self._pending = []
+                    self.last_error = str(e)
+                metrics.inc("blockestate_marketplace_reconcile_total", ("failed",))
+                raise
+            new_listings = {_listing_key(l): l for l in listings}
+            new_details = {l.get("property_id"): details.get(str(l.get("property_id"))) for l in listings}
+            changes = None
+            with self._lock:
+                changed = self._diff(new_listings, new_details)
+                drift = len(changed)
+                if drift or self.built_at is None:
+                    self._listings, self._details = new_listings, new_details
+                    changes = self._changed(changed)
+                pending, self._pending, self._building = self._pending, [], False
+                self.built_at = time.time()
+                self.last_error = None
+        # Publish outside _build_lock: a subscriber may itself be waiting on read_keyed()
+        if changes:
+            self._publish(*changes)
+        for event, payload in pending:
+            self._apply(event, payload)
+        metrics.inc("blockestate_marketplace_reconcile_total", ("drift" if drift else "clean",))
+        if drift and self.version > 1:
+            logger.info("marketplace snapshot reconciled with %d drifted entries", drift)
+        return drift
+
+    def _diff(self, new_listings, new_details):
+        """Listing keys whose entry differs between the current and the reloaded data."""
+        changed = []
+        for k in set(new_listings) | set(self._listings):
+            old, new = self._listings.get(k), new_listings.get(k)
+            if old != new:
+                changed.append(k)
+            elif self._details.get(new.get("property_id")) != new_details.get(new.get("property_id")):
+                changed.append(k)
+        return changed
+
+    def _ensure_reconciler(self):
+        if MARKETPLACE_RECONCILE_S <= 0 or self._reconciler is not None:
+            return
+        with self._lock:
+            if self._reconciler is None:
+                self._reconciler = threading.Thread(target=self._reconcile_loop, name="marketplace-reconcile", daemon=True)
+                self._reconciler.start()
+
+    def _reconcile_loop(self):
+        while True:
+            time.sleep(MARKETPLACE_RECONCILE_S)
+            try:
+                self.rebuild()
+            except Exception as e:
+                logger.warning("marketplace reconciliation failed; serving last snapshot: %s", e)
+
+    # --- incremental maintenance ---
+    def on_change(self, event, payload):
+        """cloudant_client listener."""
+        with self._lock:
+            if self._building:
+                self._pending.append((event, payload))
+            elif self.built_at is None:
+                return  # nothing built yet; the first build reads current data
+        self._apply(event, payload)
+
+    def _apply(self, event, payload):
+        if event == "listing_added":
+            listing = payload["listing"]
+            property_id = listing.get("property_id")
+            if (listing.get("status") or "active") != "active" or not property_id:
+                return
+            with self._lock:
+                known = property_id in self._details
+            details = dict(payload["property"]) if payload.get("property") else None
+            if not known and details is None:
+                try:
+                    details = cloudant_client.get_property_by_id(property_id)
+                except BackendError as e:
+                    # The entry is served without details until the next reconciliation
+                    logger.warning("marketplace snapshot could not load %s: %s", property_id, e)
+            with self._lock:
+                key = _listing_key(listing)
+                self._listings[key] = listing
+                if not known or details is not None:
+                    self._details[property_id] = details
+                changes = self._changed([key])
+        elif event == "listing_removed":
+            with self._lock:
+                keys = [k for k, l in self._listings.items() if l.get("property_id") == payload]
+                if not keys:
+                    return
+                for k in keys:
+                    del self._listings[k]
+                self._details.pop(payload, None)
+                changes = self._changed(keys)
+        elif event == "property_updated":
+            property_id = payload.get("property_id")
+            with self._lock:
+                if property_id not in self._details:
+                    return
+                self._details[property_id] = {**(self._details[property_id] or {}), **payload}
+                changes = self._changed([k for k, l in self._listings.items() if l.get("property_id") == property_id])
+        else:
+            return
+        metrics.inc("blockestate_marketplace_snapshot_events_total", (event,))
+        self._publish(*changes)
+
+    def _changed(self, keys):
+        """Bump the version (caller holds the lock); returns (version, changes) to publish."""
+        self.version += 1
+        self._keyed = None
+        return self.version, [(k, self._entry(k) if k in self._listings else None) for k in keys]
+
+
+snapshot = MarketplaceSnapshot()
+cloudant_client.subscribe(snapshot.on_change)
@@ -0,0 +1,241 @@
+"""
+Backend-call instrumentation.
+
+Every outbound call (PostgREST, Pinata, the mint service, SMTP) is timed with
+track(system, op, table). Timings go into process-wide histograms and, when a
+request is in flight, into that request's collector. MetricsMiddleware turns the
+collector into a Server-Timing header, and metrics_view serves the aggregates in
+Prometheus text format at /metrics (ADMIN token).
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.http import HttpResponse, JsonResponse
+
+from project.utils import tracing
+from project.utils.session_tokens import token_from_request, verify_token
+
+# Prometheus default buckets (seconds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+_current = ContextVar("backend_calls", default=None)
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+# name -> {label tuple -> Histogram | int}
+_call_seconds = {}
+_call_errors = {}
+_request_seconds = {}
+_request_calls = {}
+# Counters/gauges/histograms declared by other modules: name -> (help, label names[, buckets])
+_counter_defs = {}
+_counters = {}
+_gauges = {}
+_histogram_defs = {}
+_histograms = {}
+
+
+class _Call:
+    __slots__ = ("ok", "seconds")
+
+    def __init__(self):
+        self.ok = True
+        self.seconds = 0.0
+
+
+@contextmanager
+def track(system, op, table=None):
+    """
+    Time one outbound call and trace it as a CLIENT span.
+    Set `call.ok = False` on a failed response; exceptions count as errors.
+    """
+    call = _Call()
+    attrs = {"peer.service": system, "operation": op, "db.table": table}
+    with tracing.span(f"{system} {op}" + (f" {table}" if table else ""), tracing.KIND_CLIENT, attrs) as sp:
+        started = time.perf_counter()
+        try:
+            yield call
+        except Exception:
+            call.ok = False
+            raise
+        finally:
+            call.seconds = time.perf_counter() - started
+            record_call(system, op, table, call.seconds, call.ok)
+            if sp is not None and not call.ok:
+                sp.set_error()
+
+
+def record_call(system, op, table, seconds, ok=True):
+    key = (system, op, table or "")
+    with _lock:
+        h = _call_seconds.get(key)
+        if h is None:
+            h = _call_seconds[key] = Histogram(BUCKETS)
+        h.observe(seconds)
+        if not ok:
+            _call_errors[key] = _call_errors.get(key, 0) + 1
+    calls = _current.get()
+    if calls is not None:
+        calls.append((system, op, table, seconds, ok))
+
+
+def declare_counter(name, help_text, label_names=()):
+    _counter_defs[name] = (help_text, tuple(label_names))
+
+
+def inc(name, labels=(), value=1):
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[labels] = series.get(labels, 0) + value
+
+
+def declare_histogram(name, help_text, label_names=(), buckets=BUCKETS):
+    _histogram_defs[name] = (help_text, tuple(label_names), tuple(buckets))
+
+
+def observe(name, labels, value):
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        h = series.get(labels)
+        if h is None:
+            h = series[labels] = Histogram(_histogram_defs[name][2])
+        h.observe(value)
+
+
+def register_gauge(name, help_text, label_names, collect):
+    """collect() -> {label tuple: value}, called at scrape time."""
+    _gauges[name] = (help_text, tuple(label_names), collect)
+
+
+def current_calls():
+    """Calls recorded so far for the request being served on this thread/task (or None)."""
+    return _current.get()
+
+
+def _server_timing(calls, total_seconds):
+    by_system = {}
+    for system, _, _, seconds, _ in calls:
+        n, dur = by_system.get(system, (0, 0.0))
+        by_system[system] = (n + 1, dur + seconds)
+    parts = [f'{system};dur={dur * 1000:.2f};desc="{n} calls"' for system, (n, dur) in sorted(by_system.items())]
+    parts.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """Collect per-request backend calls, add a Server-Timing header and feed request histograms."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        calls = []
+        token = _current.set(calls)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        route = match.route if match else "unmatched"
+        if route != "metrics":
+            with _lock:
+                key = (route, request.method, str(response.status_code))
+                h = _request_seconds.get(key)
+                if h is None:
+                    h = _request_seconds[key] = Histogram(BUCKETS)
+                h.observe(elapsed)
+                h = _request_calls.get(route)
+                if h is None:
+                    h = _request_calls[route] = Histogram(CALL_COUNT_BUCKETS)
+                h.observe(len(calls))
+        response["Server-Timing"] = _server_timing(calls, elapsed)
+        return response
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    inner = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + inner + "}" if inner else ""
+
+
+def _render_histogram(lines, name, help_text, label_names, series):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, h in sorted(series.items()):
+        labels = labels if isinstance(labels, tuple) else (labels,)
+        for bound, count in zip(h.buckets, h.counts):
+            lines.append(f"{name}_bucket{_labels(label_names + ('le',), labels + (bound,))} {count}")
+        lines.append(f"{name}_bucket{_labels(label_names + ('le',), labels + ('+Inf',))} {h.total}")
+        lines.append(f"{name}_sum{_labels(label_names, labels)} {h.sum:.6f}")
+        lines.append(f"{name}_count{_labels(label_names, labels)} {h.total}")
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        _render_histogram(lines, "blockestate_backend_call_duration_seconds",
+                          "Outbound backend call latency by system, operation and table.",
+                          ("system", "op", "table"), _call_seconds)
+        lines.append("# HELP blockestate_backend_call_errors_total Failed outbound backend calls.")
+        lines.append("# TYPE blockestate_backend_call_errors_total counter")
+        for key, n in sorted(_call_errors.items()):
+            lines.append(f"blockestate_backend_call_errors_total{_labels(('system', 'op', 'table'), key)} {n}")
+        _render_histogram(lines, "blockestate_http_request_duration_seconds",
+                          "Django request latency by route, method and status.",
+                          ("route", "method", "status"), _request_seconds)
+        _render_histogram(lines, "blockestate_backend_calls_per_request",
+                          "Number of outbound backend calls made while serving one request.",
+                          ("route",), _request_calls)
+        for name, (help_text, label_names, _) in sorted(_histogram_defs.items()):
+            _render_histogram(lines, name, help_text, label_names, _histograms.get(name, {}))
+        for name, (help_text, label_names) in sorted(_counter_defs.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, n in sorted(_counters.get(name, {}).items()):
+                lines.append(f"{name}{_labels(label_names, labels)} {n}")
+    for name, (help_text, label_names, collect) in sorted(_gauges.items()):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in sorted(collect().items()):
+            lines.append(f"{name}{_labels(label_names, labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _call_seconds.clear()
+        _call_errors.clear()
+        _request_seconds.clear()
+        _request_calls.clear()
+        _counters.clear()
+        _histograms.clear()
+
+
+def metrics_view(request):
+    if verify_token(token_from_request(request), role="ADMIN") is None:
+        return JsonResponse({"success": False, "message": "Invalid or expired admin token"}, status=401)
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,20 @@
+import requests
+from decouple import config
+
+from project.utils.metrics import track
+from project.utils.tracing import inject_headers
+
+# Node.js Solana service (mint / transfer endpoints)
+MINT_SERVICE_URL = config("MINT_SERVICE_URL", default="http://localhost:4000").rstrip("/")
+
+
+def call_mint_service(path: str, payload: dict, timeout: int = 20) -> requests.Response:
+    """
+    POST a JSON payload to the mint service (e.g. "/mint", "/transfer") and return the raw response.
+    Network errors propagate to the caller, as with a direct requests.post.
+    """
+    op = path.strip("/")
+    with track("mint_service", op) as call:
+        resp = requests.post(f"{MINT_SERVICE_URL}/{op}", json=payload, headers=inject_headers({}), timeout=timeout)
+        call.ok = resp.ok
+    return resp
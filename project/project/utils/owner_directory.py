@@ -0,0 +1,186 @@
+"""
+Property -> owner contact directory (wallet, email, name).
+
+Resolving a seller from scratch takes the property row, up to five wallet key variants,
+the active listing as a fallback, and find_user_by_wallet over two tables and two
+casings: up to ten sequential round-trips. OwnerDirectory keeps the result per
+property_id in process memory so chat initiation resolves the seller in one lookup:
+
+- filled on first lookup (resolve()), and in the background when a property is listed
+  for sale (cloudant_client "listing_added", from the property row the listing carries);
+- set directly when ownership changes (authenticator_approve calls record_owner());
+- dropped when a property update changes the owner wallet, and after
+  OWNER_DIRECTORY_TTL_S.
+
+Change notifications only reach the process that made the write, so a transfer approved
+by another worker is seen here only once the entry expires. The TTL therefore defaults to
+the marketplace snapshot's reconcile interval (MARKETPLACE_RECONCILE_S): the seller chat
+initiation resolves is never staler than the listing the buyer is looking at.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from decouple import config
+
+from project.utils import cloudant_client, metrics
+from project.utils.resilience import BackendError
+
+OWNER_DIRECTORY_TTL_S = config("OWNER_DIRECTORY_TTL_S", default=60.0, cast=float)
+OWNER_DIRECTORY_MAX_ENTRIES = config("OWNER_DIRECTORY_MAX_ENTRIES", default=10000, cast=int)
+
+logger = logging.getLogger(__name__)
+
+metrics.declare_counter("blockestate_owner_directory_lookups_total",
+                        "Property owner lookups by result (hit, miss, not_found).", ("result",))
+
+# Schema variants observed for the owner wallet on property_details / registered_for_sale rows
+WALLET_KEYS = ("wallet", "wallet_address", "wallet_adrdess", "Wallet", "walletAddress")
+
+
+class OwnerNotFound(LookupError):
+    """The owner could not be resolved; str(e) is the client-facing reason."""
+
+
+def wallet_of(row):
+    for key in WALLET_KEYS:
+        if row and row.get(key):
+            return row[key]
+    return None
+
+
+def resolve(property_id, property_data=None):
+    """Slow path: property row (or its active listing) -> owner wallet -> user record."""
+    if property_data is None:
+        property_data = cloudant_client.get_property_by_id(property_id)
+        if not property_data:
+            raise OwnerNotFound("Property not found")
+
+    wallets = [wallet_of(property_data)]
+    sale_details = None
+    if not wallets[0]:
+        try:
+            sale_details = cloudant_client.get_property_sale_details(property_id)
+        except Exception as e:
+            logger.warning("Error fetching sale details for %s: %s", property_id, e)
+        wallets = [wallet_of(sale_details)]
+        if not wallets[0]:
+            raise OwnerNotFound("Property owner information not found")
+
+    seller_doc = None
+    try:
+        seller_doc = cloudant_client.find_user_by_wallet(wallets[0])
+    except Exception as e:
+        logger.warning("Error resolving seller by wallet: %s", e)
+    if not seller_doc:
+        # As a last resort, try the listing's wallet (it may differ in casing/value)
+        try:
+            if sale_details is None:
+                sale_details = cloudant_client.get_property_sale_details(property_id)
+            for cand in dict.fromkeys(sale_details.get(k) for k in WALLET_KEYS if sale_details and sale_details.get(k)):
+                if cand in wallets:
+                    continue
+                seller_doc = cloudant_client.find_user_by_wallet(cand)
+                if seller_doc:
+                    wallets = [cand]
+                    break
+        except Exception as e:
+            logger.warning("Secondary seller resolution failed: %s", e)
+    if not seller_doc:
+        raise OwnerNotFound("Seller not found for this property")
+
+    email = seller_doc.get("Email") or seller_doc.get("email")
+    if not email:
+        raise OwnerNotFound("Seller email not available")
+    return {
+        "wallet": wallets[0],
+        "email": email.strip().lower(),
+        "name": seller_doc.get("Name") or seller_doc.get("name"),
+    }
+
+
+class OwnerDirectory:
+    def __init__(self, ttl_s=None, max_entries=None):
+        self.ttl_s = OWNER_DIRECTORY_TTL_S if ttl_s is None else ttl_s
+        self.max_entries = max_entries or OWNER_DIRECTORY_MAX_ENTRIES
+        self._entries = OrderedDict()  # property_id -> (contact, stored_at monotonic)
+        self._lock = threading.Lock()
+
+    def get(self, property_id):
+        """Cached contact for a property, or None."""
+        key = str(property_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] >= self.ttl_s:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def lookup(self, property_id):
+        """Owner contact {"wallet", "email", "name"}; raises OwnerNotFound."""
+        contact = self.get(property_id)
+        if contact is not None:
+            metrics.inc("blockestate_owner_directory_lookups_total", ("hit",))
+            return contact
+        try:
+            contact = resolve(property_id)
+        except OwnerNotFound:
+            metrics.inc("blockestate_owner_directory_lookups_total", ("not_found",))
+            raise
+        metrics.inc("blockestate_owner_directory_lookups_total", ("miss",))
+        self._put(property_id, contact)
+        return contact
+
+    def record_owner(self, property_id, wallet, email, name=None):
+        """Ownership changed (e.g. a completed transfer): store the new owner."""
+        if not email:
+            self.invalidate(property_id)
+            return
+        self._put(property_id, {"wallet": wallet, "email": email.strip().lower(), "name": name})
+
+    def invalidate(self, property_id):
+        with self._lock:
+            self._entries.pop(str(property_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _prefill(self, property_id, property_data):
+        try:
+            contact = resolve(property_id, property_data or None)
+            if self.get(property_id) is None:  # record_owner() may have run meanwhile
+                self._put(property_id, contact)
+        except (OwnerNotFound, BackendError) as e:
+            logger.info("owner of listed property %s not cached: %s", property_id, e)
+
+    def _put(self, property_id, contact):
+        with self._lock:
+            self._entries[str(property_id)] = (contact, time.monotonic())
+            self._entries.move_to_end(str(property_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def on_change(self, event, payload):
+        """cloudant_client listener."""
+        if event == "listing_added":
+            property_id = payload["listing"].get("property_id")
+            if not property_id or self.get(property_id) is not None:
+                return
+            # Listeners run inside the listing write (under the property lock): resolve off-thread
+            threading.Thread(target=self._prefill, args=(property_id, payload.get("property")),
+                             name="owner-directory-prefill", daemon=True).start()
+        elif event == "property_updated":
+            property_id = payload.get("property_id")
+            wallet = wallet_of(payload)
+            cached = self.get(property_id) if property_id else None
+            if cached is not None and wallet and wallet != cached["wallet"]:
+                self.invalidate(property_id)
+
+
+directory = OwnerDirectory()
+cloudant_client.subscribe(directory.on_change)
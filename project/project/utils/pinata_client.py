@@ -1,17 +1,23 @@
 import requests
 import json
+import logging
 from decouple import config
 
+from project.utils.metrics import track
+from project.utils.tracing import inject_headers
+
 # Optional: Set PINATA_JWT in your .env. If not set, it will mock the IPFS upload.
 PINATA_JWT = config("PINATA_JWT", default="")
 
+logger = logging.getLogger(__name__)
+
 def upload_json_to_ipfs(json_metadata: dict) -> str:
     """
     Uploads a JSON payload to Pinata IPFS pinning service.
     Returns the IPFS URI, e.g. "ipfs://bafkreib..."
     """
     if not PINATA_JWT:
-        print("WARNING: PINATA_JWT not set in .env. Falling back to a mock IPFS CID for Hackathon testing.")
+        logger.warning("PINATA_JWT not set; falling back to a mock IPFS CID")
         return "ipfs://bafkreicpccq4pkz4e5bh7bcdqdogieulh2277774kkwnntj5xz7ob1byzi"
     
     url = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
@@ -31,7 +37,9 @@ def upload_json_to_ipfs(json_metadata: dict) -> str:
     })
     
     try:
-        response = requests.post(url, headers=headers, data=payload, timeout=10)
+        with track("pinata", "pin_json") as call:
+            response = requests.post(url, headers=inject_headers(headers), data=payload, timeout=10)
+            call.ok = response.ok
         response.raise_for_status()
         data = response.json()
         cid = data.get("IpfsHash")
@@ -40,6 +48,6 @@ def upload_json_to_ipfs(json_metadata: dict) -> str:
         
         return f"ipfs://{cid}"
     except Exception as e:
-        print(f"Error uploading to Pinata: {e}")
+        logger.error("Error uploading to Pinata: %s", e)
         # Fallback fake hash for resilience
         return "ipfs://bafkreicpccq4pkz4e5bh7bcdqdogieulh2277774kkwnntj5xz7ob1byzi"
@@ -0,0 +1,411 @@
+"""
+Offline stand-in for the Supabase PostgREST API, backed by SQLite.
+
+It is mounted as a requests transport adapter on the data client's session, so
+cloudant_client (and everything above it) runs unchanged without a network.
+Only the PostgREST subset the client uses is implemented:
+
+  filters   eq, neq, gt, gte, lt, lte, is, in, cs, or=(...)
+  modifiers select, order, limit, offset, on_conflict (GETs capped at max_rows, if set)
+  methods   GET, HEAD, POST (single, bulk or upsert), PATCH and DELETE with filters
+  Prefer    return=representation|minimal, count=exact,
+            resolution=merge-duplicates|ignore-duplicates
+
+Each table is stored as one JSON document per row and filtered with SQLite's
+json_extract; an expression index is created the first time a column is filtered.
+Column defaults the Supabase schema declares are mirrored in COLUMN_DEFAULTS, and a
+POST with on_conflict treats those columns as a unique key.
+Set POSTGREST_STUB=<sqlite path or :memory:> (and optionally
+POSTGREST_STUB_LATENCY_MS / POSTGREST_STUB_JITTER_MS) to enable it.
+"""
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qsl
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+STUB_BASE_URL = "http://postgrest.stub/rest/v1"
+
+_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_ ]*$")
+_MODIFIERS = {"select", "order", "limit", "offset", "on_conflict"}
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+def _utcnow():
+    """timestamptz default now(), as PostgREST renders it."""
+    return datetime.now(timezone.utc).isoformat()
+
+
+# Column defaults declared in the Supabase schema, applied to inserted rows that omit them
+COLUMN_DEFAULTS = {
+    "property_chats": {"status": "active", "created_at": _now, "last_message_at": _now},
+    "transaction_events": {"recorded_at": _utcnow},
+}
+
+
+class StubError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _check_name(name):
+    if not _NAME_RE.match(name or ""):
+        raise StubError(f"invalid identifier: {name!r}")
+    return name
+
+
+def _col(name):
+    return f"json_extract(doc, '$.\"{_check_name(name)}\"')"
+
+
+def _text_col(name):
+    return f"CAST({_col(name)} AS TEXT)"
+
+
+def _scalar(raw):
+    """PostgREST filter values are text; booleans compare as SQLite's 1/0."""
+    if raw == "true":
+        return "1"
+    if raw == "false":
+        return "0"
+    return raw
+
+
+def _split_top(s, sep=","):
+    """Split on sep, ignoring separators nested inside (), {} or double quotes."""
+    parts, depth, quoted, cur = [], 0, False, []
+    for ch in s:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch in "({":
+            depth += 1
+        elif not quoted and ch in ")}":
+            depth -= 1
+        if ch == sep and depth == 0 and not quoted:
+            parts.append("".join(cur))
+            cur = []
+        else:
+            cur.append(ch)
+    parts.append("".join(cur))
+    return parts
+
+
+def _list_values(raw, open_ch, close_ch):
+    raw = raw.strip()
+    if not (raw.startswith(open_ch) and raw.endswith(close_ch)):
+        raise StubError(f"malformed list: {raw}")
+    inner = raw[1:-1]
+    if not inner:
+        return []
+    return [v.strip().strip('"') for v in _split_top(inner)]
+
+
+class PostgrestStub:
+    """SQLite-backed PostgREST subset. Thread-safe; latency is injected outside the lock."""
+
+    def __init__(self, db_path=":memory:", latency_ms=0.0, jitter_ms=0.0, seed=0):
+        self.db_path = db_path
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        if db_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._tables = set()
+        self._indexes = set()
+        self.request_count = 0
+        # Set to an HTTP status (e.g. 503) to simulate a backend outage for every request
+        self.outage_status = None
+        # Like PostgREST's db-max-rows: GETs return at most this many rows (0 = unlimited)
+        self.max_rows = 0
+
+    # --- storage ---
+    def _ensure_table(self, table):
+        if table in self._tables:
+            return
+        _check_name(table)
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (_rowid INTEGER PRIMARY KEY, doc TEXT NOT NULL)')
+        self._tables.add(table)
+
+    def _ensure_index(self, table, column):
+        key = (table, column)
+        if key in self._indexes:
+            return
+        ix = re.sub(r"\W", "_", f"ix_{table}_{column}")
+        self._conn.execute(f'CREATE INDEX IF NOT EXISTS "{ix}" ON "{table}" ({_text_col(column)})')
+        # Give the planner selectivity stats (as Postgres has), so a selective in.(...) filter
+        # is not planned on a low-cardinality column such as status
+        self._conn.execute(f'ANALYZE "{ix}"')
+        self._indexes.add(key)
+
+    def reset(self):
+        with self._lock:
+            for table in list(self._tables):
+                self._conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+            self._conn.commit()
+            self._tables.clear()
+            self._indexes.clear()
+
+    def load_rows(self, table, rows):
+        """Bulk-load rows directly (bypasses HTTP); missing ids are assigned sequentially."""
+        with self._lock:
+            return self._insert_rows(table, rows)
+
+    # --- filters ---
+    def _condition(self, table, column, expr, args):
+        op, _, raw = expr.partition(".")
+        negate = False
+        if op == "not":
+            negate = True
+            op, _, raw = raw.partition(".")
+        if op in ("eq", "neq", "gt", "gte", "lt", "lte"):
+            self._ensure_index(table, column)
+            sql_op = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}[op]
+            if op in ("eq", "neq"):
+                args.append(_scalar(raw))
+                cond = f"{_text_col(column)} {sql_op} ?"
+            else:
+                args.append(float(raw) if re.match(r"^-?\d+(\.\d+)?$", raw) else raw)
+                cond = f"{_col(column)} {sql_op} ?"
+        elif op == "is":
+            if raw not in ("null", "true", "false"):
+                raise StubError(f"unsupported is.{raw}")
+            cond = f"{_col(column)} IS NULL" if raw == "null" else f"{_col(column)} = {1 if raw == 'true' else 0}"
+        elif op == "in":
+            self._ensure_index(table, column)
+            values = [_scalar(v) for v in _list_values(raw, "(", ")")]
+            if not values:
+                cond = "0"
+            else:
+                args.extend(values)
+                cond = f"{_text_col(column)} IN ({','.join('?' * len(values))})"
+        elif op == "cs":
+            values = _list_values(raw, "{", "}") if raw.startswith("{") else json.loads(raw)
+            if not values:
+                cond = "1"
+            else:
+                parts = []
+                for v in values:
+                    args.append(v)
+                    parts.append(f"EXISTS (SELECT 1 FROM json_each(doc, '$.\"{_check_name(column)}\"') WHERE value = ?)")
+                cond = " AND ".join(parts)
+        else:
+            raise StubError(f"unsupported operator: {op}")
+        return f"NOT ({cond})" if negate else cond
+
+    def _or_condition(self, table, raw, args):
+        parts = []
+        for term in _list_values(raw, "(", ")"):
+            column, _, expr = term.partition(".")
+            parts.append(self._condition(table, column, expr, args))
+        return "(" + " OR ".join(parts) + ")" if parts else "1"
+
+    def _where(self, table, params):
+        conds, args = [], []
+        for key, value in params:
+            if key in _MODIFIERS:
+                continue
+            if key == "or":
+                conds.append(self._or_condition(table, value, args))
+            else:
+                conds.append(self._condition(table, key, value, args))
+        return (" WHERE " + " AND ".join(conds)) if conds else "", args
+
+    def _order(self, params):
+        order = dict(params).get("order")
+        if not order:
+            return " ORDER BY _rowid"
+        terms = []
+        for term in order.split(","):
+            bits = term.split(".")
+            direction = "DESC" if "desc" in bits[1:] else "ASC"
+            nulls = ""
+            if "nullslast" in bits[1:]:
+                nulls = " NULLS LAST"
+            elif "nullsfirst" in bits[1:]:
+                nulls = " NULLS FIRST"
+            terms.append(f"{_col(bits[0])} {direction}{nulls}")
+        return " ORDER BY " + ", ".join(terms) + ", _rowid"
+
+    @staticmethod
+    def _project(doc, select):
+        if not select or select == "*":
+            return doc
+        cols = [c.strip() for c in select.split(",") if c.strip()]
+        if any("(" in c for c in cols):
+            raise StubError("embedded resources are not supported by the stub")
+        return {c: doc.get(c) for c in cols}
+
+    # --- operations ---
+    def _fetch(self, table, params, for_update=False):
+        self._ensure_table(table)
+        where, args = self._where(table, params)
+        p = dict(params)
+        sql = f'SELECT _rowid, doc FROM "{table}"{where}'
+        if not for_update:
+            sql += self._order(params)
+            limit = int(p["limit"]) if p.get("limit") else None
+            if self.max_rows:
+                limit = min(limit or self.max_rows, self.max_rows)
+            if limit is not None:
+                sql += f" LIMIT {limit}"
+                if p.get("offset"):
+                    sql += f" OFFSET {int(p['offset'])}"
+            elif p.get("offset"):
+                sql += f" LIMIT -1 OFFSET {int(p['offset'])}"
+        return [(rid, json.loads(doc)) for rid, doc in self._conn.execute(sql, args)]
+
+    def _count(self, table, params):
+        self._ensure_table(table)
+        where, args = self._where(table, params)
+        return self._conn.execute(f'SELECT COUNT(*) FROM "{table}"{where}', args).fetchone()[0]
+
+    def _insert_rows(self, table, rows):
+        self._ensure_table(table)
+        next_id = self._conn.execute(f'SELECT COALESCE(MAX(_rowid), 0) FROM "{table}"').fetchone()[0] + 1
+        defaults = COLUMN_DEFAULTS.get(table, {})
+        out, batch = [], []
+        for row in rows:
+            doc = dict(row)
+            for column, default in defaults.items():
+                if column not in doc:
+                    doc[column] = default() if callable(default) else default
+            if doc.get("id") is None:
+                doc["id"] = next_id
+            batch.append((next_id, json.dumps(doc)))
+            out.append(doc)
+            next_id += 1
+        self._conn.executemany(f'INSERT INTO "{table}" (_rowid, doc) VALUES (?, ?)', batch)
+        self._conn.commit()
+        return out
+
+    def _update_rows(self, table, params, patch):
+        matched = self._fetch(table, params, for_update=True)
+        out = []
+        for rid, doc in matched:
+            doc.update(patch)
+            out.append((rid, doc))
+        self._conn.executemany(f'UPDATE "{table}" SET doc = ? WHERE _rowid = ?', [(json.dumps(d), rid) for rid, d in out])
+        self._conn.commit()
+        return [d for _, d in out]
+
+    def _upsert_rows(self, table, rows, on_conflict, resolution):
+        """Insert rows; a row whose on_conflict columns match an existing row is merged, skipped or rejected."""
+        self._ensure_table(table)
+        keys = [_check_name(k.strip()) for k in on_conflict.split(",")]
+        out = []
+        for row in rows:
+            match = [(k, f"eq.{row.get(k)}") for k in keys]
+            if not self._fetch(table, match, for_update=True):
+                out.extend(self._insert_rows(table, [row]))
+            elif resolution == "merge-duplicates":
+                out.extend(self._update_rows(table, match, row))
+            elif resolution != "ignore-duplicates":
+                raise StubError(f"duplicate key value violates unique constraint on {table} ({on_conflict})", status=409)
+        return out
+
+    def _delete_rows(self, table, params):
+        matched = self._fetch(table, params, for_update=True)
+        self._conn.executemany(f'DELETE FROM "{table}" WHERE _rowid = ?', [(rid,) for rid, _ in matched])
+        self._conn.commit()
+        return [d for _, d in matched]
+
+    def handle(self, method, table, params, headers, body):
+        """Execute one request; returns (status, headers, json-serialisable body or None)."""
+        prefer = (headers.get("Prefer") or "").lower()
+        select = dict(params).get("select")
+        out_headers = {"Content-Type": "application/json; charset=utf-8"}
+        with self._lock:
+            self.request_count += 1
+            if method in ("GET", "HEAD"):
+                rows = [self._project(d, select) for _, d in self._fetch(table, params)]
+                if "count=exact" in prefer:
+                    total = self._count(table, params)
+                    offset = int(dict(params).get("offset") or 0)
+                    span = f"{offset}-{offset + len(rows) - 1}" if rows else "*"
+                    out_headers["Content-Range"] = f"{span}/{total}"
+                return 200, out_headers, (None if method == "HEAD" else rows)
+            if method == "POST":
+                payload = body if isinstance(body, list) else [body]
+                on_conflict = dict(params).get("on_conflict")
+                if on_conflict:
+                    resolution = next((p.split("=", 1)[1] for p in prefer.replace(" ", "").split(",")
+                                       if p.startswith("resolution=")), None)
+                    rows = self._upsert_rows(table, payload, on_conflict, resolution)
+                else:
+                    rows = self._insert_rows(table, payload)
+                if "return=minimal" in prefer:
+                    return 201, out_headers, None
+                return 201, out_headers, [self._project(d, select) for d in rows]
+            if method == "PATCH":
+                rows = self._update_rows(table, params, body or {})
+                if "return=minimal" in prefer:
+                    return 204, out_headers, None
+                return 200, out_headers, [self._project(d, select) for d in rows]
+            if method == "DELETE":
+                rows = self._delete_rows(table, params)
+                if "return=representation" in prefer:
+                    return 200, out_headers, rows
+                return 204, out_headers, None
+        raise StubError(f"method not allowed: {method}", status=405)
+
+    def sleep(self):
+        delay = self.latency_ms
+        if self.jitter_ms:
+            with self._lock:
+                delay += self._rng.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+
+class PostgrestStubAdapter(BaseAdapter):
+    """requests transport adapter that answers PostgREST calls from a PostgrestStub."""
+
+    def __init__(self, stub):
+        super().__init__()
+        self.stub = stub
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        table = parts.path.rstrip("/").rsplit("/", 1)[-1]
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        body = None
+        if request.body:
+            raw = request.body.decode("utf-8") if isinstance(request.body, bytes) else request.body
+            body = json.loads(raw)
+
+        self.stub.sleep()
+        try:
+            if self.stub.outage_status:
+                raise StubError("simulated outage", status=self.stub.outage_status)
+            status, headers, payload = self.stub.handle(request.method, table, params, request.headers, body)
+        except (StubError, ValueError, sqlite3.Error) as e:
+            status = getattr(e, "status", 400)
+            headers = {"Content-Type": "application/json; charset=utf-8"}
+            payload = {"message": str(e)}
+
+        resp = requests.Response()
+        resp.status_code = status
+        resp.headers = CaseInsensitiveDict(headers)
+        resp._content = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        resp.encoding = "utf-8"
+        resp.url = request.url
+        resp.request = request
+        resp.reason = "OK" if status < 400 else "Error"
+        return resp
+
+    def close(self):
+        pass
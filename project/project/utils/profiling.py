@@ -0,0 +1,136 @@
+"""
+On-demand request profiling.
+
+ProfilingMiddleware runs cProfile around a request when either
+  - the request carries "X-Profile: <token>" where the token was issued with role PROFILER
+    (python manage.py profile_report --issue-token), or
+  - it is picked by random sampling (PROFILE_SAMPLE_RATE, 0.0-1.0; default off).
+Each captured profile is written to PROFILE_DIR as <id>.prof (pstats format) plus an
+<id>.json sidecar with the URL, method, status and timing. The profile_report
+management command lists captures and summarises hot functions across them.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from decouple import config
+from django.conf import settings
+
+from project.utils.session_tokens import verify_token
+
+PROFILE_SAMPLE_RATE = config("PROFILE_SAMPLE_RATE", default=0.0, cast=float)
+PROFILE_DIR = Path(config("PROFILE_DIR", default=str(Path(settings.BASE_DIR) / "profiles")))
+PROFILE_HEADER = "X-Profile"
+PROFILER_ROLE = "PROFILER"
+
+logger = logging.getLogger(__name__)
+
+
+def _should_profile(request):
+    token = request.headers.get(PROFILE_HEADER)
+    if token:
+        return verify_token(token, role=PROFILER_ROLE) is not None
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    """Profile selected requests with cProfile and store the result on disk."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _should_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread; serve the request unprofiled
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        elapsed = time.perf_counter() - started
+
+        try:
+            profile_id = _save(profiler, request, response, elapsed)
+            response["X-Profile-Id"] = profile_id
+        except Exception as e:
+            logger.warning("Failed to store request profile: %s", e)
+        return response
+
+
+def _save(profiler, request, response, elapsed):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    now = datetime.now(timezone.utc)
+    profile_id = f"{now.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    profiler.dump_stats(str(PROFILE_DIR / f"{profile_id}.prof"))
+    match = getattr(request, "resolver_match", None)
+    meta = {
+        "id": profile_id,
+        "captured_at": now.isoformat(),
+        "method": request.method,
+        "path": request.get_full_path(),
+        "route": match.route if match else None,
+        "status": response.status_code,
+        "duration_ms": round(elapsed * 1000, 3),
+        "trigger": "header" if request.headers.get(PROFILE_HEADER) else "sample",
+        "pid": os.getpid(),
+    }
+    (PROFILE_DIR / f"{profile_id}.json").write_text(json.dumps(meta, indent=2))
+    return profile_id
+
+
+def list_profiles(path_filter=None, directory=None):
+    """Metadata of captured profiles, newest first, optionally filtered by a path substring."""
+    directory = Path(directory or PROFILE_DIR)
+    if not directory.exists():
+        return []
+    out = []
+    for meta_file in directory.glob("*.json"):
+        try:
+            meta = json.loads(meta_file.read_text())
+        except (OSError, ValueError):
+            continue
+        if path_filter and path_filter not in (meta.get("path") or ""):
+            continue
+        if (directory / f"{meta.get('id')}.prof").exists():
+            out.append(meta)
+    return sorted(out, key=lambda m: m.get("captured_at") or "", reverse=True)
+
+
+def hot_functions(profile_ids, sort="tottime", limit=25, directory=None):
+    """
+    Merge the given captures and return the top functions as dicts
+    (function, calls, tottime_s, cumtime_s), sorted by tottime or cumtime.
+    """
+    directory = Path(directory or PROFILE_DIR)
+    files = [str(directory / f"{pid}.prof") for pid in profile_ids]
+    if not files:
+        return []
+    stats = pstats.Stats(files[0])
+    for f in files[1:]:
+        stats.add(f)
+    rows = []
+    for (filename, line, func), (_, nc, tt, ct, _callers) in stats.stats.items():
+        rows.append({
+            "function": f"{Path(filename).name}:{line}({func})" if line else func,
+            "file": filename,
+            "calls": nc,
+            "tottime_s": tt,
+            "cumtime_s": ct,
+        })
+    key = "cumtime_s" if sort == "cumtime" else "tottime_s"
+    rows.sort(key=lambda r: r[key], reverse=True)
+    return rows[:limit]
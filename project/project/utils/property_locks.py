@@ -0,0 +1,147 @@
+"""
+Per-property mutual exclusion for views that change a property or its listing.
+
+    with property_locks.hold(property_id, "flag_for_sale"):
+        ...read, check, write...
+
+Two layers, taken in this order:
+- a process-local striped lock (PROPERTY_LOCK_STRIPES locks, chosen by a stable hash
+  of the property_id), so threads of one worker queue without touching the backend;
+- with PROPERTY_LOCK_BACKEND=postgrest, an advisory lease row in property_locks
+  (cloudant_client.try_acquire_property_lease), so every worker and host is serialized.
+  A lease expires after PROPERTY_LOCK_LEASE_S, so a crashed worker cannot hold a
+  property forever; keep it above the slowest locked operation (the mint call).
+
+hold() raises PropertyBusy if the lock is not obtained within timeout_s
+(PROPERTY_LOCK_TIMEOUT_S by default; 0 = try once). A thread that already holds a
+property may hold it again. Wait times are exported per operation as the
+blockestate_property_lock_wait_seconds histogram.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+
+from decouple import config
+
+from project.utils import cloudant_client, metrics
+from project.utils.resilience import BackendError
+
+PROPERTY_LOCK_STRIPES = config("PROPERTY_LOCK_STRIPES", default=256, cast=int)
+PROPERTY_LOCK_TIMEOUT_S = config("PROPERTY_LOCK_TIMEOUT_S", default=10.0, cast=float)
+PROPERTY_LOCK_BACKEND = config("PROPERTY_LOCK_BACKEND", default="local")
+PROPERTY_LOCK_LEASE_S = config("PROPERTY_LOCK_LEASE_S", default=60.0, cast=float)
+
+logger = logging.getLogger(__name__)
+
+metrics.declare_histogram("blockestate_property_lock_wait_seconds",
+                          "Time spent waiting for a per-property lock, by operation.", ("op",),
+                          buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+metrics.declare_counter("blockestate_property_lock_acquisitions_total",
+                        "Per-property lock requests by operation and result (uncontended, contended, timeout).",
+                        ("op", "result"))
+
+
+class PropertyBusy(Exception):
+    """Another operation on the property held its lock for longer than the caller would wait."""
+
+
+class StripedLocks:
+    def __init__(self, stripes):
+        self._locks = [threading.RLock() for _ in range(max(1, stripes))]
+
+    def for_key(self, key):
+        return self._locks[zlib.crc32(key.encode("utf-8")) % len(self._locks)]
+
+
+class PostgrestLeases:
+    """Advisory locks as lease rows, shared through the data backend."""
+
+    def __init__(self, lease_s):
+        self.lease_s = lease_s
+
+    def try_acquire(self, key, token):
+        now = time.time()
+        return cloudant_client.try_acquire_property_lease(key, token, now + self.lease_s, now)
+
+    def release(self, key, token):
+        cloudant_client.release_property_lease(key, token)
+
+
+class PropertyLockManager:
+    def __init__(self, stripes=None, backend=None, timeout_s=None):
+        self._stripes = StripedLocks(stripes or PROPERTY_LOCK_STRIPES)
+        self.backend = backend
+        self.timeout_s = PROPERTY_LOCK_TIMEOUT_S if timeout_s is None else timeout_s
+        self._local = threading.local()
+
+    def _held(self):
+        held = getattr(self._local, "held", None)
+        if held is None:
+            held = self._local.held = set()
+        return held
+
+    @contextmanager
+    def hold(self, property_id, op, timeout_s=None):
+        key = str(property_id)
+        held = self._held()
+        if key in held:
+            yield
+            return
+        timeout_s = self.timeout_s if timeout_s is None else timeout_s
+        started = time.monotonic()
+        deadline = started + timeout_s
+
+        stripe = self._stripes.for_key(key)
+        contended = not stripe.acquire(blocking=False)
+        if contended and (timeout_s <= 0 or not stripe.acquire(timeout=timeout_s)):
+            self._timed_out(op, started)
+            raise PropertyBusy(f"property {key} is locked by another {op or 'operation'}")
+        try:
+            token = None
+            if self.backend is not None:
+                token = uuid.uuid4().hex
+                delay = 0.01
+                while not self.backend.try_acquire(key, token):
+                    contended = True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timed_out(op, started)
+                        raise PropertyBusy(f"property {key} is locked by another worker")
+                    time.sleep(min(remaining, delay * random.uniform(0.5, 1.5)))
+                    delay = min(delay * 2, 0.25)
+            metrics.observe("blockestate_property_lock_wait_seconds", (op,), time.monotonic() - started)
+            metrics.inc("blockestate_property_lock_acquisitions_total", (op, "contended" if contended else "uncontended"))
+            held.add(key)
+            try:
+                yield
+            finally:
+                held.discard(key)
+                if token is not None:
+                    try:
+                        self.backend.release(key, token)
+                    except BackendError as e:
+                        # The lease still expires after PROPERTY_LOCK_LEASE_S
+                        logger.warning("Failed to release lock on property %s: %s", key, e)
+        finally:
+            stripe.release()
+
+    @staticmethod
+    def _timed_out(op, started):
+        metrics.observe("blockestate_property_lock_wait_seconds", (op,), time.monotonic() - started)
+        metrics.inc("blockestate_property_lock_acquisitions_total", (op, "timeout"))
+
+
+def _make_backend(name):
+    if name == "local":
+        return None
+    if name == "postgrest":
+        return PostgrestLeases(PROPERTY_LOCK_LEASE_S)
+    raise ValueError(f"Unknown PROPERTY_LOCK_BACKEND {name!r} (expected 'local' or 'postgrest')")
+
+
+manager = PropertyLockManager(backend=_make_backend(PROPERTY_LOCK_BACKEND))
+hold = manager.hold
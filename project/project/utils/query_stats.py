@@ -0,0 +1,202 @@
+"""
+Query statistics and slow-query log for the data client.
+
+Every PostgREST call made by cloudant_client is recorded under a normalized
+"shape" (table + operation + filter columns/operators, values stripped), with
+call count, total/max latency, rows and bytes. Stats live in a rolling two-window
+in-memory table (QUERY_STATS_WINDOW_S) so old traffic ages out. Calls slower than
+SLOW_QUERY_MS are logged with their full parameters.
+
+The stats are served as JSON at /query-stats (Bearer token for role ADMIN) and
+printed by the query_report management command, with the filtered columns of
+each shape listed as index candidates.
+"""
+import logging
+import threading
+import time
+
+from decouple import config
+from django.http import JsonResponse
+
+from project.utils.session_tokens import token_from_request, verify_token
+
+SLOW_QUERY_MS = config("SLOW_QUERY_MS", default=200.0, cast=float)
+QUERY_STATS_WINDOW_S = config("QUERY_STATS_WINDOW_S", default=3600, cast=int)
+MAX_SHAPES = 2000
+
+logger = logging.getLogger("project.slow_queries")
+
+_MODIFIERS = {"select", "order"}
+_PAGING = {"limit", "offset"}
+_lock = threading.Lock()
+_windows = [{}, {}]  # [current, previous]
+_window_started = time.monotonic()
+
+
+def _normalize_value(value):
+    op, _, rest = str(value).partition(".")
+    if op == "not":
+        inner_op, _, _ = rest.partition(".")
+        return f"not.{inner_op}.?"
+    if op == "in":
+        return "in.(?)"
+    if op == "cs":
+        return "cs.{?}"
+    if op == "is":
+        return f"is.{rest}"
+    return f"{op}.?"
+
+
+def _split_top_level(text):
+    """Split a PostgREST logic list on commas outside parentheses and double quotes."""
+    terms, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(text):
+        if ch == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            terms.append(text[start:i])
+            start = i + 1
+    terms.append(text[start:])
+    return [t.strip() for t in terms if t.strip()]
+
+
+def _or_terms(value):
+    """
+    (column, operator) of every term of an or=(...) filter, e.g.
+    '(email.eq.a.b@c.d,and(x.gt.1,y.not.is.null))' -> [('email', 'eq'), ('x', 'gt'), ('y', 'not.is')].
+    Only the 'col.op' prefix of a term is read, so dots and commas inside values never leak into the shape.
+    """
+    text = (value or "").strip()
+    if text.startswith("(") and text.endswith(")"):
+        text = text[1:-1]
+    out = []
+    for term in _split_top_level(text):
+        head, paren, rest = term.partition("(")
+        if paren and head.rstrip(".") in ("and", "or", "not.and", "not.or"):
+            out.extend(_or_terms(rest[:-1] if rest.endswith(")") else rest))
+            continue
+        col, _, tail = term.partition(".")
+        op, _, tail = tail.partition(".")
+        if op == "not":
+            op = "not." + tail.partition(".")[0]
+        if col and op:
+            out.append((col, op))
+    return out
+
+
+def _normalize_or(value):
+    return "(" + ",".join(f"{col}.{op}.?" for col, op in _or_terms(value)) + ")"
+
+
+def normalize_shape(op, table, params=None):
+    """e.g. 'select property_details?property_id=eq.?&status=eq.?&select=id,status'"""
+    parts = []
+    for key in sorted(params or {}):
+        value = params[key]
+        if key in _MODIFIERS:
+            parts.append(f"{key}={value}")
+        elif key in _PAGING:
+            parts.append(f"{key}=?")
+        elif key == "or":
+            parts.append(f"or={_normalize_or(value)}")
+        else:
+            parts.append(f"{key}={_normalize_value(value)}")
+    return f"{op} {table}" + ("?" + "&".join(parts) if parts else "")
+
+
+def filter_columns(params):
+    cols = []
+    for key, value in (params or {}).items():
+        if key in _MODIFIERS or key in _PAGING:
+            continue
+        if key == "or":
+            cols.extend(col for col, _ in _or_terms(value))
+        else:
+            cols.append(key)
+    return sorted(set(cols))
+
+
+def _rotate(now):
+    global _window_started
+    if now - _window_started >= QUERY_STATS_WINDOW_S:
+        _windows[1] = _windows[0]
+        _windows[0] = {}
+        _window_started = now
+
+
+def record_query(op, table, params, rows, nbytes, seconds):
+    shape = normalize_shape(op, table, params)
+    ms = seconds * 1000.0
+    with _lock:
+        _rotate(time.monotonic())
+        current = _windows[0]
+        st = current.get(shape)
+        if st is None:
+            if len(current) >= MAX_SHAPES:
+                # Drop the cheapest shape so the table stays bounded
+                del current[min(current, key=lambda k: current[k]["total_ms"])]
+            st = current[shape] = {
+                "shape": shape, "table": table, "op": op, "filter_columns": filter_columns(params),
+                "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "bytes": 0, "slow": 0,
+            }
+        st["calls"] += 1
+        st["total_ms"] += ms
+        st["max_ms"] = max(st["max_ms"], ms)
+        st["rows"] += rows
+        st["bytes"] += nbytes
+        if ms >= SLOW_QUERY_MS:
+            st["slow"] += 1
+    if ms >= SLOW_QUERY_MS:
+        logger.warning("slow query %.1fms %s %s params=%s rows=%d bytes=%d", ms, op, table, params, rows, nbytes)
+
+
+def snapshot(sort="total_ms", limit=50, table=None):
+    """Merged stats from the current and previous window, as a list of dicts sorted descending."""
+    merged = {}
+    with _lock:
+        _rotate(time.monotonic())
+        for window in _windows:
+            for shape, st in window.items():
+                m = merged.get(shape)
+                if m is None:
+                    merged[shape] = dict(st)
+                    continue
+                for k in ("calls", "total_ms", "rows", "bytes", "slow"):
+                    m[k] += st[k]
+                m["max_ms"] = max(m["max_ms"], st["max_ms"])
+    rows = [st for st in merged.values() if not table or st["table"] == table]
+    for st in rows:
+        st["mean_ms"] = st["total_ms"] / st["calls"] if st["calls"] else 0.0
+        st["rows_per_call"] = st["rows"] / st["calls"] if st["calls"] else 0.0
+        st["bytes_per_call"] = st["bytes"] / st["calls"] if st["calls"] else 0.0
+    rows.sort(key=lambda st: st.get(sort, 0), reverse=True)
+    return rows[:limit]
+
+
+def reset():
+    global _window_started
+    with _lock:
+        _windows[0], _windows[1] = {}, {}
+        _window_started = time.monotonic()
+
+
+def query_stats_view(request):
+    if verify_token(token_from_request(request), role="ADMIN") is None:
+        return JsonResponse({"success": False, "message": "Invalid or expired admin token"}, status=401)
+    try:
+        limit = int(request.GET.get("limit") or 50)
+    except ValueError:
+        limit = 50
+    sort = request.GET.get("sort") or "total_ms"
+    return JsonResponse({
+        "success": True,
+        "slow_query_ms": SLOW_QUERY_MS,
+        "window_s": QUERY_STATS_WINDOW_S,
+        "queries": snapshot(sort=sort, limit=limit, table=request.GET.get("table")),
+    })
@@ -0,0 +1,213 @@
+"""
+Degraded-mode support for the data backend.
+
+- BackendError / BackendUnavailable / QueryError: the data client raises these instead
+  of returning [] so callers can tell "no rows" from "the backend failed".
+  Only BackendUnavailable (5xx, timeouts, connection errors, open breaker) means an outage;
+  QueryError is a 4xx the backend rejected and never trips the breaker.
+- CircuitBreaker: after BACKEND_BREAKER_THRESHOLD consecutive outages the breaker opens and
+  calls fail fast for BACKEND_BREAKER_RESET_S; then one trial call is let through (half-open).
+- serve_with_fallback(): keeps the last successful payload per cache key (bounded LRU) and,
+  when the backend is unavailable, serves it with a staleness flag while a background
+  thread revalidates the entry once the breaker allows traffic again.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from decouple import config
+
+from project.utils import metrics
+
+BACKEND_BREAKER_THRESHOLD = config("BACKEND_BREAKER_THRESHOLD", default=5, cast=int)
+BACKEND_BREAKER_RESET_S = config("BACKEND_BREAKER_RESET_S", default=30.0, cast=float)
+LAST_GOOD_MAX_ENTRIES = config("LAST_GOOD_MAX_ENTRIES", default=2000, cast=int)
+
+logger = logging.getLogger(__name__)
+
+metrics.declare_counter("blockestate_stale_responses_total",
+                        "Responses served from the last-known-good cache while the backend was unavailable.", ("endpoint",))
+metrics.declare_counter("blockestate_stale_revalidations_total",
+                        "Background refreshes of last-known-good entries.", ("outcome",))
+
+
+class BackendError(RuntimeError):
+    def __init__(self, message, status=None, code=None):
+        super().__init__(message)
+        self.status = status
+        self.code = code  # PostgREST / Postgres error code from the response body, e.g. "42P10"
+
+
+class BackendUnavailable(BackendError):
+    """The backend is down, overloaded or unreachable (or the breaker is open)."""
+
+
+class QueryError(BackendError):
+    """The backend rejected the request (4xx); retrying will not help."""
+
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name, threshold=None, reset_s=None):
+        self.name = name
+        self.threshold = threshold or BACKEND_BREAKER_THRESHOLD
+        self.reset_s = reset_s if reset_s is not None else BACKEND_BREAKER_RESET_S
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go to the backend now (closed, or the single half-open trial)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_s:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.warning("circuit %s closed; backend recovered", self.name)
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+                if self.state == CLOSED:
+                    logger.warning("circuit %s opened after %d consecutive failures", self.name, self.failures)
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def ready(self):
+        """Whether allow() could currently let a call through (without claiming the trial)."""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_s
+            return not (self.state == HALF_OPEN and self._trial_in_flight)
+
+    def is_open(self):
+        with self._lock:
+            return self.state != CLOSED
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+
+class LastGoodCache:
+    """Bounded LRU of key -> (payload, stored_at epoch seconds)."""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or LAST_GOOD_MAX_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, payload):
+        with self._lock:
+            self._entries[key] = (payload, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_breakers = {}
+
+
+def get_breaker(name):
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+metrics.register_gauge("blockestate_circuit_open", "1 while a backend circuit breaker is open or half-open.",
+                       ("backend",), lambda: {(name,): int(b.is_open()) for name, b in _breakers.items()})
+
+last_good = LastGoodCache()
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+
+def _revalidate(key, compute, breaker):
+    try:
+        if not breaker.ready():
+            return
+        last_good.put(key, compute())
+        metrics.inc("blockestate_stale_revalidations_total", ("ok",))
+    except BackendError as e:
+        metrics.inc("blockestate_stale_revalidations_total", ("failed",))
+        logger.info("background revalidation of %s failed: %s", key, e)
+    finally:
+        with _revalidating_lock:
+            _revalidating.discard(key)
+
+
+def _schedule_revalidation(key, compute, breaker):
+    with _revalidating_lock:
+        if key in _revalidating:
+            return
+        _revalidating.add(key)
+    # Not copy_context(): the refresh outlives the request and must not count against it
+    threading.Thread(target=_revalidate, args=(key, compute, breaker), daemon=True).start()
+
+
+def serve_with_fallback(key, compute, backend="postgrest"):
+    """
+    Return (payload, stale_meta). stale_meta is None for a fresh payload, or
+    {"stale": True, "cached_at": ..., "stale_age_s": ...} when the backend is unavailable
+    and a last-known-good payload was served instead. Re-raises if nothing is cached.
+    compute() should raise BackendUnavailable on outages, and its payload must be
+    treated as read-only once returned (it is shared with later stale reads).
+    """
+    breaker = get_breaker(backend)
+    entry = last_good.get(key)
+    if entry is not None and breaker.is_open():
+        # Skip the doomed call entirely while the breaker is open
+        _schedule_revalidation(key, compute, breaker)
+        return _stale(key, entry)
+    try:
+        payload = compute()
+    except BackendUnavailable:
+        if entry is None:
+            raise
+        _schedule_revalidation(key, compute, breaker)
+        return _stale(key, entry)
+    last_good.put(key, payload)
+    return payload, None
+
+
+def _stale(key, entry):
+    payload, stored_at = entry
+    metrics.inc("blockestate_stale_responses_total", (key.partition(":")[0],))
+    return payload, {
+        "stale": True,
+        "cached_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(stored_at)),
+        "stale_age_s": round(time.time() - stored_at, 1),
+    }
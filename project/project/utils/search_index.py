@@ -0,0 +1,289 @@
+"""
+In-process search over listed properties (GET marketplace/search/).
+
+SearchIndex is a derived view of the marketplace snapshot: it is built from the snapshot
+on first use and then maintained from the snapshot's per-entry change feed, so listing
+and property writes are searchable as soon as the snapshot sees them.
+
+- Text: an inverted index token -> {listing key: field weight} over Village, District,
+  State, Category, Current_use, type, plot_number, property_id and title. Each query
+  token matches a vocabulary token exactly, as a prefix (via a sorted vocabulary), or
+  within one edit (via a single-deletion neighbourhood map, SymSpell style). Every query
+  token must match; score = sum of field weight x match quality.
+- Numbers: asking price and area (total_area "1200 sqft" etc.) are kept in sorted arrays
+  and filtered with bisect, so range-only queries never scan all entries.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+
+from project.utils import metrics
+from project.utils.marketplace_snapshot import snapshot
+
+FIELD_WEIGHTS = {
+    "property_id": 4.0,
+    "plot_number": 4.0,
+    "Village": 3.0,
+    "District": 2.5,
+    "State": 2.0,
+    "title": 2.0,
+    "Category": 1.5,
+    "Current_use": 1.5,
+    "type": 1.5,
+}
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.5
+MIN_PREFIX_LEN = 2
+MIN_FUZZY_LEN = 4
+MAX_EXPANSIONS = 64
+SORTS = ("relevance", "price_asc", "price_desc", "area_asc", "area_desc", "newest")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+metrics.declare_counter("blockestate_search_queries_total", "Marketplace search queries.", ("kind",))
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii").lower()
+    return _TOKEN_RE.findall(text)
+
+
+def _deletes(token):
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _within_one_edit(a, b):
+    """Levenshtein distance <= 1, or a single adjacent transposition."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+def parse_number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    m = _NUMBER_RE.search(str(value or "").replace(",", ""))
+    return float(m.group()) if m else None
+
+
+def entry_area(entry):
+    for field in ("total_area", "total area", "Total_area", "Total Area", "area"):
+        if entry.get(field) not in (None, ""):
+            return parse_number(entry[field])
+    return None
+
+
+class _SortedValues:
+    """Sorted (value, key) pairs supporting incremental add/remove and range lookups."""
+
+    def __init__(self):
+        self._pairs = []
+
+    def add(self, value, key):
+        if value is not None:
+            bisect.insort(self._pairs, (value, key))
+
+    def remove(self, value, key):
+        if value is None:
+            return
+        i = bisect.bisect_left(self._pairs, (value, key))
+        if i < len(self._pairs) and self._pairs[i] == (value, key):
+            del self._pairs[i]
+
+    def range(self, low=None, high=None):
+        lo = 0 if low is None else bisect.bisect_left(self._pairs, (low, ""))
+        hi = len(self._pairs) if high is None else bisect.bisect_right(self._pairs, (high, "\uffff"))
+        return {key for _, key in self._pairs[lo:hi]}
+
+
+class SearchIndex:
+    def __init__(self, source=snapshot):
+        self.source = source
+        self.version = 0
+        self._built = False
+        self._built_version = 0
+        self._lock = threading.RLock()
+        self._clear()
+        source.subscribe(self.on_change)
+
+    def _clear(self):
+        self._docs = {}        # key -> (entry, tokens {token: weight}, price, area)
+        self._postings = {}    # token -> {key: weight}
+        self._vocab = []       # sorted tokens, for prefix expansion
+        self._deletions = {}   # single-deletion variant -> {tokens}
+        self._doc_version = {}
+        self._prices = _SortedValues()
+        self._areas = _SortedValues()
+
+    # --- maintenance ---
+    def _ensure_built(self):
+        if self._built:
+            return
+        # Read the snapshot under our lock: a change published meanwhile waits for the
+        # build and is then applied (or skipped if the build already reflects it)
+        with self._lock:
+            if self._built:
+                return
+            keyed, version, _ = self.source.read_keyed()
+            self._clear()
+            for key, entry in keyed:
+                self._upsert(key, entry, version)
+            self.version = self._built_version = version
+            self._built = True
+
+    def reset(self):
+        """Forget everything; the next search rebuilds from the snapshot."""
+        with self._lock:
+            self._clear()
+            self._built = False
+
+    def on_change(self, version, changes):
+        with self._lock:
+            if not self._built or version <= self._built_version:
+                return  # the build (first search) reads the snapshot at or after this version
+            for key, entry in changes:
+                if version < self._doc_version.get(key, 0):
+                    continue  # a newer change for this entry was already applied
+                if entry is None:
+                    self._remove(key)
+                    self._doc_version[key] = version
+                else:
+                    self._upsert(key, entry, version)
+            self.version = max(self.version, version)
+
+    def _upsert(self, key, entry, version):
+        self._remove(key)
+        tokens = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(entry.get(field) or ""):
+                tokens[token] = max(tokens.get(token, 0.0), weight)
+        price, area = parse_number(entry.get("asking_price")), entry_area(entry)
+        self._docs[key] = (entry, tokens, price, area)
+        self._doc_version[key] = version
+        for token, weight in tokens.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                bisect.insort(self._vocab, token)
+                if len(token) >= MIN_FUZZY_LEN:
+                    for variant in _deletes(token) | {token}:
+                        self._deletions.setdefault(variant, set()).add(token)
+            posting[key] = weight
+        self._prices.add(price, key)
+        self._areas.add(area, key)
+
+    def _remove(self, key):
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        _, tokens, price, area = doc
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(key, None)
+            if not posting:
+                del self._postings[token]
+                i = bisect.bisect_left(self._vocab, token)
+                if i < len(self._vocab) and self._vocab[i] == token:
+                    del self._vocab[i]
+                if len(token) >= MIN_FUZZY_LEN:
+                    for variant in _deletes(token) | {token}:
+                        bucket = self._deletions.get(variant)
+                        if bucket is not None:
+                            bucket.discard(token)
+                            if not bucket:
+                                del self._deletions[variant]
+        self._prices.remove(price, key)
+        self._areas.remove(area, key)
+
+    # --- queries ---
+    def _expand(self, qtoken):
+        """Vocabulary tokens matching one query token, with match quality."""
+        matches = {}
+        if qtoken in self._postings:
+            matches[qtoken] = EXACT
+        if len(qtoken) >= MIN_PREFIX_LEN:
+            i = bisect.bisect_left(self._vocab, qtoken)
+            n = 0
+            while i < len(self._vocab) and self._vocab[i].startswith(qtoken) and n < MAX_EXPANSIONS:
+                matches.setdefault(self._vocab[i], PREFIX)
+                i += 1
+                n += 1
+        if len(qtoken) >= MIN_FUZZY_LEN:
+            candidates = set()
+            for variant in _deletes(qtoken) | {qtoken}:
+                candidates |= self._deletions.get(variant, set())
+            for token in candidates:
+                if token not in matches and _within_one_edit(qtoken, token):
+                    matches[token] = FUZZY
+        return matches
+
+    def search(self, q="", min_price=None, max_price=None, min_area=None, max_area=None,
+               category=None, sort="relevance", page=1, page_size=20):
+        """Returns (results page, total matches, index version)."""
+        self._ensure_built()
+        with self._lock:
+            scores = None
+            for qtoken in dict.fromkeys(tokenize(q or "")):
+                token_scores = {}
+                for token, quality in self._expand(qtoken).items():
+                    for key, weight in self._postings[token].items():
+                        token_scores[key] = max(token_scores.get(key, 0.0), weight * quality)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {k: s + token_scores[k] for k, s in scores.items() if k in token_scores}
+                if not scores:
+                    break
+
+            if min_price is not None or max_price is not None:
+                in_range = self._prices.range(min_price, max_price)
+                scores = {k: 0.0 for k in in_range} if scores is None else {k: s for k, s in scores.items() if k in in_range}
+            if min_area is not None or max_area is not None:
+                in_range = self._areas.range(min_area, max_area)
+                scores = {k: 0.0 for k in in_range} if scores is None else {k: s for k, s in scores.items() if k in in_range}
+            if scores is None:
+                scores = dict.fromkeys(self._docs, 0.0)
+            if category:
+                wanted = category.strip().lower()
+                scores = {k: s for k, s in scores.items()
+                          if any(str(self._docs[k][0].get(f) or "").lower() == wanted for f in ("type", "Category", "Current_use"))}
+
+            docs = self._docs
+            if sort == "price_asc":
+                order = sorted(scores, key=lambda k: (docs[k][2] is None, docs[k][2] or 0.0, k))
+            elif sort == "price_desc":
+                order = sorted(scores, key=lambda k: (docs[k][2] is None, -(docs[k][2] or 0.0), k))
+            elif sort == "area_asc":
+                order = sorted(scores, key=lambda k: (docs[k][3] is None, docs[k][3] or 0.0, k))
+            elif sort == "area_desc":
+                order = sorted(scores, key=lambda k: (docs[k][3] is None, -(docs[k][3] or 0.0), k))
+            elif sort == "newest":
+                order = sorted(scores, key=lambda k: str(docs[k][0].get("listed_date") or ""), reverse=True)
+            else:
+                # Best score first; equal scores (e.g. filter-only queries) newest first
+                order = sorted(scores, key=lambda k: str(docs[k][0].get("listed_date") or ""), reverse=True)
+                order.sort(key=lambda k: -scores[k])
+
+            start = (page - 1) * page_size
+            results = [dict(docs[k][0], _score=round(scores[k], 3)) for k in order[start:start + page_size]]
+            metrics.inc("blockestate_search_queries_total", ("text" if q else "filter",))
+            return results, len(scores), self.version
+
+
+index = SearchIndex()
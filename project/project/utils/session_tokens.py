@@ -0,0 +1,55 @@
+import time
+
+import jwt
+from django.conf import settings
+from decouple import config
+
+# Short-lived role tokens signed with the Django SECRET_KEY (HS256).
+SESSION_TOKEN_TTL = config("SESSION_TOKEN_TTL", default=3600, cast=int)
+_ALGORITHM = "HS256"
+
+
+def issue_token(email: str, role: str, ttl: int | None = None, **extra) -> str:
+    """
+    Issue a signed token carrying the caller's email and role.
+    Verification is purely local (no backend call), so views that only need
+    to know "who is this and what role do they hold" can skip the lookup.
+    """
+    now = int(time.time())
+    payload = {
+        "sub": email,
+        "role": role,
+        "iat": now,
+        "exp": now + (ttl or SESSION_TOKEN_TTL),
+    }
+    payload.update(extra)
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm=_ALGORITHM)
+
+
+def verify_token(token: str, role: str | None = None) -> dict | None:
+    """
+    Return the token claims if the signature is valid and it has not expired.
+    If role is given, the token's role must contain it (case-insensitive).
+    Returns None for any invalid, expired or mismatching token.
+    """
+    if not token:
+        return None
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[_ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    if role and role.upper() not in str(claims.get("role") or "").upper():
+        return None
+    return claims
+
+
+def token_from_request(request, body: dict | None = None) -> str | None:
+    """
+    Read a token from the Authorization header (Bearer) or a 'token' body field.
+    """
+    auth = request.headers.get("Authorization") or ""
+    if auth.lower().startswith("bearer "):
+        return auth[7:].strip()
+    if body:
+        return body.get("token")
+    return None
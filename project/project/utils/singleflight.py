@@ -0,0 +1,64 @@
+"""
+Request coalescing ("single-flight") for identical concurrent reads.
+
+The first caller for a key becomes the leader and runs the call; callers that arrive
+while it is in flight wait on the same concurrent.futures.Future and receive its result
+(or exception) instead of issuing their own backend call. Works across threads via
+do() and from asyncio tasks via do_async(); both share one registry.
+
+Nothing is cached: once the leader finishes, the next caller starts a new flight.
+Results are handed to every waiter as-is, so fn should return an immutable value
+(the data client shares raw response bytes and each caller decodes its own rows).
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from project.utils import metrics
+
+metrics.declare_counter("blockestate_singleflight_calls_total",
+                        "Reads by role: leader (made the backend call) or coalesced (shared a leader's call).",
+                        ("group", "role"))
+
+
+class SingleFlight:
+    def __init__(self, group):
+        self.group = group
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def _run(self, key, future, fn):
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def do(self, key, fn):
+        future, leader = self._join(key)
+        metrics.inc("blockestate_singleflight_calls_total", (self.group, "leader" if leader else "coalesced"))
+        if leader:
+            self._run(key, future, fn)
+        return future.result()
+
+    async def do_async(self, key, fn):
+        """Like do(), but a blocking fn runs in a worker thread and waiters await without blocking the loop."""
+        future, leader = self._join(key)
+        metrics.inc("blockestate_singleflight_calls_total", (self.group, "leader" if leader else "coalesced"))
+        if leader:
+            await asyncio.to_thread(self._run, key, future, fn)
+        return await asyncio.wrap_future(future)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,259 @@
+"""
+Deterministic synthetic dataset generator for capacity planning and benchmarks.
+
+Produces realistic-looking rows for every table the API reads (govt_citizens,
+app_users, property_details, registered_for_sale, property_chats, chat_messages,
+in_transaction) and hands them to a writer in batches, so millions of rows can be
+streamed into Supabase or the local PostgREST stand-in without holding them in memory.
+The same seed always yields the same dataset.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+from project.utils.cloudant_client import chat_key
+
+# Transaction pipeline states, in flow order, with a rough steady-state mix
+TX_STATUS_WEIGHTS = {
+    "PENDING_SELLER_OTP": 8,
+    "PENDING_BUYER_OTP": 8,
+    "PENDING_SURVEYOR_APPROVAL": 12,
+    "PENDING_BUYER_AGREEMENT": 8,
+    "PENDING_AUTHENTICATOR_APPROVAL": 6,
+    "ON_HOLD": 3,
+    "COMPLETED": 55,
+}
+
+REGIONS = {
+    "Tamil Nadu": ["Chennai", "Coimbatore", "Madurai", "Salem", "Tiruchirappalli"],
+    "Karnataka": ["Bengaluru Urban", "Mysuru", "Mangaluru", "Hubballi", "Belagavi"],
+    "Maharashtra": ["Mumbai", "Pune", "Nagpur", "Nashik", "Aurangabad"],
+    "Uttar Pradesh": ["Lucknow", "Kanpur", "Varanasi", "Agra", "Prayagraj"],
+    "West Bengal": ["Kolkata", "Howrah", "Darjeeling", "Siliguri", "Asansol"],
+    "Gujarat": ["Ahmedabad", "Surat", "Vadodara", "Rajkot", "Bhavnagar"],
+    "Rajasthan": ["Jaipur", "Jodhpur", "Udaipur", "Kota", "Ajmer"],
+    "Kerala": ["Thiruvananthapuram", "Kochi", "Kozhikode", "Thrissur", "Kannur"],
+    "Telangana": ["Hyderabad", "Warangal", "Nizamabad", "Karimnagar", "Khammam"],
+    "Bihar": ["Patna", "Gaya", "Bhagalpur", "Muzaffarpur", "Darbhanga"],
+}
+# Relative population weight per state (listings cluster in a few big markets)
+STATE_WEIGHTS = [14, 12, 16, 10, 8, 9, 7, 6, 11, 7]
+
+CATEGORIES = {"Residential": 60, "Agricultural": 20, "Commercial": 15, "Industrial": 5}
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Sneha", "Priya", "Ananya", "Rohan", "Kavya", "Arjun", "Meera",
+               "Ishaan", "Diya", "Karthik", "Lakshmi", "Rahul", "Pooja", "Vikram", "Neha", "Suresh", "Divya"]
+LAST_NAMES = ["Iyer", "Sharma", "Patel", "Reddy", "Nair", "Gupta", "Singh", "Das", "Mehta", "Rao",
+              "Kumar", "Joshi", "Banerjee", "Pillai", "Verma", "Chatterjee", "Menon", "Shah", "Yadav", "Bose"]
+VILLAGE_PARTS = ["pur", "nagar", "palli", "gaon", "wadi", "kota", "halli", "ganj"]
+CHAT_LINES = [
+    "Is the property still available?", "Can we schedule a site visit this weekend?",
+    "What is the final price you can offer?", "Are the documents clear for transfer?",
+    "Yes, it is available.", "The title is clear, all documents are on record.",
+    "I can do a small discount for a quick closure.", "Sure, Saturday morning works.",
+]
+_B58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def _weighted(rng, table):
+    return rng.choices(list(table), weights=list(table.values()))[0]
+
+
+def _wallet(rng):
+    return "".join(rng.choice(_B58) for _ in range(44))
+
+
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+class _Batcher:
+    def __init__(self, write, batch_size):
+        self.write = write
+        self.batch_size = batch_size
+        self.pending = {}
+        self.counts = {}
+
+    def add(self, table, row):
+        rows = self.pending.setdefault(table, [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush(table)
+
+    def flush(self, table=None):
+        for t in ([table] if table else list(self.pending)):
+            rows = self.pending.get(t)
+            if rows:
+                self.write(t, rows)
+                self.counts[t] = self.counts.get(t, 0) + len(rows)
+                self.pending[t] = []
+
+
+def generate_dataset(write, citizens=1000, app_users=600, surveyors=10, properties=2000, listed_ratio=0.2,
+                     chats=500, max_messages=20, transactions=500, seed=42, batch_size=500,
+                     domain="example.com", extra_citizens=None, track=False):
+    """
+    Stream a synthetic dataset into write(table, rows).
+
+    Citizen i has email user{i}@<domain>; the first `app_users` citizens also get an
+    app_users row with a wallet. Property owners follow a skewed distribution (a few
+    users own many plots). Returns per-table row counts, plus emails/wallets/owners/
+    listed ids when track=True (for benchmarks).
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    out = _Batcher(write, batch_size)
+    app_users = min(app_users, citizens)
+
+    # --- citizens and app users ---
+    wallets = []
+    for i in range(citizens):
+        name = _name(rng)
+        dob = now - timedelta(days=rng.randint(18 * 365, 80 * 365))
+        citizen = {
+            "email": f"user{i}@{domain}",
+            "name": name,
+            "father_name": _name(rng),
+            "dob": dob.date().isoformat(),
+            "age": (now - dob).days // 365,
+            "gender": rng.choice(["Male", "Female"]),
+            "contact_no": f"9{rng.randint(100000000, 999999999)}",
+            "aadhaar": f"{200000000000 + i}",
+            "pan": f"{''.join(rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ') for _ in range(5))}{i % 10000:04d}X",
+            "nationality": "Indian",
+            "role": "USER",
+        }
+        out.add("govt_citizens", citizen)
+        if i < app_users:
+            w = _wallet(rng)
+            wallets.append(w)
+            out.add("app_users", {k: citizen[k] for k in ("email", "name", "aadhaar", "pan")} | {"wallet_address": w})
+    surveyor_emails = []
+    for j in range(surveyors):
+        email = f"surveyor{j}@{domain}"
+        surveyor_emails.append(email)
+        out.add("govt_citizens", {"email": email, "name": _name(rng), "aadhaar": f"{300000000000 + j}", "role": "SURVEYOR"})
+    for row in extra_citizens or []:
+        out.add("govt_citizens", dict(row))
+        if "SURVEYOR" in str(row.get("role") or "").upper():
+            surveyor_emails.append(row.get("email"))
+
+    # --- properties and listings ---
+    states = list(REGIONS)
+    owners, listed, listed_idx = [], [], []
+    for i in range(properties):
+        pid = f"P-{i:07d}"
+        # Pareto-ish ownership: low user indices own more plots
+        owner = min(int(rng.paretovariate(1.2)) - 1, app_users - 1) if rng.random() < 0.3 else rng.randrange(app_users)
+        owners.append(owner)
+        state = rng.choices(states, weights=STATE_WEIGHTS)[0]
+        district = rng.choice(REGIONS[state])
+        category = _weighted(rng, CATEGORIES)
+        area = int(rng.lognormvariate(7.3, 0.6))  # median ~1500 sqft
+        per_sqft = rng.lognormvariate(8.2, 0.5) * (1.8 if category == "Commercial" else 1.0)
+        value = int(area * per_sqft)
+        out.add("property_details", {
+            "property_id": pid,
+            "wallet": wallets[owner],
+            "plot_number": str(rng.randint(1, 999)),
+            "khata_no": str(rng.randint(100, 99999)),
+            "village": f"{district[:4]}{rng.choice(VILLAGE_PARTS)}",
+            "district": district,
+            "state": state,
+            "category": category,
+            "current_use": category if rng.random() < 0.8 else "Vacant",
+            "frontage": f"{rng.randint(20, 120)} ft",
+            "depth": f"{rng.randint(30, 200)} ft",
+            "total_area": f"{area} sqft",
+            "value": value,
+            "mint_address": _wallet(rng),
+        })
+        if rng.random() < listed_ratio:
+            listed.append(pid)
+            listed_idx.append(i)
+            out.add("registered_for_sale", {
+                "property_id": pid,
+                "asking_price": int(value * rng.uniform(0.85, 1.0)),
+                "wallet_address": wallets[owner],
+                "listed_date": (now - timedelta(days=rng.randint(0, 180))).isoformat(),
+                "status": "active",
+            })
+
+    # --- chats and messages (buyers approach listed properties) ---
+    pool = listed_idx or list(range(properties))
+    chat_keys = set()  # property_chats.chat_key is unique
+    for c in range(chats if app_users > 1 else 0):
+        i = rng.choice(pool)
+        seller = owners[i]
+        buyer = (seller + 1 + rng.randrange(app_users - 1)) % app_users
+        b, s = f"user{buyer}@{domain}", f"user{seller}@{domain}"
+        key = chat_key(f"P-{i:07d}", b, s)
+        if key in chat_keys:
+            continue
+        chat_keys.add(key)
+        chat_id = f"chat-{seed}-{c:08d}"
+        created = now - timedelta(minutes=rng.randint(60, 200_000))
+        ts = created
+        n_msgs = rng.randint(1, max(1, max_messages))
+        for m in range(n_msgs):
+            ts = ts + timedelta(minutes=rng.randint(1, 600))
+            out.add("chat_messages", {
+                "id": f"{chat_id}-m{m:04d}",
+                "chat_id": chat_id,
+                "sender_email": b if m % 2 == 0 else s,
+                "message_text": rng.choice(CHAT_LINES),
+                "timestamp": ts.isoformat(),
+                "read": rng.random() < 0.7,
+            })
+        out.add("property_chats", {
+            "id": chat_id,
+            "chat_key": key,
+            "property_id": f"P-{i:07d}",
+            "participants": [b, s],
+            "buyer_email": b,
+            "seller_email": s,
+            "status": "active",
+            "created_at": created.isoformat(),
+            "last_message_at": ts.isoformat(),
+        })
+
+    # --- transactions in every pipeline state ---
+    statuses = list(TX_STATUS_WEIGHTS)
+    after_surveyor = set(statuses[statuses.index("PENDING_SURVEYOR_APPROVAL"):])
+    in_transfer = set()
+    for t in range(transactions if app_users > 1 else 0):
+        i = rng.randrange(properties)
+        seller = owners[i]
+        buyer = (seller + 1 + rng.randrange(app_users - 1)) % app_users
+        status = _weighted(rng, TX_STATUS_WEIGHTS)
+        created = now - timedelta(minutes=rng.randint(60, 200_000))
+        updated = created + timedelta(minutes=rng.randint(1, 20_000))
+        surveyor = rng.choice(surveyor_emails) if surveyor_emails and status in after_surveyor else None
+        if status != "COMPLETED":
+            in_transfer.add(f"P-{i:07d}")
+        out.add("in_transaction", {
+            "id": f"tx-{seed}-{t:08d}",
+            "property_id": f"P-{i:07d}",
+            "seller_email": f"user{seller}@{domain}",
+            "buyer_email": f"user{buyer}@{domain}",
+            "seller_wallet": wallets[seller],
+            "buyer_wallet": wallets[buyer],
+            "status": status,
+            "surveyor_email": surveyor,
+            "docs_link": None,
+            "officer_details": {"email": surveyor} if surveyor else None,
+            "created_at": created.isoformat(),
+            "updated_at": min(updated, now).isoformat(),
+        })
+
+    out.flush()
+    result = {"counts": out.counts}
+    if track:
+        result.update({
+            "users": app_users,
+            "emails": [f"user{i}@{domain}" for i in range(app_users)],
+            "wallets": wallets,
+            "owners": {f"P-{i:07d}": o for i, o in enumerate(owners)},
+            "listed": listed,
+            "in_transfer": in_transfer,  # properties with an unfinished transaction
+            "surveyors": surveyor_emails,
+        })
+    return result
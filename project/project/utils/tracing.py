@@ -0,0 +1,196 @@
+"""
+Lightweight distributed tracing (W3C trace context + OTLP/JSON export).
+
+TracingMiddleware opens a SERVER span per request (continuing an incoming
+`traceparent`), metrics.track opens a CLIENT span around every outbound call, and
+inject_headers() adds `traceparent` to outbound HTTP headers so PostgREST logs,
+Pinata and the mint service can be correlated with the Django request.
+
+Finished spans are exported in OTLP/JSON (resourceSpans) form to
+  - TRACE_EXPORT_PATH: a local JSON-lines file, one export batch per line, and/or
+  - OTLP_TRACES_ENDPOINT: an OTLP/HTTP collector (e.g. http://localhost:4318/v1/traces).
+With neither configured, tracing is disabled and span() is a no-op.
+"""
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import requests
+from decouple import config
+
+TRACE_EXPORT_PATH = config("TRACE_EXPORT_PATH", default="")
+OTLP_TRACES_ENDPOINT = config("OTLP_TRACES_ENDPOINT", default="")
+SERVICE_NAME = config("TRACE_SERVICE_NAME", default="blockestate-api")
+EXPORT_BATCH_SIZE = 256
+
+logger = logging.getLogger(__name__)
+
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+_current = ContextVar("current_span", default=None)
+_buffer = []
+_buffer_lock = threading.Lock()
+_file_lock = threading.Lock()
+
+
+def enabled():
+    return bool(TRACE_EXPORT_PATH or OTLP_TRACES_ENDPOINT)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "attributes", "start_ns", "end_ns", "status")
+
+    def __init__(self, name, kind, trace_id, parent_id=None, attributes=None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = STATUS_UNSET
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, message=None):
+        self.status = STATUS_ERROR
+        if message:
+            self.attributes["error.message"] = str(message)[:500]
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self):
+        d = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [_otlp_attr(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            d["parentSpanId"] = self.parent_id
+        return d
+
+
+def _otlp_attr(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def parse_traceparent(header):
+    """Return (trace_id, parent_span_id) from a W3C traceparent header, or (None, None)."""
+    parts = (header or "").strip().split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16 and parts[1] != "0" * 32:
+        return parts[1], parts[2]
+    return None, None
+
+
+@contextmanager
+def span(name, kind=KIND_INTERNAL, attributes=None, traceparent=None):
+    """Open a span as a child of the current one (or of an incoming traceparent)."""
+    if not enabled():
+        yield None
+        return
+    parent = _current.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = parse_traceparent(traceparent)
+        trace_id = trace_id or secrets.token_hex(16)
+    s = Span(name, kind, trace_id, parent_id, attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except Exception as e:
+        s.set_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        s.end_ns = time.time_ns()
+        _export(s, flush=parent is None)
+
+
+def current_span():
+    return _current.get()
+
+
+def inject_headers(headers):
+    """Add the current trace context to an outbound header dict (in place) and return it."""
+    s = _current.get()
+    if s is not None:
+        headers["traceparent"] = s.traceparent()
+    return headers
+
+
+def _export(s, flush=False):
+    with _buffer_lock:
+        _buffer.append(s.to_otlp())
+        if not flush and len(_buffer) < EXPORT_BATCH_SIZE:
+            return
+        batch = _buffer[:]
+        _buffer.clear()
+    payload = {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                _otlp_attr("service.name", SERVICE_NAME),
+                _otlp_attr("process.pid", os.getpid()),
+            ]},
+            "scopeSpans": [{"scope": {"name": "project.utils.tracing"}, "spans": batch}],
+        }]
+    }
+    if TRACE_EXPORT_PATH:
+        try:
+            with _file_lock, open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(payload) + "\n")
+        except OSError as e:
+            logger.warning("Trace export to %s failed: %s", TRACE_EXPORT_PATH, e)
+    if OTLP_TRACES_ENDPOINT:
+        # Plain requests.post (not the instrumented session) so exporting does not trace itself
+        threading.Thread(target=_post_otlp, args=(payload,), daemon=True).start()
+
+
+def _post_otlp(payload):
+    try:
+        requests.post(OTLP_TRACES_ENDPOINT, json=payload, timeout=5)
+    except Exception as e:
+        logger.warning("OTLP trace export failed: %s", e)
+
+
+class TracingMiddleware:
+    """Open a SERVER span per request and expose the trace id to the client."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not enabled():
+            return self.get_response(request)
+        attrs = {"http.method": request.method, "http.target": request.get_full_path()}
+        with span(f"{request.method} {request.path}", KIND_SERVER, attrs, traceparent=request.headers.get("traceparent")) as s:
+            response = self.get_response(request)
+            match = getattr(request, "resolver_match", None)
+            if match:
+                s.name = f"{request.method} {match.route}"
+                s.set_attribute("http.route", match.route)
+            s.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                s.set_error()
+            response["X-Trace-Id"] = s.trace_id
+        return response
@@ -0,0 +1,332 @@
+"""
+Transfer SLA analytics: how long transactions sit in each state, daily throughput and
+the per-surveyor backlog.
+
+Everything is derived from the transaction event log (transaction_log.subscribe), so
+nothing is rescanned after the first build:
+- dwell samples: a transition closes the state the transaction was in, giving one
+  (ended_at, seconds, state, surveyor) sample; samples live in growable NumPy columns
+  for TX_ANALYTICS_RETENTION_DAYS;
+- open transactions: the state each unfinished transaction is in and since when, which
+  gives current ages per state and the surveyor backlog;
+- created and completed transfers per UTC day.
+
+The first read flushes this process's buffered events, computes the samples of the
+retention window from transaction_events in one vectorized pass and takes the current
+states and daily counts from in_transaction. Tailed events repeat, so an event is only
+applied if it is newer than the last one seen for its transaction. Percentiles of all
+groups (states, surveyors) are computed together from one sort of the columns
+(vector_stats.grouped_percentiles).
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from decouple import config
+
+from project.utils import cloudant_client, metrics, transaction_log
+from project.utils.http_cache import parse_timestamp
+from project.utils.vector_stats import Codes, grouped_percentiles
+
+TX_ANALYTICS_RETENTION_DAYS = config("TX_ANALYTICS_RETENTION_DAYS", default=90, cast=int)
+
+PERCENTILES = (50, 90, 95, 99)
+DAY_S = 86400
+# Report order; states not listed here follow in the order they were first seen
+STATE_ORDER = ("PENDING_SELLER_OTP", "PENDING_BUYER_OTP", "PENDING_SURVEYOR_APPROVAL", "PENDING_BUYER_AGREEMENT",
+               "PENDING_AUTHENTICATOR_APPROVAL", "ON_HOLD")
+
+logger = logging.getLogger(__name__)
+
+
+def _norm(email):
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+def _ts(value):
+    return parse_timestamp(value) or 0.0
+
+
+def _day(ts):
+    return int(ts // DAY_S)
+
+
+class DwellSamples:
+    """Closed-state samples as parallel NumPy columns, grown by doubling."""
+
+    COLUMNS = (("ended_at", np.float64), ("seconds", np.float64), ("state", np.int32), ("surveyor", np.int32))
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self._cols = {name: np.empty(capacity, dtype) for name, dtype in self.COLUMNS}
+
+    def extend(self, ended_at, seconds, state, surveyor, keep_since=None):
+        n = len(ended_at)
+        if self.size + n > len(self._cols["ended_at"]):
+            if keep_since is not None:
+                self.drop_before(keep_since)
+            self._reserve(self.size + n)
+        for (name, _), values in zip(self.COLUMNS, (ended_at, seconds, state, surveyor)):
+            self._cols[name][self.size:self.size + n] = values
+        self.size += n
+
+    def _reserve(self, needed):
+        capacity = len(self._cols["ended_at"])
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        for name, col in self._cols.items():
+            grown = np.empty(capacity, col.dtype)
+            grown[:self.size] = col[:self.size]
+            self._cols[name] = grown
+
+    def drop_before(self, ts):
+        keep = self._cols["ended_at"][:self.size] >= ts
+        kept = int(keep.sum())
+        if kept == self.size:
+            return
+        for col in self._cols.values():
+            col[:kept] = col[:self.size][keep]
+        self.size = kept
+
+    def since(self, ts):
+        """Copies of the columns for samples that ended at or after ts."""
+        mask = self._cols["ended_at"][:self.size] >= ts
+        return {name: col[:self.size][mask] for name, col in self._cols.items()}
+
+
+def grouped_stats(codes, values, percentiles=PERCENTILES):
+    """count, mean, max and percentiles of values for every code at once -> {code: stats}."""
+    if not len(values):
+        return {}
+    groups, starts, counts, values, pct = grouped_percentiles(codes, values, percentiles)
+    last = starts + counts - 1
+    means = np.add.reduceat(values, starts) / counts
+    stats = {}
+    for i, code in enumerate(groups.tolist()):
+        entry = {"count": int(counts[i]), "mean_s": round(float(means[i]), 1), "max_s": round(float(values[last[i]]), 1)}
+        for j, p in enumerate(percentiles):
+            entry[f"p{p}_s"] = round(float(pct[i, j]), 1)
+        stats[code] = entry
+    return stats
+
+
+class TransactionAnalytics:
+    def __init__(self):
+        self.built_at = None
+        self._states = Codes()
+        self._surveyors = Codes()
+        self._samples = DwellSamples()
+        self._last = {}        # transaction id -> updated_at (epoch) of the newest state seen
+        self._open = {}        # transaction id -> (state code, entered at, surveyor code), unfinished only
+        self._created = {}     # UTC day number -> transfers created
+        self._completed = {}   # UTC day number -> transfers completed
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._building = False
+        self._pending = []
+
+    # --- maintenance ---
+    def apply(self, event):
+        """transaction_log listener; events arriving before the first build are read by the build."""
+        with self._lock:
+            if self._building:
+                self._pending.append(event)
+            elif self.built_at is not None:
+                self._apply(event)
+
+    def _apply(self, event):
+        tx_id = str(event.get("transaction_id") or "")
+        ts = _ts(event.get("updated_at"))
+        last = self._last.get(tx_id)
+        if not tx_id or not ts or (last is not None and ts <= last):
+            return  # repeated or out of date
+        self._last[tx_id] = ts
+        status = event.get("status")
+        state = self._states.code(status)
+        surveyor = self._surveyors.code(_norm(event.get("surveyor_email")))
+        previous = self._open.pop(tx_id, None)
+        if previous is not None and previous[0] == state:
+            self._open[tx_id] = (state, previous[1], surveyor)  # same state, nothing closed
+            return
+        if previous is not None:
+            self._samples.extend((ts,), (ts - previous[1],), (previous[0],), (previous[2],),
+                                 keep_since=time.time() - TX_ANALYTICS_RETENTION_DAYS * DAY_S)
+        if status in transaction_log.TERMINAL_STATUSES:
+            if previous is not None or last is None:
+                self._completed[_day(ts)] = self._completed.get(_day(ts), 0) + 1
+        else:
+            self._open[tx_id] = (state, ts, surveyor)
+        if last is None and event.get("type") == "created":
+            self._created[_day(ts)] = self._created.get(_day(ts), 0) + 1
+
+    def reset(self):
+        """Forget everything; the next read rebuilds (e.g. after reseeding)."""
+        with self._build_lock, self._lock:
+            self._states, self._surveyors, self._samples = Codes(), Codes(), DwellSamples()
+            self._last, self._open, self._created, self._completed = {}, {}, {}, {}
+            self.built_at = None
+
+    def ensure_built(self):
+        if self.built_at is None:
+            self.rebuild()
+
+    def rebuild(self):
+        with self._build_lock:
+            if self.built_at is not None:
+                return
+            # The projections' tailer is what delivers other workers' events
+            transaction_log.projections.ensure_built()
+            with self._lock:
+                self._building, self._pending = True, []
+            try:
+                transaction_log.writer.flush()
+                keep_since = time.time() - TX_ANALYTICS_RETENTION_DAYS * DAY_S
+                events = self._load_events(datetime.fromtimestamp(keep_since, timezone.utc).isoformat())
+                rows = cloudant_client.get_all_transactions()
+            except Exception:
+                with self._lock:
+                    self._building, self._pending = False, []
+                raise
+            with self._lock:
+                self._load_samples(events, keep_since)
+                self._load_rows(rows)
+                for event in self._pending:
+                    self._apply(event)
+                self._building, self._pending = False, []
+                self.built_at = time.time()
+            logger.info("transaction analytics built from %d events and %d transactions", len(events), len(rows))
+
+    @staticmethod
+    def _load_events(since, page_size=1000):
+        events, offset = [], 0
+        while True:
+            page = cloudant_client.get_transaction_events(since=since, limit=page_size, offset=offset)
+            events.extend(page)
+            if len(page) < page_size:
+                return events
+            offset += len(page)
+
+    def _load_samples(self, events, keep_since):
+        """
+        Dwell samples of the retained events in one vectorized pass, by the same rule as
+        _apply: a state is entered by the first event of a run of events with that state and
+        closed by the next event in another state; terminal states close nothing, and events
+        not newer than the previous one of their transaction are skipped.
+        """
+        n = len(events)
+        if n < 2:
+            return
+        _, tx = np.unique(np.array([str(e.get("transaction_id")) for e in events]), return_inverse=True)
+        ts = np.fromiter((_ts(e.get("updated_at")) for e in events), np.float64, n)
+        state = np.fromiter((self._states.code(e.get("status")) for e in events), np.int32, n)
+        surveyor = np.fromiter((self._surveyors.code(_norm(e.get("surveyor_email"))) for e in events), np.int32, n)
+        order = np.lexsort((ts, tx))
+        tx, ts, state, surveyor = tx[order], ts[order], state[order], surveyor[order]
+        keep = ts > 0
+        keep[1:] &= (tx[1:] != tx[:-1]) | (ts[1:] > ts[:-1])
+        tx, ts, state, surveyor = tx[keep], ts[keep], state[keep], surveyor[keep]
+        if len(ts) < 2:
+            return
+        terminal = np.isin(state, [self._states.get(s) for s in transaction_log.TERMINAL_STATUSES])
+        idx = np.arange(len(ts))
+        same_tx = np.zeros(len(ts), bool)
+        same_tx[1:] = tx[1:] == tx[:-1]
+        starts_run = ~same_tx
+        starts_run[1:] |= (state[1:] != state[:-1]) | terminal[:-1]
+        entered = ts[np.maximum.accumulate(np.where(starts_run, idx, 0))]
+        closes = starts_run[1:] & same_tx[1:] & ~terminal[:-1] & (ts[1:] >= keep_since)
+        self._samples.extend(ts[1:][closes], (ts[1:] - entered[:-1])[closes], state[:-1][closes],
+                             surveyor[:-1][closes])
+
+    def _load_rows(self, rows):
+        for row in rows:
+            tx_id = str(row.get("id") or row.get("_id") or "")
+            ts = _ts(row.get("updated_at"))
+            if not tx_id or not ts:
+                continue
+            self._last[tx_id] = ts
+            created = _ts(row.get("created_at"))
+            if created:
+                self._created[_day(created)] = self._created.get(_day(created), 0) + 1
+            if row.get("status") in transaction_log.TERMINAL_STATUSES:
+                self._completed[_day(ts)] = self._completed.get(_day(ts), 0) + 1
+            else:
+                self._open[tx_id] = (self._states.code(row.get("status")), ts,
+                                     self._surveyors.code(_norm(row.get("surveyor_email"))))
+
+    # --- reads ---
+    def open_counts(self):
+        """Unfinished transactions per state, without building."""
+        with self._lock:
+            counts = {}
+            for state, _, _ in self._open.values():
+                counts[state] = counts.get(state, 0) + 1
+            return {self._states.names[state]: n for state, n in counts.items()}
+
+    def report(self, days=30):
+        """Dwell and age distributions per state, daily throughput and surveyor backlog for the last days."""
+        self.ensure_built()
+        days = max(1, min(int(days), TX_ANALYTICS_RETENTION_DAYS))
+        now = time.time()
+        with self._lock:
+            cols = self._samples.since(now - days * DAY_S)
+            open_rows = np.array(list(self._open.values()), dtype=np.float64).reshape(-1, 3)
+            states = list(self._states.names)
+            surveyors = list(self._surveyors.names)
+            survey_code = self._states.get(transaction_log.SURVEYOR_QUEUE_STATUS)
+            first_day = _day(now) - days + 1
+            throughput = [{"day": (date(1970, 1, 1) + timedelta(days=d)).isoformat(),
+                           "created": self._created.get(d, 0), "completed": self._completed.get(d, 0)}
+                          for d in range(first_day, _day(now) + 1)]
+
+        open_state = open_rows[:, 0].astype(np.int32)
+        open_surveyor = open_rows[:, 2].astype(np.int32)
+        ages = now - open_rows[:, 1]
+        dwell = grouped_stats(cols["state"], cols["seconds"])
+        waiting = grouped_stats(open_state, ages)
+
+        ordered = [s for s in STATE_ORDER if s in states] + [s for s in states if s not in STATE_ORDER]
+        by_state = {}
+        for name in ordered:
+            if name in transaction_log.TERMINAL_STATUSES:
+                continue
+            code = states.index(name)
+            by_state[name] = {"dwell": dwell.get(code, {"count": 0}), "open": waiting.get(code, {"count": 0})}
+
+        reviewing = cols["state"] == survey_code
+        reviews = grouped_stats(cols["surveyor"][reviewing], cols["seconds"][reviewing])
+        queued = open_state == survey_code
+        backlogs = grouped_stats(open_surveyor[queued], ages[queued])
+        by_surveyor = []
+        for code in sorted(set(reviews) | set(backlogs)):
+            if code < 0:
+                continue
+            backlog, review = backlogs.get(code, {}), reviews.get(code, {})
+            by_surveyor.append({
+                "surveyor": surveyors[code],
+                "backlog": backlog.get("count", 0),
+                "oldest_age_s": backlog.get("max_s"),
+                "p50_age_s": backlog.get("p50_s"),
+                "reviewed": review.get("count", 0),
+                "review_p50_s": review.get("p50_s"),
+                "review_p90_s": review.get("p90_s"),
+            })
+        by_surveyor.sort(key=lambda s: (s["backlog"], s["oldest_age_s"] or 0), reverse=True)
+
+        return {
+            "window_days": days,
+            "generated_at": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+            "open": int(len(open_rows)),
+            "states": by_state,
+            "throughput": throughput,
+            "surveyors": by_surveyor,
+        }
+
+
+analytics = TransactionAnalytics()
+transaction_log.subscribe(analytics.apply)
+metrics.register_gauge("blockestate_transactions_open", "Unfinished transactions by status (once analytics is built).",
+                       ("status",), lambda: {(status,): n for status, n in analytics.open_counts().items()})
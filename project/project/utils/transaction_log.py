@@ -0,0 +1,356 @@
+"""
+Append-only transaction event log and the read models derived from it.
+
+in_transaction keeps only the latest state of each transfer. Every transition made by
+transaction_views is also recorded here (record()) as an event carrying the state
+after the transition, which gives the history and lets the dashboards read projections
+instead of re-reading full rows:
+
+- current summary per transaction;
+- transactions per user (buyer or seller) and each user's open-transaction count;
+- per-surveyor queue of PENDING_SURVEYOR_APPROVAL transactions, newest first; ones with
+  no surveyor assigned are in every surveyor's queue.
+
+Events are applied to the projections synchronously, so a user sees their own
+transition immediately. They are written to transaction_events in batches by a
+background thread (TX_EVENTS_BATCH_SIZE rows, or every TX_EVENTS_FLUSH_MS); a failed
+batch stays buffered and is retried, up to TX_EVENTS_MAX_BUFFER events.
+
+The projections are built lazily from in_transaction (paged), then kept current
+by tailing transaction_events every TX_EVENTS_POLL_S seconds, re-reading a
+TX_EVENTS_POLL_OVERLAP_S window so late-committed batches of other workers are not
+missed, and rebuilt every TX_PROJECTION_RECONCILE_S seconds to pick up writes made
+outside the app. Applying an event is idempotent: an event older than the state it
+would replace is ignored.
+"""
+import atexit
+import bisect
+import heapq
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from decouple import config
+
+from project.utils import cloudant_client, metrics
+from project.utils.http_cache import parse_timestamp
+
+TX_EVENTS_BATCH_SIZE = config("TX_EVENTS_BATCH_SIZE", default=100, cast=int)
+TX_EVENTS_FLUSH_MS = config("TX_EVENTS_FLUSH_MS", default=250.0, cast=float)
+TX_EVENTS_MAX_BUFFER = config("TX_EVENTS_MAX_BUFFER", default=10000, cast=int)
+TX_EVENTS_POLL_S = config("TX_EVENTS_POLL_S", default=2.0, cast=float)
+TX_EVENTS_POLL_OVERLAP_S = config("TX_EVENTS_POLL_OVERLAP_S", default=10.0, cast=float)
+TX_PROJECTION_RECONCILE_S = config("TX_PROJECTION_RECONCILE_S", default=300.0, cast=float)
+
+TERMINAL_STATUSES = ("COMPLETED",)
+SURVEYOR_QUEUE_STATUS = "PENDING_SURVEYOR_APPROVAL"
+UNASSIGNED = ""  # queue key of pending approvals without a surveyor
+# Transaction columns carried by every event (the state after the transition)
+STATE_FIELDS = ("property_id", "status", "seller_email", "buyer_email", "surveyor_email", "docs_link",
+                "created_at", "updated_at")
+
+logger = logging.getLogger(__name__)
+
+metrics.declare_counter("blockestate_transaction_events_total",
+                        "Transaction events by outcome (recorded, written, dropped, applied_remote).", ("outcome",))
+
+
+def _norm(email):
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+def _ts(value):
+    return parse_timestamp(value) or 0.0
+
+
+# --- batched writer ---
+class EventWriter:
+    def __init__(self):
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._flush_lock = threading.Lock()
+
+    def append(self, event):
+        with self._cond:
+            self._buffer.append(event)
+            if len(self._buffer) > TX_EVENTS_MAX_BUFFER:
+                dropped = len(self._buffer) - TX_EVENTS_MAX_BUFFER
+                del self._buffer[:dropped]
+                metrics.inc("blockestate_transaction_events_total", ("dropped",), dropped)
+                logger.error("transaction event buffer full; dropped %d oldest events", dropped)
+            if len(self._buffer) >= TX_EVENTS_BATCH_SIZE:
+                self._cond.notify()
+        self._ensure_thread()
+
+    def buffered(self):
+        with self._cond:
+            return len(self._buffer)
+
+    def flush(self):
+        """Write everything buffered; returns the number of events written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    batch = self._buffer[:TX_EVENTS_BATCH_SIZE]
+                if not batch:
+                    return written
+                try:
+                    cloudant_client.insert_transaction_events(batch)
+                except Exception as e:
+                    logger.warning("transaction event batch of %d not written, will retry: %s", len(batch), e)
+                    return written
+                written_ids = {id(e) for e in batch}
+                with self._cond:
+                    # The front may have been trimmed while writing; drop exactly what was written
+                    self._buffer = [e for e in self._buffer if id(e) not in written_ids]
+                written += len(batch)
+                metrics.inc("blockestate_transaction_events_total", ("written",), len(batch))
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="tx-events-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._buffer) < TX_EVENTS_BATCH_SIZE:
+                    self._cond.wait(TX_EVENTS_FLUSH_MS / 1000.0)
+            self.flush()
+
+
+# --- projections ---
+class TransactionProjections:
+    def __init__(self):
+        self.built_at = None
+        self._tx = {}          # transaction id -> summary row
+        self._by_user = {}     # email -> set of transaction ids (buyer or seller)
+        self._open = {}        # email -> open (non-terminal) transaction count
+        self._queues = {}      # surveyor email -> sorted [(updated_at ts, transaction id)]
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._building = False
+        self._pending = []     # events applied while a rebuild was fetching, replayed after the swap
+        self._cursor = None    # recorded_at (epoch) of the newest tailed event
+        self._tailer = None
+        self._last_rebuild = 0.0
+
+    # --- reads ---
+    def for_user(self, email, role=None, status=None):
+        """Summary rows of a user's transactions, most recently updated first."""
+        self.ensure_built()
+        e = _norm(email)
+        with self._lock:
+            rows = [self._tx[i] for i in self._by_user.get(e, ())]
+        if role == "seller":
+            rows = [r for r in rows if _norm(r.get("seller_email")) == e]
+        elif role == "buyer":
+            rows = [r for r in rows if _norm(r.get("buyer_email")) == e]
+        if status:
+            rows = [r for r in rows if r.get("status") == status]
+        rows.sort(key=lambda r: _ts(r.get("updated_at")), reverse=True)
+        return [dict(r) for r in rows]
+
+    def open_count(self, email):
+        self.ensure_built()
+        with self._lock:
+            return self._open.get(_norm(email), 0)
+
+    def surveyor_queue(self, surveyor_email, limit=20, offset=0):
+        """A surveyor's pending approvals and the unassigned ones, newest first, one page at a time."""
+        self.ensure_built()
+        with self._lock:
+            queue = self._queues.get(_norm(surveyor_email), [])
+            unassigned = self._queues.get(UNASSIGNED)
+            if unassigned:
+                queue = list(heapq.merge(queue, unassigned))
+            stop = len(queue) - offset
+            ids = [tx_id for _, tx_id in reversed(queue[max(stop - limit, 0):max(stop, 0)])]
+            return [dict(self._tx[i]) for i in ids]
+
+    # --- maintenance ---
+    def apply(self, event):
+        """Fold one event (or an in_transaction row) into the projections."""
+        with self._lock:
+            if self._building:
+                self._pending.append(event)
+            self._apply(event)
+
+    def _apply(self, event):
+        tx_id = str(event.get("transaction_id") or event.get("id") or "")
+        if not tx_id:
+            return
+        old = self._tx.get(tx_id)
+        if old is not None and _ts(event.get("updated_at")) < _ts(old.get("updated_at")):
+            return  # older than what we already have
+        new = {"id": tx_id, "_id": tx_id}
+        for field in STATE_FIELDS:
+            new[field] = event.get(field)
+        if old is not None:
+            self._unindex(tx_id, old)
+        self._tx[tx_id] = new
+        self._index(tx_id, new)
+
+    def _index(self, tx_id, row):
+        is_open = row.get("status") not in TERMINAL_STATUSES
+        for e in {_norm(row.get("seller_email")), _norm(row.get("buyer_email"))} - {None}:
+            self._by_user.setdefault(e, set()).add(tx_id)
+            if is_open:
+                self._open[e] = self._open.get(e, 0) + 1
+        if row.get("status") == SURVEYOR_QUEUE_STATUS:
+            surveyor = _norm(row.get("surveyor_email")) or UNASSIGNED
+            bisect.insort(self._queues.setdefault(surveyor, []), (_ts(row.get("updated_at")), tx_id))
+
+    def _unindex(self, tx_id, row):
+        is_open = row.get("status") not in TERMINAL_STATUSES
+        for e in {_norm(row.get("seller_email")), _norm(row.get("buyer_email"))} - {None}:
+            ids = self._by_user.get(e)
+            if ids is not None:
+                ids.discard(tx_id)
+            if is_open and self._open.get(e):
+                self._open[e] -= 1
+        if row.get("status") == SURVEYOR_QUEUE_STATUS:
+            queue = self._queues.get(_norm(row.get("surveyor_email")) or UNASSIGNED, [])
+            i = bisect.bisect_left(queue, (_ts(row.get("updated_at")), tx_id))
+            if i < len(queue) and queue[i][1] == tx_id:
+                del queue[i]
+
+    def reset(self):
+        """Forget everything; the next read rebuilds from in_transaction (e.g. after reseeding)."""
+        with self._build_lock, self._lock:
+            self._tx, self._by_user, self._open, self._queues = {}, {}, {}, {}
+            self._cursor = None
+            self.built_at = None
+
+    def ensure_built(self):
+        if self.built_at is None:
+            self.rebuild(initial=True)
+        self._ensure_tailer()
+
+    def rebuild(self, initial=False):
+        """Reload every transaction from in_transaction and swap the projections in."""
+        with self._build_lock:
+            if initial and self.built_at is not None:
+                return
+            with self._lock:
+                self._building = True
+                self._pending = []
+            started = time.time()
+            try:
+                rows = cloudant_client.get_all_transactions()
+            except Exception:
+                with self._lock:
+                    self._building = False
+                    self._pending = []
+                raise
+            fresh = TransactionProjections()
+            for row in rows:
+                fresh._apply(row)
+            with self._lock:
+                for event in self._pending:
+                    fresh._apply(event)
+                self._tx, self._by_user, self._open, self._queues = fresh._tx, fresh._by_user, fresh._open, fresh._queues
+                self._building, self._pending = False, []
+                if self._cursor is None:
+                    self._cursor = started
+                self.built_at = self._last_rebuild = time.time()
+
+    def tail(self, page_size=1000):
+        """Apply events recorded since the last poll (minus the overlap); returns how many were new."""
+        cursor = self._cursor
+        if cursor is None:
+            return 0  # not built (or reset): the next build reads current data
+        since = datetime.fromtimestamp(cursor - TX_EVENTS_POLL_OVERLAP_S, timezone.utc).isoformat()
+        newest, fresh, offset = cursor, 0, 0
+        while True:
+            events = cloudant_client.get_transaction_events(since=since, limit=page_size, offset=offset)
+            for event in events:
+                self.apply(event)
+                _notify(event)
+                recorded = _ts(event.get("recorded_at"))
+                fresh += recorded > cursor
+                newest = max(newest, recorded)
+            if len(events) < page_size:
+                break
+            offset += len(events)
+        with self._lock:
+            if self._cursor == cursor:  # not reset meanwhile
+                self._cursor = newest
+        if fresh:
+            metrics.inc("blockestate_transaction_events_total", ("applied_remote",), fresh)
+        return fresh
+
+    def _ensure_tailer(self):
+        if TX_EVENTS_POLL_S <= 0 or self._tailer is not None:
+            return
+        with self._lock:
+            if self._tailer is None:
+                self._tailer = threading.Thread(target=self._tail_loop, name="tx-events-tail", daemon=True)
+                self._tailer.start()
+
+    def _tail_loop(self):
+        while True:
+            time.sleep(TX_EVENTS_POLL_S)
+            if self.built_at is None:
+                continue  # reset(): left to the next read's build
+            try:
+                if TX_PROJECTION_RECONCILE_S > 0 and time.time() - self._last_rebuild >= TX_PROJECTION_RECONCILE_S:
+                    self.rebuild()
+                self.tail()
+            except Exception as e:
+                logger.warning("transaction projection refresh failed; serving last state: %s", e)
+
+
+_listeners = []
+
+
+def subscribe(listener):
+    """Call listener(event) for every event recorded here or tailed from transaction_events.
+
+    Tailed events overlap and include this process's own events, so a listener sees
+    some events more than once and must tolerate that.
+    """
+    _listeners.append(listener)
+
+
+def _notify(event):
+    for listener in list(_listeners):
+        try:
+            listener(event)
+        except Exception:
+            logger.exception("transaction event listener failed")
+
+
+writer = EventWriter()
+projections = TransactionProjections()
+metrics.register_gauge("blockestate_transaction_events_buffered", "Transaction events waiting to be written.", (),
+                       lambda: {(): writer.buffered()})
+atexit.register(writer.flush)
+
+
+def record(event_type, tx, from_status=None, actor=None, **data):
+    """Append a transition of tx (the row as saved after the transition) to the log."""
+    tx_id = str(tx.get("id") or tx.get("_id"))
+    event = {
+        "event_id": str(uuid.uuid4()),
+        "transaction_id": tx_id,
+        "type": event_type,
+        "from_status": from_status,
+        "actor": actor,
+        "data": data or None,
+    }
+    for field in STATE_FIELDS:
+        event[field] = tx.get(field)
+    projections.apply(event)
+    _notify(event)
+    writer.append(event)
+    metrics.inc("blockestate_transaction_events_total", ("recorded",))
+    return event
+
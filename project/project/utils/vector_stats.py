@@ -0,0 +1,44 @@
+"""
+NumPy helpers shared by the in-process statistics read models (transaction_analytics,
+market_stats): string interning for code columns and per-group percentiles.
+"""
+import numpy as np
+
+
+class Codes:
+    """Interns strings (or tuples) as small integers for code columns; None is -1."""
+
+    def __init__(self):
+        self.names = []
+        self._index = {}
+
+    def code(self, name):
+        if name is None:
+            return -1
+        i = self._index.get(name)
+        if i is None:
+            i = self._index[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def get(self, name):
+        """Code of a known name, or -2 (matches nothing) without interning it."""
+        return self._index.get(name, -2)
+
+
+def grouped_percentiles(codes, values, percentiles):
+    """
+    Percentiles of values for every group code in one sort.
+
+    Returns (groups, starts, counts, sorted values, percentile matrix [group, percentile]);
+    group i occupies sorted values[starts[i]:starts[i] + counts[i]], ascending. Percentiles
+    are linearly interpolated, as numpy.percentile does.
+    """
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    groups, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+    pos = starts[:, None] + (counts[:, None] - 1) * (np.asarray(percentiles, dtype=np.float64) / 100.0)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, (starts + counts - 1)[:, None])
+    pct = values[lo] + (values[hi] - values[lo]) * (pos - lo)
+    return groups, starts, counts, values, pct
@@ -1,6 +1,6 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-import json
+import json, logging
 
 from project.utils.cloudant_client import (
     create_or_get_chat, 
@@ -9,11 +9,17 @@ from project.utils.cloudant_client import (
     get_user_chats, 
     get_chat_by_id, 
     mark_messages_as_read,
+    count_unread_messages,
     get_property_by_id,
     find_user_by_email,
-    get_property_sale_details,
-    find_user_by_wallet,
 )
+from project.utils.owner_directory import directory as owner_directory, OwnerNotFound
+from project.utils import login_prefetch
+from project.utils.idempotency import idempotent
+from project.utils.resilience import BackendUnavailable, serve_with_fallback
+from project.utils.http_cache import version_etag, parse_timestamp, stable_last_modified, set_validators, conditional_response
+
+logger = logging.getLogger(__name__)
 
 @csrf_exempt
 def initiate_chat(request):
@@ -52,79 +58,14 @@ def initiate_chat(request):
             norm_buyer_email = buyer_email.strip().lower()
             norm_seller_email = None if not seller_email else seller_email.strip().lower()
 
-            # If seller email not provided, derive from property owner wallet
+            # If seller email not provided, derive it from the property owner directory
             if not seller_email:
-                property_data = get_property_by_id(property_id)
-                if not property_data:
-                    return JsonResponse({
-                        "success": False, 
-                        "message": "Property not found"
-                    }, status=404)
-                
-                # Get the property wallet and find the user's email (support multiple schema variants)
-                wallet_address = (
-                    property_data.get("wallet")
-                    or property_data.get("wallet_address")
-                    or property_data.get("wallet_adrdess")  # observed variant
-                    or property_data.get("Wallet")
-                    or property_data.get("walletAddress")
-                )
-                
-                # Fallback: consult registered_for_sale entry for this property to get seller wallet
-                if not wallet_address:
-                    try:
-                        sale_details = get_property_sale_details(property_id)
-                    except Exception as e:
-                        print(f"Error fetching sale details for {property_id}: {e}")
-                        sale_details = None
-                    if sale_details:
-                        wallet_address = (
-                            sale_details.get("wallet_address")
-                            or sale_details.get("wallet")
-                            or sale_details.get("Wallet")
-                            or sale_details.get("walletAddress")
-                        )
-                
-                if not wallet_address:
-                    return JsonResponse({
-                        "success": False, 
-                        "message": "Property owner information not found"
-                    }, status=404)
-                
-                # Lookup seller by wallet in user databases
                 try:
-                    seller_doc = find_user_by_wallet(wallet_address)
-                except Exception as e:
-                    print(f"Error resolving seller by wallet: {e}")
-                    seller_doc = None
-                
-                if not seller_doc:
-                    # As a last resort, try resolving via sale_details again if different casing/value
-                    try:
-                        if 'sale_details' not in locals() or sale_details is None:
-                            sale_details = get_property_sale_details(property_id)
-                        if sale_details:
-                            candidates = [
-                                sale_details.get("wallet_address"),
-                                sale_details.get("wallet"),
-                                sale_details.get("Wallet"),
-                                sale_details.get("walletAddress"),
-                            ]
-                            for cand in [c for c in candidates if c]:
-                                seller_doc = find_user_by_wallet(cand)
-                                if seller_doc:
-                                    break
-                    except Exception as e:
-                        print(f"Secondary seller resolution failed: {e}")
-                        seller_doc = None
-                
-                if not seller_doc:
-                    return JsonResponse({"success": False, "message": "Seller not found for this property"}, status=404)
-
-                seller_email = seller_doc.get("Email") or seller_doc.get("email")
-                if not seller_email:
-                    return JsonResponse({"success": False, "message": "Seller email not available"}, status=404)
-                norm_seller_email = seller_email.strip().lower()
+                    owner = owner_directory.lookup(property_id)
+                except OwnerNotFound as e:
+                    return JsonResponse({"success": False, "message": str(e)}, status=404)
+                seller_email = owner["email"]
+                norm_seller_email = seller_email
 
             # Prevent self-chat (case-insensitive)
             if (norm_seller_email or (seller_email and seller_email.strip().lower())) == norm_buyer_email:
@@ -132,7 +73,7 @@ def initiate_chat(request):
             
             # DEBUG: log resolution context
             try:
-                print(f"CHAT_INIT property_id={property_id}, buyer={norm_buyer_email}, seller={norm_seller_email or (seller_email and seller_email.strip().lower())}")
+                logger.debug("CHAT_INIT property_id=%s buyer=%s seller=%s", property_id, norm_buyer_email, norm_seller_email or (seller_email and seller_email.strip().lower()))
             except Exception:
                 pass
             # Create or get existing chat with normalized emails
@@ -154,11 +95,12 @@ def initiate_chat(request):
                 }
             })
             
-        except Exception as e:
-            print(f"Error initiating chat: {e}")
+        except Exception:
+            logger.exception("Error initiating chat")
             return JsonResponse({"success": False, "message": "Error initiating chat"}, status=500)
 
 @csrf_exempt
+@idempotent
 def send_chat_message(request):
     """
     Send a message in a chat.
@@ -224,8 +166,8 @@ def send_chat_message(request):
                 }
             })
             
-        except Exception as e:
-            print(f"Error sending message: {e}")
+        except Exception:
+            logger.exception("Error sending message")
             return JsonResponse({"success": False, "message": "Error sending message"}, status=500)
 
 @csrf_exempt
@@ -234,6 +176,8 @@ def get_chat_history(request, chat_id):
     Get all messages for a specific chat.
     GET /api/property/chats/<chat_id>/messages/
     Query params: ?user_email=<email> (for marking messages as read)
+    Honours If-None-Match / If-Modified-Since: the chat row's last_message_at plus the
+    unread count fully determine the body, so a 304 is answered without fetching messages.
     """
     if request.method == "GET":
         try:
@@ -262,6 +206,16 @@ def get_chat_history(request, chat_id):
                 # Mark messages as read for this user
                 mark_messages_as_read(chat_id, user_email.strip().lower())
             
+            # Messages are append-only and "read" only flips false -> true, so
+            # (last_message_at, unread count) changes whenever the body would
+            unread = count_unread_messages(chat_id)
+            etag = version_etag("chat-history", chat_id, chat.get("last_message_at"), unread)
+            # With unread messages left, read receipts can change without moving last_message_at
+            last_modified = stable_last_modified(parse_timestamp(chat.get("last_message_at"))) if unread == 0 else None
+            response = conditional_response(request, etag, last_modified)
+            if response is not None:
+                return response
+            
             # Get messages
             messages = get_chat_messages(chat_id)
             
@@ -276,7 +230,7 @@ def get_chat_history(request, chat_id):
                     "read": msg.get("read", False)
                 })
             
-            return JsonResponse({
+            return set_validators(JsonResponse({
                 "success": True,
                 "chat": {
                     "chat_id": chat.get("_id"),
@@ -286,12 +240,44 @@ def get_chat_history(request, chat_id):
                 },
                 "messages": formatted_messages,
                 "count": len(formatted_messages)
-            })
+            }), etag, last_modified)
             
-        except Exception as e:
-            print(f"Error getting chat history: {e}")
+        except Exception:
+            logger.exception("Error getting chat history")
             return JsonResponse({"success": False, "message": "Error getting chat history"}, status=500)
 
+def _format_user_chats(user_email):
+    chats = get_user_chats(user_email)
+    
+    # Format chats for frontend and add property details
+    formatted_chats = []
+    for chat in chats:
+        property_id = chat.get("property_id")
+        property_data = None
+        
+        if property_id:
+            property_data = get_property_by_id(property_id)
+        
+        # Determine the other participant (buyer or seller)
+        participants = chat.get("participants", [])
+        other_participant = None
+        for participant in participants:
+            if participant != user_email:
+                other_participant = participant
+                break
+        
+        formatted_chats.append({
+            "chat_id": chat.get("_id"),
+            "property_id": property_id,
+            "property_title": property_data.get("title") if property_data else f"Property {property_id}",
+            "property_location": property_data.get("location") if property_data else "Location not available",
+            "other_participant": other_participant,
+            "last_message_at": chat.get("last_message_at"),
+            "created_at": chat.get("created_at"),
+            "status": chat.get("status")
+        })
+    return formatted_chats
+
 @csrf_exempt
 def get_user_chat_list(request):
     """
@@ -313,44 +299,23 @@ def get_user_chat_list(request):
             }, status=400)
         
         try:
-            chats = get_user_chats(user_email)
-            
-            # Format chats for frontend and add property details
-            formatted_chats = []
-            for chat in chats:
-                property_id = chat.get("property_id")
-                property_data = None
-                
-                if property_id:
-                    property_data = get_property_by_id(property_id)
-                
-                # Determine the other participant (buyer or seller)
-                participants = chat.get("participants", [])
-                other_participant = None
-                for participant in participants:
-                    if participant != user_email:
-                        other_participant = participant
-                        break
-                
-                formatted_chats.append({
-                    "chat_id": chat.get("_id"),
-                    "property_id": property_id,
-                    "property_title": property_data.get("title") if property_data else f"Property {property_id}",
-                    "property_location": property_data.get("location") if property_data else "Location not available",
-                    "other_participant": other_participant,
-                    "last_message_at": chat.get("last_message_at"),
-                    "created_at": chat.get("created_at"),
-                    "status": chat.get("status")
-                })
+            formatted_chats, stale = serve_with_fallback(
+                f"chats:{user_email}",
+                lambda: login_prefetch.cached(f"chats:{user_email}", lambda: _format_user_chats(user_email)),
+            )
             
             return JsonResponse({
                 "success": True,
                 "chats": formatted_chats,
-                "count": len(formatted_chats)
+                "count": len(formatted_chats),
+                **(stale or {})
             })
             
-        except Exception as e:
-            print(f"Error getting user chats: {e}")
+        except BackendUnavailable as e:
+            logger.warning("Chat list unavailable: %s", e)
+            return JsonResponse({"success": False, "message": "Chats are temporarily unavailable"}, status=503)
+        except Exception:
+            logger.exception("Error getting user chats")
             return JsonResponse({"success": False, "message": "Error getting user chats"}, status=500)
 
 @csrf_exempt
@@ -374,7 +339,7 @@ def get_chat_info(request, chat_id):
             if property_id:
                 property_data = get_property_by_id(property_id)
             
-            return JsonResponse({
+            return set_validators(JsonResponse({
                 "success": True,
                 "chat": {
                     "chat_id": chat.get("_id"),
@@ -389,8 +354,14 @@ def get_chat_info(request, chat_id):
                     "location": property_data.get("location") if property_data else "Location not available",
                     "type": property_data.get("type") or property_data.get("Category") if property_data else "Type not available"
                 } if property_data else None
-            })
+            }))
             
-        except Exception as e:
-            print(f"Error getting chat info: {e}")
-            return JsonResponse({"success": False, "message": "Error getting chat info"}, status=500)
\ No newline at end of file
+        except Exception:
+            logger.exception("Error getting chat info")
+            return JsonResponse({"success": False, "message": "Error getting chat info"}, status=500)
+
+
+login_prefetch.register(
+    "chats", key=lambda email: f"chats:{email}", load=_format_user_chats,
+    tables=("property_chats", "property_details"),
+)
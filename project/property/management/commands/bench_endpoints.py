@@ -0,0 +1,96 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from project.utils.bench import SCENARIOS, run_suite, run_scaling, compare_reports
+
+
+class Command(BaseCommand):
+    help = "Load-test the property API routes against a seeded local PostgREST stand-in and store the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable; default: all)")
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected latency per backend call")
+        parser.add_argument("--jitter-ms", type=float, default=0.0)
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--properties", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output-dir", default=str(Path(settings.BASE_DIR) / "bench_results"))
+        parser.add_argument("--compare", help="Baseline JSON report to compare against")
+        parser.add_argument("--scale-properties", help="Comma-separated market sizes (e.g. 1000,10000,50000): run the "
+                            "scenario once per size, users growing with the market, and report latency per size")
+
+    def handle(self, *args, **opts):
+        scenarios = opts["scenario"] or list(SCENARIOS)
+        if opts["scale_properties"]:
+            return self.handle_scaling(scenarios, opts)
+        report = run_suite(
+            scenarios,
+            iterations=opts["iterations"],
+            concurrency=opts["concurrency"],
+            latency_ms=opts["latency_ms"],
+            jitter_ms=opts["jitter_ms"],
+            seed=opts["seed"],
+            users=opts["users"],
+            properties=opts["properties"],
+        )
+
+        header = f"{'scenario':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'calls/req':>11}{'errors':>8}{'skipped':>9}"
+        self.stdout.write(header)
+        for name, r in report["scenarios"].items():
+            self.stdout.write(
+                f"{name:<20}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+                f"{r['throughput_rps']:>10.1f}{r['backend_calls_per_request']:>11.2f}{r['errors']:>8}{r['skipped']:>9}"
+            )
+
+        if opts["compare"]:
+            try:
+                baseline = json.loads(Path(opts["compare"]).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {opts['compare']}: {e}")
+            report["comparison"] = compare_reports(report, baseline)
+            self.stdout.write("\nchange vs baseline (%):")
+            for name, deltas in report["comparison"].items():
+                self.stdout.write(f"  {name}: " + ", ".join(f"{k}={v:+.1f}" for k, v in deltas.items() if v is not None))
+
+        out_dir = Path(opts["output_dir"])
+        out_dir.mkdir(parents=True, exist_ok=True)
+        out = out_dir / f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        out.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results written to {out}"))
+
+    def handle_scaling(self, scenarios, opts):
+        if len(scenarios) != 1:
+            raise CommandError("--scale-properties needs exactly one --scenario")
+        try:
+            sizes = [int(v) for v in opts["scale_properties"].split(",") if v.strip()]
+        except ValueError:
+            raise CommandError("--scale-properties must be comma-separated integers")
+        report = run_scaling(
+            scenarios[0],
+            sizes,
+            iterations=opts["iterations"],
+            concurrency=opts["concurrency"],
+            latency_ms=opts["latency_ms"],
+            jitter_ms=opts["jitter_ms"],
+            seed=opts["seed"],
+        )
+
+        self.stdout.write(f"{scenarios[0]}: latency by market size")
+        self.stdout.write(f"{'properties':>12}{'users':>8}{'p50 ms':>10}{'p95 ms':>10}{'calls/req':>11}{'errors':>8}")
+        for r in report["sizes"]:
+            self.stdout.write(
+                f"{r['properties']:>12}{r['users']:>8}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+                f"{r['backend_calls_per_request']:>11.2f}{r['errors']:>8}"
+            )
+
+        out_dir = Path(opts["output_dir"])
+        out_dir.mkdir(parents=True, exist_ok=True)
+        out = out_dir / f"bench-scaling-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        out.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results written to {out}"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from project.utils.profiling import PROFILER_ROLE, PROFILE_DIR, list_profiles, hot_functions
+from project.utils.session_tokens import issue_token
+
+
+class Command(BaseCommand):
+    help = "List captured request profiles and summarise the hottest functions across them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", help="Only include captures whose URL contains this substring")
+        parser.add_argument("--last", type=int, default=50, help="Use at most the N most recent captures")
+        parser.add_argument("--sort", choices=["tottime", "cumtime"], default="tottime")
+        parser.add_argument("--limit", type=int, default=25, help="Number of hot functions to show")
+        parser.add_argument("--list", action="store_true", help="Only list captures")
+        parser.add_argument("--issue-token", metavar="OWNER", help="Print a signed X-Profile header token and exit")
+        parser.add_argument("--ttl", type=int, default=3600, help="Lifetime in seconds of an issued token")
+
+    def handle(self, *args, **opts):
+        if opts["issue_token"]:
+            self.stdout.write(issue_token(opts["issue_token"], PROFILER_ROLE, ttl=opts["ttl"]))
+            return
+
+        captures = list_profiles(opts["path"])[: opts["last"]]
+        if not captures:
+            self.stdout.write(f"No profiles found in {PROFILE_DIR}")
+            return
+
+        self.stdout.write(f"{'captured_at':<27}{'ms':>10}  {'status':<7}{'method':<7}path")
+        for m in captures:
+            self.stdout.write(f"{m['captured_at']:<27}{m['duration_ms']:>10.1f}  {m['status']:<7}{m['method']:<7}{m['path']}")
+        if opts["list"]:
+            return
+
+        rows = hot_functions([m["id"] for m in captures], sort=opts["sort"], limit=opts["limit"])
+        self.stdout.write(f"\nTop {len(rows)} functions by {opts['sort']} across {len(captures)} profiles:")
+        self.stdout.write(f"{'calls':>10}{'tottime s':>12}{'cumtime s':>12}  function")
+        for r in rows:
+            self.stdout.write(f"{r['calls']:>10}{r['tottime_s']:>12.4f}{r['cumtime_s']:>12.4f}  {r['function']}")
@@ -0,0 +1,63 @@
+import json
+from pathlib import Path
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the top data-client query shapes by total time, from a running server's /query-stats "
+        "endpoint or a saved JSON file (a /query-stats response or a bench_endpoints report)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://localhost:8000", help="Base URL of a running API server")
+        parser.add_argument("--token", help="ADMIN token for the server (python manage.py transaction_sla --issue-token <you>)")
+        parser.add_argument("--file", help="Read stats from a JSON file instead of a server")
+        parser.add_argument("--sort", choices=["total_ms", "calls", "max_ms", "mean_ms", "bytes", "slow"], default="total_ms")
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--table", help="Only show queries against this table")
+
+    def handle(self, *args, **opts):
+        if opts["file"]:
+            try:
+                data = json.loads(Path(opts["file"]).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {opts['file']}: {e}")
+        else:
+            try:
+                headers = {"Authorization": f"Bearer {opts['token']}"} if opts["token"] else {}
+                resp = requests.get(f"{opts['url'].rstrip('/')}/query-stats", params={"limit": 1000},
+                                    headers=headers, timeout=10)
+                data = resp.json()
+                if resp.status_code != 200:
+                    raise CommandError(f"{opts['url']}/query-stats answered {resp.status_code}: {data.get('message')}")
+            except (requests.RequestException, ValueError) as e:
+                raise CommandError(f"Cannot fetch query stats from {opts['url']}: {e}")
+
+        queries = data.get("queries") or []
+        if opts["table"]:
+            queries = [q for q in queries if q.get("table") == opts["table"]]
+        queries.sort(key=lambda q: q.get(opts["sort"], 0), reverse=True)
+        queries = queries[: opts["limit"]]
+        if not queries:
+            self.stdout.write("No queries recorded.")
+            return
+
+        self.stdout.write(f"{'calls':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}{'rows/call':>11}{'KB/call':>9}{'slow':>6}  shape")
+        for q in queries:
+            self.stdout.write(
+                f"{q['calls']:>8}{q['total_ms']:>12.1f}{q['mean_ms']:>10.2f}{q['max_ms']:>10.2f}"
+                f"{q['rows_per_call']:>11.1f}{q['bytes_per_call'] / 1024:>9.1f}{q['slow']:>6}  {q['shape']}"
+            )
+
+        candidates = {}
+        for q in queries:
+            if q["op"] in ("select", "count", "update") and q["filter_columns"]:
+                key = (q["table"], tuple(q["filter_columns"]))
+                candidates[key] = candidates.get(key, 0.0) + q["total_ms"]
+        if candidates:
+            self.stdout.write("\nIndex candidates (table: filtered columns, total ms):")
+            for (table, cols), total in sorted(candidates.items(), key=lambda kv: kv[1], reverse=True):
+                self.stdout.write(f"  {table}: ({', '.join(cols)})  {total:.1f}")
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from project.utils import cloudant_client
+from project.utils.synthetic_data import generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic synthetic dataset (citizens, app users, properties, listings, "
+        "chats with messages, transactions in every status) and bulk-insert it into the data backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--citizens", type=int, default=1000)
+        parser.add_argument("--app-users", type=int, default=600)
+        parser.add_argument("--surveyors", type=int, default=10)
+        parser.add_argument("--properties", type=int, default=2000)
+        parser.add_argument("--listed-ratio", type=float, default=0.2)
+        parser.add_argument("--chats", type=int, default=500)
+        parser.add_argument("--max-messages", type=int, default=20)
+        parser.add_argument("--transactions", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--domain", default="example.com", help="Email domain for generated users")
+        parser.add_argument("--stub", help="Write into a local PostgREST stand-in SQLite file instead of SUPABASE_URL")
+
+    def handle(self, *args, **opts):
+        if opts["stub"]:
+            cloudant_client.install_stub(opts["stub"])
+        if not cloudant_client.BASE_URL:
+            raise CommandError("No data backend configured: set SUPABASE_URL/POSTGREST_STUB or pass --stub")
+        if opts["properties"] and opts["app_users"] < 1:
+            raise CommandError("--app-users must be at least 1 to own properties")
+
+        started = time.perf_counter()
+
+        def write(table, rows):
+            cloudant_client._bulk_insert(table, rows, batch_size=opts["batch_size"])
+
+        result = generate_dataset(
+            write,
+            citizens=opts["citizens"],
+            app_users=opts["app_users"],
+            surveyors=opts["surveyors"],
+            properties=opts["properties"],
+            listed_ratio=opts["listed_ratio"],
+            chats=opts["chats"],
+            max_messages=opts["max_messages"],
+            transactions=opts["transactions"],
+            seed=opts["seed"],
+            batch_size=opts["batch_size"],
+            domain=opts["domain"],
+        )
+        elapsed = time.perf_counter() - started
+        total = sum(result["counts"].values())
+        for table, n in sorted(result["counts"].items()):
+            self.stdout.write(f"  {table:<22}{n:>12,}")
+        self.stdout.write(self.style.SUCCESS(f"Inserted {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)"))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from project.utils.session_tokens import issue_token
+from project.utils.transaction_analytics import analytics
+
+ADMIN_ROLE = "ADMIN"
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.0f}"
+
+
+class Command(BaseCommand):
+    help = "Print transfer SLAs (time per state, daily throughput, surveyor backlog) or issue an admin token."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Report window in days")
+        parser.add_argument("--issue-token", metavar="OWNER",
+                            help="Print a signed Bearer token for GET transactions/sla/ and exit")
+        parser.add_argument("--ttl", type=int, default=3600, help="Lifetime in seconds of an issued token")
+
+    def handle(self, *args, **opts):
+        if opts["issue_token"]:
+            self.stdout.write(issue_token(opts["issue_token"], ADMIN_ROLE, ttl=opts["ttl"]))
+            return
+
+        report = analytics.report(days=opts["days"])
+        self.stdout.write(f"Last {report['window_days']} days, {report['open']} open transactions\n")
+        self.stdout.write(f"{'state':<32}{'closed':>8}{'p50 s':>10}{'p90 s':>10}{'p99 s':>10}"
+                          f"{'open':>8}{'oldest s':>12}")
+        for state, s in report["states"].items():
+            dwell, waiting = s["dwell"], s["open"]
+            self.stdout.write(f"{state:<32}{dwell['count']:>8}{_fmt(dwell.get('p50_s')):>10}"
+                              f"{_fmt(dwell.get('p90_s')):>10}{_fmt(dwell.get('p99_s')):>10}"
+                              f"{waiting['count']:>8}{_fmt(waiting.get('max_s')):>12}")
+
+        self.stdout.write(f"\n{'day':<12}{'created':>9}{'completed':>11}")
+        for d in report["throughput"]:
+            self.stdout.write(f"{d['day']:<12}{d['created']:>9}{d['completed']:>11}")
+
+        self.stdout.write(f"\n{'surveyor':<40}{'backlog':>9}{'oldest s':>12}{'reviewed':>10}{'review p90 s':>14}")
+        for s in report["surveyors"]:
+            self.stdout.write(f"{s['surveyor']:<40}{s['backlog']:>9}{_fmt(s['oldest_age_s']):>12}"
+                              f"{s['reviewed']:>10}{_fmt(s['review_p90_s']):>14}")
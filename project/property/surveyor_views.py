@@ -1,8 +1,14 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-import json
+import json, logging
 
 from project.utils.cloudant_client import _select
+from project.utils.transaction_log import projections as tx_projections
+from project.utils.session_tokens import issue_token, verify_token, token_from_request
+
+MAX_PAGE_SIZE = 100
+
+logger = logging.getLogger(__name__)
 
 
 def _ok(**kwargs):
@@ -28,6 +34,7 @@ def login_surveyor(request):
     Minimal surveyor login gate.
     Body: { email: string }
     Accept only if a govt-citizen record exists with Email=email and role indicates SURVEYOR.
+    Returns a short-lived signed token that list_pending_for_surveyor verifies locally.
     """
     if request.method != 'POST':
         return _error('POST required', 405)
@@ -63,9 +70,10 @@ def login_surveyor(request):
             "name": doc.get("Name") or doc.get("name"),
             "role": doc.get("role") or doc.get("Role") or doc.get("designation"),
         }
-        return _ok(profile=profile)
-    except Exception as e:
-        print(f"surveyor login error: {e}")
+        token = issue_token(profile["email"] or el, "SURVEYOR")
+        return _ok(profile=profile, token=token)
+    except Exception:
+        logger.exception("surveyor login error")
         return _error('Error verifying surveyor', 500)
 
 
@@ -73,6 +81,8 @@ def login_surveyor(request):
 def list_pending_for_surveyor(request):
     """
     List transactions assigned to this surveyor that are pending surveyor approval.
+    Auth: token from login_surveyor, as "Authorization: Bearer <token>" or body.token.
+    Body: { token?: string, page?: int, page_size?: int }
     """
     if request.method != 'POST':
         return _error('POST required', 405)
@@ -81,30 +91,22 @@ def list_pending_for_surveyor(request):
     except Exception:
         return _error('Invalid JSON')
 
-    email = body.get('email')
-    if not email:
-        return _error('email is required')
+    claims = verify_token(token_from_request(request, body), role="SURVEYOR")
+    if not claims:
+        return _error('Invalid or expired surveyor session', 401)
 
-    el = _norm_email(email)
+    try:
+        page = max(int(body.get('page') or 1), 1)
+        page_size = min(max(int(body.get('page_size') or 20), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return _error('page and page_size must be integers')
 
     try:
-        # Verify surveyor exists
-        docs = _select("govt_citizens", {"email": f"eq.{el}"})
-        if not docs: docs = _select("govt_citizens", {"email": f"eq.{email}"})
-        
-        if not docs:
-            return _error('Not a surveyor', 403)
-            
-        role = str(docs[0].get("role") or "").upper()
-        if "SURVEYOR" not in role and "SURVEYER" not in role:
-            return _error('Not a surveyor', 403)
-        
-        # Fetch transactions
-        docs = _select("in_transaction", {
-            "status": "eq.PENDING_SURVEYOR_APPROVAL",
-            "order": "updated_at.desc"
-        })
-        
+        # Fetch one extra row to know whether another page exists
+        docs = tx_projections.surveyor_queue(claims["sub"], limit=page_size + 1, offset=(page - 1) * page_size)
+        has_more = len(docs) > page_size
+        docs = docs[:page_size]
+
         # Map to lightweight items
         items = []
         for d in docs:
@@ -117,7 +119,7 @@ def list_pending_for_surveyor(request):
                 "updated_at": d.get("updated_at") or d.get("created_at"),
                 "docs_link": d.get("docs_link"),
             })
-        return _ok(transactions=items, count=len(items))
-    except Exception as e:
-        print(f"list_pending_for_surveyor error: {e}")
+        return _ok(transactions=items, count=len(items), page=page, page_size=page_size, has_more=has_more)
+    except Exception:
+        logger.exception("list_pending_for_surveyor error")
         return _error('Error listing transactions for surveyor', 500)
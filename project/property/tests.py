@@ -0,0 +1,509 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from project.utils import bench, cloudant_client, market_stats, property_locks, query_stats, search_index, transaction_log
+from project.utils.transaction_analytics import TransactionAnalytics
+from project.utils import resilience
+from project.utils.resilience import BackendUnavailable, QueryError, get_breaker
+from project.utils.session_tokens import issue_token
+from property import transaction_views, views
+
+
+class IdempotentRetryAfterBusyTests(SimpleTestCase):
+    """A 409 returned while the property is locked must not be replayed for the retry."""
+
+    def setUp(self):
+        self.stub = cloudant_client.install_stub(":memory:")
+        self.ds = bench.seed_bench_data(self.stub, users=4, properties=10)
+        listed = set(self.ds["listed"])
+        self.property_id = next(pid for pid in self.ds["owners"] if pid not in listed)
+        self._timeout_s = property_locks.manager.timeout_s
+        property_locks.manager.timeout_s = 0.05
+
+    def tearDown(self):
+        property_locks.manager.timeout_s = self._timeout_s
+
+    def _flag(self, key):
+        return self.client.post("/api/property/flag-property-for-sale/",
+                                json.dumps({"property_id": self.property_id, "price": 1}),
+                                content_type="application/json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_busy_then_retry_succeeds(self):
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            with property_locks.hold(self.property_id, "test"):
+                locked.set()
+                release.wait(5)
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        locked.wait(5)
+        try:
+            busy = self._flag("retry-after-busy")
+        finally:
+            release.set()
+            holder.join()
+        self.assertEqual(busy.status_code, 409)
+
+        retry = self._flag("retry-after-busy")
+        self.assertEqual(retry.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", retry)
+        self.assertTrue(retry.json()["success"])
+
+        replay = self._flag("retry-after-busy")
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(replay.json(), retry.json())
+
+
+class InitiateTransferConflictTests(SimpleTestCase):
+    """Only one unfinished transfer per property."""
+
+    def setUp(self):
+        self.stub = cloudant_client.install_stub(":memory:")
+        self.ds = bench.seed_bench_data(self.stub, users=4, properties=10, txs_per_user=0)
+        self.property_id = self.ds["listed"][0]
+        seller = self.ds["owners"][self.property_id]
+        self.body = {"property_id": self.property_id, "seller_email": self.ds["emails"][seller],
+                     "buyer_email": self.ds["emails"][(seller + 1) % self.ds["users"]]}
+
+    def _initiate(self):
+        return self.client.post("/api/property/transactions/initiate/", json.dumps(self.body),
+                                content_type="application/json")
+
+    def test_second_transfer_is_refused(self):
+        first = self._initiate()
+        self.assertEqual(first.status_code, 200)
+        second = self._initiate()
+        self.assertEqual(second.status_code, 409)
+        self.assertEqual(second.json()["transaction_id"], first.json()["transaction"]["id"])
+
+    def test_on_hold_transfer_does_not_block(self):
+        first_id = self._initiate().json()["transaction"]["id"]
+        cloudant_client.update_transaction_doc({"id": first_id, "status": "ON_HOLD"})
+        self.assertEqual(self._initiate().status_code, 200)
+
+    def test_stale_pending_transfer_is_expired(self):
+        first_id = self._initiate().json()["transaction"]["id"]
+        long_ago = datetime.now() - timedelta(seconds=transaction_views.TX_OTP_TTL_S + 60)
+        cloudant_client._update("in_transaction", "id", first_id, {"updated_at": long_ago.isoformat()})
+
+        second = self._initiate()
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(cloudant_client.get_transaction_by_id(first_id)["status"], "ON_HOLD")
+        self.assertNotIn(first_id, transaction_views.TX_OTP_SELLER)
+        retry = self.client.post("/api/property/transactions/verify-seller-otp/",
+                                 json.dumps({"transaction_id": first_id, "seller_email": self.body["seller_email"],
+                                             "otp": "000000"}),
+                                 content_type="application/json")
+        self.assertEqual(retry.status_code, 400)
+
+
+class QueryShapeTests(SimpleTestCase):
+    """or=(...) values must not leak into shapes or index candidates."""
+
+    def test_or_values_are_stripped(self):
+        params = {"or": "(seller_email.eq.jane.doe@mail.example.com,buyer_email.eq.jane.doe@mail.example.com)"}
+        self.assertEqual(query_stats.normalize_shape("select", "in_transaction", params),
+                         "select in_transaction?or=(seller_email.eq.?,buyer_email.eq.?)")
+        self.assertEqual(query_stats.filter_columns(params), ["buyer_email", "seller_email"])
+
+    def test_nested_and_quoted_terms(self):
+        params = {"or": '(name.ilike."*a,b.c*",and(price.gt.1,owner.not.is.null))'}
+        self.assertEqual(query_stats.filter_columns(params), ["name", "owner", "price"])
+
+
+class ChatUpsertFallbackTests(SimpleTestCase):
+    """Only a missing chat_key column / unique index switches chat creation to select + insert."""
+
+    def setUp(self):
+        cloudant_client.install_stub(":memory:")
+        patcher = mock.patch.object(cloudant_client, "_chat_upsert_supported", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _create_with_upsert_error(self, code):
+        error = QueryError("postgrest upsert property_chats returned 400", 400, code)
+        with mock.patch.object(cloudant_client, "_upsert", side_effect=error):
+            return cloudant_client.create_or_get_chat("P-1", "buyer@x.test", "seller@x.test")
+
+    def test_missing_constraint_falls_back(self):
+        chat = self._create_with_upsert_error("42P10")
+        self.assertEqual(chat["property_id"], "P-1")
+        self.assertFalse(cloudant_client._chat_upsert_supported)
+
+    def test_other_rejections_are_raised(self):
+        with self.assertRaises(QueryError):
+            self._create_with_upsert_error("23502")
+        self.assertTrue(cloudant_client._chat_upsert_supported)
+
+    def test_both_sides_share_one_row(self):
+        first = cloudant_client.create_or_get_chat("P-1", "Buyer@x.test", "seller@x.test")
+        again = cloudant_client.create_or_get_chat("P-1", "seller@x.test", "buyer@x.test")
+        self.assertEqual(again["id"], first["id"])
+        rows = cloudant_client._select("property_chats", {"property_id": "eq.P-1"})
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]["buyer_email"], rows[0]["seller_email"]), ("buyer@x.test", "seller@x.test"))
+
+
+class TransactionProjectionPagingTests(SimpleTestCase):
+    """Projections are built from every transaction, not the first max-rows of them."""
+
+    def test_build_reads_past_max_rows(self):
+        stub = cloudant_client.install_stub(":memory:")
+        ds = bench.seed_bench_data(stub, users=6, properties=20, txs_per_user=3)
+        stub.max_rows = 5
+        projections = transaction_log.TransactionProjections()
+        projections.rebuild()
+
+        stub.max_rows = 0
+        rows = cloudant_client._select("in_transaction", columns="tx_projection")
+        self.assertGreater(len(rows), 5)
+        self.assertEqual(set(projections._tx), {r["id"] for r in rows})
+        email = ds["emails"][0]
+        expected = {r["id"] for r in rows if email in (r.get("seller_email"), r.get("buyer_email"))}
+        self.assertEqual({t["id"] for t in projections.for_user(email)}, expected)
+
+
+class DwellRuleTests(SimpleTestCase):
+    """A rebuild and incremental updates derive the same dwell samples from the same events."""
+
+    def _events(self):
+        start = datetime.now(timezone.utc) - timedelta(days=1)
+        steps = [
+            ("a", 0, "PENDING_SELLER_OTP"), ("a", 10, "PENDING_SELLER_OTP"), ("a", 30, "PENDING_BUYER_OTP"),
+            ("a", 40, "PENDING_BUYER_OTP"), ("a", 100, "PENDING_SURVEYOR_APPROVAL"), ("a", 200, "COMPLETED"),
+            ("b", 5, "PENDING_SELLER_OTP"), ("b", 7, "PENDING_BUYER_OTP"), ("b", 7, "PENDING_BUYER_OTP"),
+            ("b", 50, "ON_HOLD"), ("b", 80, "PENDING_BUYER_OTP"),
+        ]
+        return [{"transaction_id": tx, "status": status, "surveyor_email": "s@x.test",
+                 "updated_at": (start + timedelta(seconds=offset)).isoformat()} for tx, offset, status in steps]
+
+    @staticmethod
+    def _samples(analytics):
+        cols = analytics._samples.since(0)
+        names = analytics._states.names
+        return sorted((float(end), float(sec), names[state]) for end, sec, state in
+                      zip(cols["ended_at"], cols["seconds"], cols["state"]))
+
+    def test_rebuild_matches_incremental(self):
+        events = self._events()
+        rebuilt = TransactionAnalytics()
+        rebuilt._load_samples(events, keep_since=0)
+
+        incremental = TransactionAnalytics()
+        for event in sorted(events, key=lambda e: e["updated_at"]):
+            incremental._apply(event)
+
+        self.assertEqual(self._samples(rebuilt), self._samples(incremental))
+        self.assertIn(30.0, [sec for _, sec, state in self._samples(rebuilt) if state == "PENDING_SELLER_OTP"])
+
+
+class TransactionOutageTests(SimpleTestCase):
+    """A backend outage answers 503 JSON from the transaction views, not an unhandled 500."""
+
+    def setUp(self):
+        self.stub = cloudant_client.install_stub(":memory:")
+        self.addCleanup(get_breaker("postgrest").reset)
+
+    def test_outage_is_503(self):
+        self.stub.outage_status = 503
+        info = self.client.get("/api/property/transactions/tx-1/info/")
+        approve = self.client.post("/api/property/transactions/buyer-agree/",
+                                   json.dumps({"transaction_id": "tx-1", "buyer_email": "b@x.test", "agree": True}),
+                                   content_type="application/json")
+        for response in (info, approve):
+            self.assertEqual(response.status_code, 503)
+            self.assertFalse(response.json()["success"])
+
+
+class SurveyorApprovalTests(SimpleTestCase):
+    """Approvals need the assigned surveyor's token; unassigned ones are in every queue."""
+
+    def setUp(self):
+        cloudant_client.install_stub(":memory:")
+        transaction_log.projections.reset()
+        self.addCleanup(transaction_log.projections.reset)
+
+    def _tx(self, surveyor):
+        tx = cloudant_client.create_transaction_doc("P-1", "s@x.test", "b@x.test", "PENDING_SURVEYOR_APPROVAL",
+                                                    surveyor_email=surveyor)
+        return tx["id"]
+
+    def _approve(self, tx_id, surveyor=None):
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {issue_token(surveyor, 'SURVEYOR')}"} if surveyor else {}
+        return self.client.post("/api/property/transactions/surveyor-approve/",
+                                json.dumps({"transaction_id": tx_id, "surveyor_email": "sv1@x.test"}),
+                                content_type="application/json", **headers)
+
+    def test_requires_the_assigned_surveyor(self):
+        tx_id = self._tx("sv1@x.test")
+        self.assertEqual(self._approve(tx_id).status_code, 401)
+        self.assertEqual(self._approve(tx_id, "sv2@x.test").status_code, 403)
+        self.assertEqual(self._approve(tx_id, "sv1@x.test").status_code, 200)
+        self.assertEqual(self._approve(tx_id, "sv1@x.test").status_code, 400)
+
+    def test_unassigned_is_queued_for_everyone_and_claimed_on_approval(self):
+        assigned, unassigned = self._tx("sv1@x.test"), self._tx(None)
+        queue = transaction_log.projections.surveyor_queue
+        self.assertEqual({t["id"] for t in queue("sv1@x.test")}, {assigned, unassigned})
+        self.assertEqual({t["id"] for t in queue("sv2@x.test")}, {unassigned})
+
+        self.assertEqual(self._approve(unassigned, "sv2@x.test").status_code, 200)
+        self.assertEqual(cloudant_client.get_transaction_by_id(unassigned)["surveyor_email"], "sv2@x.test")
+        self.assertEqual([t["id"] for t in queue("sv1@x.test")], [assigned])
+
+
+class UserPropertiesSharedRowsTests(SimpleTestCase):
+    """Annotations for one response must not be written into rows another request can see."""
+
+    def setUp(self):
+        self.stub = cloudant_client.install_stub(":memory:")
+        self.ds = bench.seed_bench_data(self.stub, users=4, properties=10, txs_per_user=0)
+
+    def test_cached_rows_are_not_annotated(self):
+        wallet = self.ds["wallets"][self.ds["owners"][self.ds["listed"][0]]]
+        shared = cloudant_client.find_properties_by_wallet(wallet)
+        before = json.dumps(shared, sort_keys=True)
+        with mock.patch.object(views.login_prefetch, "cached", return_value=shared):
+            resp = self.client.get("/api/property/user-properties/", {"wallet_address": wallet})
+        props = resp.json()["properties"]
+        self.assertTrue(any(p["listed_for_sale"] for p in props))
+        self.assertEqual(json.dumps(shared, sort_keys=True), before)
+
+
+class SearchIndexTests(SimpleTestCase):
+    """Marketplace search: fuzzy/prefix text matching, numeric ranges, and live updates."""
+
+    PROPERTIES = [
+        {"property_id": "P-1", "Village": "Shivajinagar", "District": "Pune", "State": "Maharashtra",
+         "Category": "Residential", "total_area": "1,200 sqft"},
+        {"property_id": "P-2", "Village": "Kothrud", "District": "Pune", "State": "Maharashtra",
+         "Category": "Agricultural", "total_area": "5000 sqft"},
+        {"property_id": "P-3", "Village": "Whitefield", "District": "Bangalore", "State": "Karnataka",
+         "Category": "Commercial", "total_area": "800 sqft"},
+        {"property_id": "P-4", "Village": "Hinjewadi", "District": "Pune", "State": "Maharashtra",
+         "Category": "Residential", "total_area": "2400 sqft"},
+    ]
+
+    def setUp(self):
+        self.stub = cloudant_client.install_stub(":memory:")
+        self.stub.load_rows("property_details", self.PROPERTIES)
+        self.stub.load_rows("registered_for_sale", [
+            {"property_id": "P-1", "asking_price": 2500000, "status": "active", "listed_date": "2026-01-01T00:00:00"},
+            {"property_id": "P-2", "asking_price": 900000, "status": "active", "listed_date": "2026-01-02T00:00:00"},
+            {"property_id": "P-3", "asking_price": "1,50,00,000", "status": "active", "listed_date": "2026-01-03T00:00:00"},
+        ])
+        bench.reset_read_models()
+        self.addCleanup(bench.reset_read_models)
+
+    def _ids(self, **query):
+        results, total, _ = search_index.index.search(**query)
+        self.assertEqual(total, len(results))
+        return {r["property_id"] for r in results}
+
+    def test_parse_number_ignores_thousands_separators(self):
+        self.assertEqual(search_index.parse_number("1,50,00,000"), 15000000.0)
+        self.assertEqual(search_index.parse_number("Rs. 2,500,000.50"), 2500000.5)
+        self.assertEqual(search_index.parse_number(900000), 900000.0)
+        self.assertIsNone(search_index.parse_number("on request"))
+
+    def test_typo_matches_within_one_edit(self):
+        self.assertEqual(self._ids(q="Kotrud"), {"P-2"})       # deletion
+        self.assertEqual(self._ids(q="Banglaore"), {"P-3"})    # transposition
+        self.assertEqual(self._ids(q="Whitefeild"), {"P-3"})
+        self.assertEqual(self._ids(q="Kxthrxd"), set())        # two edits
+
+    def test_prefix_matches_and_every_token_must_match(self):
+        self.assertEqual(self._ids(q="shiva"), {"P-1"})
+        self.assertEqual(self._ids(q="pu"), {"P-1", "P-2"})
+        self.assertEqual(self._ids(q="pune kothrud"), {"P-2"})
+        results, _, _ = search_index.index.search(q="kothrud")
+        self.assertGreater(results[0]["_score"], search_index.index.search(q="kothr")[0][0]["_score"])
+
+    def test_price_and_area_ranges_are_inclusive(self):
+        self.assertEqual(self._ids(min_price=1000000), {"P-1", "P-3"})
+        self.assertEqual(self._ids(max_price=900000), {"P-2"})
+        self.assertEqual(self._ids(min_price=2500000, max_price=15000000), {"P-1", "P-3"})
+        self.assertEqual(self._ids(min_area=1000, max_area=2000), {"P-1"})
+        self.assertEqual(self._ids(q="pune", min_area=1000, max_price=1000000), {"P-2"})
+
+    def test_listing_added_and_removed_update_the_index(self):
+        self.assertEqual(self._ids(q="hinjewadi"), set())
+        _, _, before = search_index.index.search()
+
+        cloudant_client.insert_property_for_sale("P-4", 3200000, property_row=dict(self.PROPERTIES[3]))
+        self.assertEqual(self._ids(q="hinjewadi"), {"P-4"})
+        self.assertEqual(self._ids(q="pune", min_price=3000000), {"P-4"})
+
+        cloudant_client.remove_property_from_sale("P-2")
+        self.assertEqual(self._ids(q="kothrud"), set())
+        self.assertEqual(self._ids(q="pune"), {"P-1", "P-4"})
+        self.assertNotIn("P-2", self._ids(max_price=1000000))
+        self.assertGreater(search_index.index.search()[2], before)
+
+
+class MarketStatsTests(SimpleTestCase):
+    """Log-scale Tukey fences per district (state for small districts), kept current incrementally."""
+
+    # Price per area of the Haveli listings; quartiles 100 / 400 give fences 12.5 and 3200
+    HAVELI = (100, 100, 100, 200, 200, 400, 400, 400)
+
+    def setUp(self):
+        self.stub = cloudant_client.install_stub(":memory:")
+        rows = [("H-%d" % i, "Haveli", "Maharashtra", ppa) for i, ppa in enumerate(self.HAVELI)]
+        rows += [("H-OUT", "Haveli", "Maharashtra", 50000),            # planted high outlier
+                 ("M-1", "Mulshi", "Maharashtra", 300),
+                 ("M-LOW", "Mulshi", "Maharashtra", 5),                 # judged against the state
+                 ("W-1", "Whitefield", "Karnataka", 300), ("W-2", "Whitefield", "Karnataka", 300)]
+        self.stub.load_rows("property_details", [self._property(pid, d, s) for pid, d, s, _ in rows])
+        self.stub.load_rows("registered_for_sale", [
+            {"property_id": pid, "asking_price": ppa * 100, "status": "active"} for pid, _, _, ppa in rows])
+        for name, value in (("MARKET_STATS_REFRESH_S", 0.0), ("MARKET_MIN_GROUP", 5), ("MARKET_OUTLIER_IQR", 1.5)):
+            patcher = mock.patch.object(market_stats, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        bench.reset_read_models()
+        self.addCleanup(bench.reset_read_models)
+
+    @staticmethod
+    def _property(property_id, district, state):
+        return {"property_id": property_id, "District": district, "State": state,
+                "Category": "Residential", "total_area": "100 sqft"}
+
+    def _district(self, name):
+        groups, _, _ = market_stats.stats.summary(by="district")
+        return next(g for g in groups if g["district"] == name)
+
+    def test_planted_outliers_are_flagged(self):
+        haveli = self._district("Haveli")
+        self.assertEqual((haveli["low_fence"], haveli["high_fence"]), (12.5, 3200.0))
+        self.assertEqual(haveli["outliers"], 1)
+        flagged = {o["property_id"]: o for o in market_stats.stats.outliers()}
+        self.assertEqual(set(flagged), {"H-OUT", "M-LOW"})
+        self.assertEqual((flagged["H-OUT"]["direction"], flagged["H-OUT"]["compared_with"]), ("high", "district"))
+        self.assertEqual((flagged["M-LOW"]["direction"], flagged["M-LOW"]["compared_with"]), ("low", "state"))
+
+    def test_small_group_falls_back_to_state(self):
+        self.assertIsNone(self._district("Mulshi")["high_fence"])
+        check = market_stats.stats.check_price(self._property("new", "Mulshi", "Maharashtra"), 400000)
+        self.assertEqual(check["compared_with"], {"state": "Maharashtra"})
+        self.assertEqual(check["result"], "high")
+        # Neither Whitefield nor Karnataka has enough listings to judge by
+        check = market_stats.stats.check_price(self._property("new", "Whitefield", "Karnataka"), 30000)
+        self.assertEqual(check["result"], "no_data")
+
+    def test_price_on_a_fence_is_ok(self):
+        entry = self._property("new", "Haveli", "Maharashtra")
+        verdicts = {price: market_stats.stats.check_price(entry, price)["result"]
+                    for price in (1249, 1250, 30000, 320000, 320001)}
+        self.assertEqual(verdicts, {1249: "low", 1250: "ok", 30000: "ok", 320000: "ok", 320001: "high"})
+        self.assertEqual(market_stats.stats.check_price({"District": "Haveli"}, 30000)["result"], "no_data")
+
+    def test_incremental_updates_match_a_rebuild(self):
+        market_stats.stats.summary()  # build, so the changes below are applied incrementally
+        cloudant_client.remove_property_from_sale("H-OUT")
+        cloudant_client.insert_property_for_sale("M-HIGH", 900000,
+                                                 property_row=self._property("M-HIGH", "Mulshi", "Maharashtra"))
+        incremental = (market_stats.stats.summary(by="district")[:2], market_stats.stats.summary(by="state")[:2],
+                       market_stats.stats.outliers())
+        self.assertEqual({o["property_id"] for o in incremental[2]}, {"M-LOW", "M-HIGH"})
+
+        market_stats.stats.reset()
+        rebuilt = (market_stats.stats.summary(by="district")[:2], market_stats.stats.summary(by="state")[:2],
+                   market_stats.stats.outliers())
+        self.assertEqual(incremental, rebuilt)
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Identical concurrent selects share one backend call, but never across a local write."""
+
+    def setUp(self):
+        self.stub = cloudant_client.install_stub(":memory:")
+        self.stub.load_rows("registered_for_sale", [{"property_id": "P-1", "asking_price": 100, "status": "active"}])
+        patcher = mock.patch.object(cloudant_client, "SINGLE_FLIGHT", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_concurrent_identical_selects_coalesce(self):
+        self.stub.latency_ms = 200  # injected outside the stub's lock, so the callers overlap
+        readers = 8
+        barrier, results = threading.Barrier(readers), [None] * readers
+
+        def read(i):
+            barrier.wait(5)
+            results[i] = cloudant_client.get_all_properties_for_sale()
+
+        before = self.stub.request_count
+        threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+        self.assertEqual(self.stub.request_count - before, 1)
+        self.assertTrue(all(r == results[0] and r[0]["property_id"] == "P-1" for r in results))
+        # Every caller decodes its own rows, so one caller's edits cannot leak into another's
+        self.assertEqual(len({id(r[0]) for r in results}), readers)
+
+    def test_read_after_a_write_does_not_join_an_earlier_flight(self):
+        fetch_rows, started, release = cloudant_client._fetch_rows, threading.Event(), threading.Event()
+
+        def slow_first_fetch(table, params):
+            if not started.is_set():
+                started.set()
+                release.wait(2)
+            return fetch_rows(table, params)
+
+        with mock.patch.object(cloudant_client, "_fetch_rows", side_effect=slow_first_fetch) as fetch:
+            leader = threading.Thread(target=cloudant_client.get_all_properties_for_sale)
+            leader.start()
+            started.wait(5)
+            generation = cloudant_client.write_generation("registered_for_sale")
+            cloudant_client.insert_property_for_sale("P-2", 200)
+            self.assertEqual(cloudant_client.write_generation("registered_for_sale"), generation + 1)
+
+            after_write = cloudant_client.get_all_properties_for_sale()
+            release.set()
+            leader.join(5)
+        listing_reads = [c for c in fetch.call_args_list if c.args == ("registered_for_sale", {"status": "eq.active"})]
+        self.assertEqual(len(listing_reads), 2)
+        self.assertEqual({r["property_id"] for r in after_write}, {"P-1", "P-2"})
+
+
+class ServeWithFallbackTests(SimpleTestCase):
+    """The last good payload is served, marked stale, while the backend is unavailable."""
+
+    def setUp(self):
+        self.breaker = get_breaker("postgrest")
+        self.breaker.reset()
+        resilience.last_good.clear()
+        self.addCleanup(self.breaker.reset)
+        self.addCleanup(resilience.last_good.clear)
+
+    def test_open_breaker_serves_stale_without_calling_the_backend(self):
+        payload, stale = resilience.serve_with_fallback("test:1", lambda: {"name": "fresh"})
+        self.assertEqual((payload, stale), ({"name": "fresh"}, None))
+
+        for _ in range(self.breaker.threshold):
+            self.breaker.record_failure()
+        self.assertTrue(self.breaker.is_open())
+        compute = mock.Mock(return_value={"name": "newer"})
+        payload, stale = resilience.serve_with_fallback("test:1", compute)
+        self.assertEqual(payload, {"name": "fresh"})
+        self.assertTrue(stale["stale"])
+        self.assertIn("cached_at", stale)
+        self.assertGreaterEqual(stale["stale_age_s"], 0)
+        compute.assert_not_called()
+
+    def test_outage_serves_stale_and_reraises_without_a_cached_payload(self):
+        resilience.serve_with_fallback("test:2", lambda: [1, 2])
+        down = mock.Mock(side_effect=BackendUnavailable("down", status=503))
+        payload, stale = resilience.serve_with_fallback("test:2", down)
+        self.assertEqual(payload, [1, 2])
+        self.assertTrue(stale["stale"])
+        with self.assertRaises(BackendUnavailable):
+            resilience.serve_with_fallback("test:3", down)
@@ -1,7 +1,9 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-import json, random
+import functools, json, logging, random, time
+
+from decouple import config
 
 from project.utils.cloudant_client import (
     find_user_by_email,
@@ -9,21 +11,43 @@ from project.utils.cloudant_client import (
     get_wallet_from_user_doc,
     create_transaction_doc,
     get_transaction_by_id,
+    find_live_transactions_for_property,
     update_transaction_doc,
     find_user_by_wallet,
     remove_property_from_sale,
     get_prop_docs,
     assign_random_surveyor,
-    find_transactions_for_user,
     find_user_by_aadhaar,
     update_property,
 )
-import requests
+from project.utils.mint_client import call_mint_service
+from project.utils.owner_directory import directory as owner_directory, wallet_of
+from project.utils.fanout import FanOut
+from project.utils import transaction_log
+from project.utils.transaction_analytics import analytics as tx_analytics
+from project.utils.session_tokens import verify_token, token_from_request
+from project.utils.idempotency import idempotent
+from project.utils import property_locks
+from project.utils.property_locks import PropertyBusy
 from project.utils.mailer import send_otp_email, render_otp_html, send_notification_email
+from project.utils.http_cache import parse_timestamp
+from project.utils.resilience import BackendUnavailable
 
 # Simple OTP stores for transaction flow
 TX_OTP_SELLER = {}
 TX_OTP_BUYER = {}
+# A transfer left at an OTP step for longer than this no longer holds the property
+TX_OTP_TTL_S = config("TX_OTP_TTL_S", default=900, cast=int)
+OTP_STATUSES = ('PENDING_SELLER_OTP', 'PENDING_BUYER_OTP')
+
+logger = logging.getLogger(__name__)
+
+
+def _log_dev_otp(role, email, otp):
+    """OTP email could not be queued; only reveal the code in DEBUG so it never reaches prod logs."""
+    logger.warning("TX %s OTP email to %s could not be queued", role, email)
+    if settings.DEBUG:
+        logger.info("TX %s OTP for %s: %s", role.upper(), email, otp)
 
 def _norm_email(val):
     try:
@@ -43,6 +67,51 @@ def _error(msg, code=400):
     return JsonResponse({"success": False, "message": msg}, status=code)
 
 
+def _save_transition(tx, event, from_status, actor, **data):
+    """Persist tx and append the transition to the transaction event log."""
+    saved = update_transaction_doc(tx)
+    if isinstance(saved, dict) and not saved.get('error'):
+        transaction_log.record(event, saved or tx, from_status=from_status, actor=actor, **data)
+    return saved
+
+
+def _is_stale(tx, now=None):
+    """An OTP step (seller or buyer) untouched for longer than TX_OTP_TTL_S."""
+    if tx.get('status') not in OTP_STATUSES:
+        return False
+    ts = parse_timestamp(tx.get('updated_at') or tx.get('created_at'))
+    return ts is not None and (now or time.time()) - ts > TX_OTP_TTL_S
+
+
+def _expire(tx, actor):
+    """Put a stale transfer ON_HOLD (its OTPs can no longer be used) so a new one can start."""
+    tx_id = tx.get('_id') or tx.get('id')
+    TX_OTP_SELLER.pop(tx_id, None)
+    TX_OTP_BUYER.pop(tx_id, None)
+    from_status = tx.get('status')
+    tx = dict(tx, status='ON_HOLD')
+    _save_transition(tx, "expired", from_status, actor)
+
+
+def _unavailable_as_503(view):
+    """A backend outage answers 503 (as the chat list does) instead of an unhandled 500."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BackendUnavailable as e:
+            logger.warning("%s unavailable: %s", view.__name__, e)
+            return _error('Transactions are temporarily unavailable', 503)
+    return wrapper
+
+
+def _busy():
+    """PropertyBusy answer; clients should retry (the idempotency layer does not store it)."""
+    response = _error('Another operation on this property is in progress, please retry', 409)
+    response['Retry-After'] = '1'
+    return response
+
+
 def _ok(**kwargs):
     resp = {"success": True}
     resp.update(kwargs)
@@ -50,6 +119,8 @@ def _ok(**kwargs):
 
 
 @csrf_exempt
+@idempotent
+@_unavailable_as_503
 def initiate_transfer(request):
     """
     Seller initiates property transfer to a selected buyer.
@@ -72,46 +143,74 @@ def initiate_transfer(request):
     if not property_id or not seller_email or not buyer_email:
         return _error('property_id, seller_email, buyer_email are required')
 
-    # Validate seller is known
-    seller_doc = find_user_by_email(seller_email)
-    if not seller_doc:
-        return _error('Unknown seller', 403)
-
-    # Validate property and seller owns it
-    prop = get_property_by_id(property_id)
-    if not prop:
-        return _error('Property not found', 404)
-    prop_wallet = prop.get('wallet') or prop.get('wallet_address') or prop.get('wallet_adrdess') or prop.get('Wallet') or prop.get('walletAddress')
-    if not prop_wallet:
-        return _error('Property owner information not found', 404)
-
-    # Resolve seller wallet
-    seller_wallet = get_wallet_from_user_doc(seller_doc)
-    if not seller_wallet:
-        # try cross-lookup via wallet mapping
-        seller_doc2 = find_user_by_wallet(prop_wallet)
-        seller_wallet = prop_wallet if seller_doc2 else None
-    if not seller_wallet:
-        return _error('Seller wallet unavailable', 400)
-
-    # Resolve buyer wallet if available
-    buyer_doc = find_user_by_email(buyer_email)
-    buyer_wallet = get_wallet_from_user_doc(buyer_doc) if buyer_doc else None
-
-    # Create transaction doc
-    docs = get_prop_docs(property_id)
-    docs_link = docs.get('gdrive_link') if docs else None
-    tx = create_transaction_doc(
-        property_id=property_id,
-        seller_email=seller_email,
-        buyer_email=buyer_email,
-        status='PENDING_SELLER_OTP',
-        seller_wallet=seller_wallet,
-        buyer_wallet=buyer_wallet,
-        docs_link=docs_link,
-    )
-    if isinstance(tx, dict) and tx.get('error'):
-        return _error(f"Failed to create transaction: {tx['error']}", 500)
+    # Independent lookups run concurrently; the wallet cross-check waits for seller and property
+    def seller_by_wallet(seller_doc, prop):
+        prop_wallet = wallet_of(prop)
+        if seller_doc and prop_wallet and not get_wallet_from_user_doc(seller_doc):
+            return find_user_by_wallet(prop_wallet)
+        return None
+
+    try:
+        with property_locks.hold(property_id, "initiate_transfer"):
+            fan = FanOut("initiate_transfer")
+            fan.add("seller_doc", lambda: find_user_by_email(seller_email))
+            fan.add("prop", lambda: get_property_by_id(property_id))
+            fan.add("buyer_doc", lambda: find_user_by_email(buyer_email))
+            fan.add("docs", lambda: get_prop_docs(property_id))
+            fan.add("live_txs", lambda: find_live_transactions_for_property(property_id))
+            fan.add("seller_doc2", seller_by_wallet, deps=("seller_doc", "prop"))
+            found = fan.run()
+            seller_doc, prop, buyer_doc, docs = found["seller_doc"], found["prop"], found["buyer_doc"], found["docs"]
+
+            # Validate seller is known
+            if not seller_doc:
+                return _error('Unknown seller', 403)
+
+            # Validate property and seller owns it
+            if not prop:
+                return _error('Property not found', 404)
+            prop_wallet = wallet_of(prop)
+            if not prop_wallet:
+                return _error('Property owner information not found', 404)
+
+            # One transfer per property at a time; checked under the property lock. ON_HOLD and
+            # COMPLETED transfers do not count, and one abandoned at an OTP step is expired here.
+            live = found["live_txs"] or []
+            now = time.time()
+            active = [t for t in live if not _is_stale(t, now)]
+            if active:
+                return JsonResponse({"success": False, "message": "A transfer of this property is already in progress",
+                                     "transaction_id": active[0].get("id"), "status": active[0].get("status")}, status=409)
+            for stale in live:
+                _expire(stale, seller_email)
+
+            # Resolve seller wallet
+            seller_wallet = get_wallet_from_user_doc(seller_doc)
+            if not seller_wallet:
+                # cross-lookup via wallet mapping
+                seller_wallet = prop_wallet if found["seller_doc2"] else None
+            if not seller_wallet:
+                return _error('Seller wallet unavailable', 400)
+
+            # Resolve buyer wallet if available
+            buyer_wallet = get_wallet_from_user_doc(buyer_doc) if buyer_doc else None
+
+            # Create transaction doc
+            docs_link = docs.get('gdrive_link') if docs else None
+            tx = create_transaction_doc(
+                property_id=property_id,
+                seller_email=seller_email,
+                buyer_email=buyer_email,
+                status='PENDING_SELLER_OTP',
+                seller_wallet=seller_wallet,
+                buyer_wallet=buyer_wallet,
+                docs_link=docs_link,
+            )
+            if isinstance(tx, dict) and tx.get('error'):
+                return _error(f"Failed to create transaction: {tx['error']}", 500)
+            transaction_log.record("created", tx, actor=seller_email)
+    except PropertyBusy:
+        return _busy()
 
     # Generate and store seller OTP keyed by transaction (robust when multiple txs exist)
     otp = str(random.randint(100000, 999999))
@@ -129,12 +228,13 @@ def initiate_transfer(request):
         body_prefix="Use this OTP to confirm you are initiating a transfer for the property.",
         html_body=html,
     ):
-        print(f"TX SELLER OTP for {seller_email}: {otp}")
+        _log_dev_otp("seller", seller_email, otp)
 
     return _ok(transaction={"id": tx.get("_id"), "status": tx.get("status")})
 
 
 @csrf_exempt
+@_unavailable_as_503
 def verify_seller_otp(request):
     """
     Verify seller OTP and move transaction to PENDING_BUYER_OTP.
@@ -162,6 +262,8 @@ def verify_seller_otp(request):
     # Validate seller identity and OTP keyed by transaction id
     if (tx.get('seller_email') or '').strip().lower() != _norm_email(seller_email):
         return _error('Unauthorized seller', 403)
+    if tx.get('status') != 'PENDING_SELLER_OTP':
+        return _error('Seller verification is not pending for this transaction', 400)
     if TX_OTP_SELLER.get(tx_id) != otp:
         return _error('Invalid OTP', 403)
 
@@ -172,8 +274,9 @@ def verify_seller_otp(request):
     except Exception:
         pass
 
+    from_status = tx.get('status')
     tx['status'] = 'PENDING_BUYER_OTP'
-    update_transaction_doc(tx)
+    _save_transition(tx, "seller_otp_verified", from_status, seller_email)
 
     # Notify buyer that transfer was initiated
     buyer_email = tx.get('buyer_email')
@@ -197,19 +300,21 @@ def verify_seller_otp(request):
                 html_body=html_b
             )
         except Exception as e:
-            print(f"Failed to send buyer notification: {e}")
+            logger.warning("Failed to send buyer notification: %s", e)
 
     # Now that seller verified, remove the property from sale listings
     try:
         if tx.get('property_id'):
-            remove_property_from_sale(tx.get('property_id'))
+            with property_locks.hold(tx.get('property_id'), "remove_from_sale"):
+                remove_property_from_sale(tx.get('property_id'))
     except Exception as e:
-        print(f"Seller OTP verified but remove from sale failed: {e}")
+        logger.warning("Seller OTP verified but remove from sale failed: %s", e)
 
     return _ok(transaction={"id": tx.get("_id"), "status": tx.get("status")})
 
 
 @csrf_exempt
+@_unavailable_as_503
 def request_buyer_otp(request):
     """
     Buyer requests (or resends) their OTP from the transactions page.
@@ -258,7 +363,7 @@ def request_buyer_otp(request):
         body_prefix="Use this OTP to confirm you are ready to proceed with the property transfer.",
         html_body=html_b,
     ):
-        print(f"TX BUYER OTP (requested) for {buyer_email}: {b_otp}")
+        _log_dev_otp("buyer", buyer_email, b_otp)
 
     return _ok(message='Buyer OTP sent')
 
@@ -267,6 +372,7 @@ def request_buyer_otp(request):
 SURVEYOR_AADHAAR_OVERRIDE = "568945895487"
 
 @csrf_exempt
+@_unavailable_as_503
 def verify_buyer_otp(request):
     """
     Verify buyer OTP, assign a surveyor, and move to PENDING_SURVEYOR_APPROVAL.
@@ -292,6 +398,8 @@ def verify_buyer_otp(request):
     # Validate buyer identity and OTP keyed by tx
     if (tx.get('buyer_email') or '').strip().lower() != _norm_email(buyer_email):
         return _error('Unauthorized buyer', 403)
+    if tx.get('status') != 'PENDING_BUYER_OTP':
+        return _error('Buyer verification is not pending for this transaction', 400)
     if TX_OTP_BUYER.get(tx_id) != otp:
         return _error('Invalid OTP', 403)
 
@@ -320,17 +428,21 @@ def verify_buyer_otp(request):
 
     tx['surveyor_email'] = surveyor.get('email') if surveyor else None
     tx['officer_details'] = surveyor
+    from_status = tx.get('status')
     tx['status'] = 'PENDING_SURVEYOR_APPROVAL'
-    update_transaction_doc(tx)
+    _save_transition(tx, "buyer_otp_verified", from_status, buyer_email)
 
     return _ok(transaction={"id": tx.get("_id"), "status": tx.get("status"), "surveyor": tx.get('surveyor_email')})
 
 
 @csrf_exempt
+@_unavailable_as_503
 def surveyor_approve(request):
     """
     Surveyor approves and optionally uploads report URL.
-    Body: { transaction_id: str, surveyor_email: str, report_url?: str }
+    Auth: token from login_surveyor, as "Authorization: Bearer <token>" or body.token; the
+    transaction must be assigned to that surveyor (an unassigned one is assigned to them).
+    Body: { transaction_id: str, token?: str, report_url?: str }
     Moves status to PENDING_BUYER_AGREEMENT.
     """
     if request.method != 'POST':
@@ -339,29 +451,38 @@ def surveyor_approve(request):
     if body is None:
         return _error('Invalid JSON')
 
+    claims = verify_token(token_from_request(request, body), role='SURVEYOR')
+    if not claims:
+        return _error('Invalid or expired surveyor session', 401)
+    surveyor_email = _norm_email(claims.get('sub'))
+
     tx_id = body.get('transaction_id')
-    surveyor_email = body.get('surveyor_email')
     report_url = body.get('report_url')
 
-    if not tx_id or not surveyor_email:
-        return _error('transaction_id and surveyor_email are required')
+    if not tx_id:
+        return _error('transaction_id is required')
 
     tx = get_transaction_by_id(tx_id)
     if not tx:
         return _error('Transaction not found', 404)
 
-    if tx.get('surveyor_email') and tx.get('surveyor_email') != surveyor_email:
+    if tx.get('surveyor_email') and _norm_email(tx.get('surveyor_email')) != surveyor_email:
         return _error('Unauthorized surveyor', 403)
+    if tx.get('status') != 'PENDING_SURVEYOR_APPROVAL':
+        return _error('Surveyor approval is not pending for this transaction', 400)
 
+    tx['surveyor_email'] = tx.get('surveyor_email') or surveyor_email
     if report_url:
         tx['surveyor_report_url'] = report_url
+    from_status = tx.get('status')
     tx['status'] = 'PENDING_BUYER_AGREEMENT'
-    update_transaction_doc(tx)
+    _save_transition(tx, "surveyor_approved", from_status, surveyor_email, report_url=report_url)
 
     return _ok(transaction={"id": tx.get("_id"), "status": tx.get("status")})
 
 
 @csrf_exempt
+@_unavailable_as_503
 def get_transaction_info(request, tx_id):
     """
     Public endpoint to fetch minimal transaction info for the transaction page.
@@ -384,6 +505,7 @@ def get_transaction_info(request, tx_id):
 
 
 @csrf_exempt
+@_unavailable_as_503
 def buyer_agree(request):
     """
     Buyer confirms whether they accept surveyor verification.
@@ -410,13 +532,16 @@ def buyer_agree(request):
     if tx.get('buyer_email') != buyer_email:
         return _error('Unauthorized buyer', 403)
 
+    from_status = tx.get('status')
     tx['status'] = 'PENDING_AUTHENTICATOR_APPROVAL' if agree else 'ON_HOLD'
-    update_transaction_doc(tx)
+    _save_transition(tx, "buyer_agreed" if agree else "buyer_declined", from_status, buyer_email)
 
     return _ok(transaction={"id": tx.get("_id"), "status": tx.get("status")})
 
 
 @csrf_exempt
+@idempotent
+@_unavailable_as_503
 def authenticator_approve(request):
     """
     Final step where authenticator triggers the blockchain transfer.
@@ -440,55 +565,62 @@ def authenticator_approve(request):
     if not tx:
         return _error('Transaction not found', 404)
 
-    if tx.get('status') != 'PENDING_AUTHENTICATOR_APPROVAL':
-        return _error('Transaction is not ready for authenticator approval', 400)
+    try:
+        with property_locks.hold(tx.get('property_id'), "authenticator_approve"):
+            # Re-read under the lock: a concurrent approval may already have completed it
+            tx = get_transaction_by_id(tx_id) or tx
+            if tx.get('status') != 'PENDING_AUTHENTICATOR_APPROVAL':
+                return _error('Transaction is not ready for authenticator approval', 400)
 
-    # 1. Fetch Property details
-    prop_id = tx.get('property_id')
-    prop = get_property_by_id(prop_id)
-    if not prop:
-        return _error('Property not found', 404)
+            # 1. Fetch Property details
+            prop_id = tx.get('property_id')
+            prop = get_property_by_id(prop_id)
+            if not prop:
+                return _error('Property not found', 404)
 
-    mint_address = prop.get('mint_address')
-    if not mint_address:
-        return _error('No mint_address associated with this property! NFT does not exist.', 400)
+            mint_address = prop.get('mint_address')
+            if not mint_address:
+                return _error('No mint_address associated with this property! NFT does not exist.', 400)
 
-    # 2. Get the buyer's wallet (the destination)
-    buyer_wallet = tx.get('buyer_wallet')
-    if not buyer_wallet:
-        return _error('Buyer wallet is missing', 400)
+            # 2. Get the buyer's wallet (the destination)
+            buyer_wallet = tx.get('buyer_wallet')
+            if not buyer_wallet:
+                return _error('Buyer wallet is missing', 400)
 
-    # 3. Seller key path - explicitly mapped for hackathon testing identities
-    seller_key_path = "D:/HACK-N-WIN/Blockestate_3.0/nft_backend/blockchain_blockestate/seller_user1.json"
+            # 3. Seller key path - explicitly mapped for hackathon testing identities
+            seller_key_path = "D:/HACK-N-WIN/Blockestate_3.0/nft_backend/blockchain_blockestate/seller_user1.json"
 
-    # 4. Trigger the Express.js Solana API running on port 4000
-    try:
-        response = requests.post("http://localhost:4000/transfer", json={
-            "mint_address": mint_address,
-            "seller_private_key_path": seller_key_path,
-            "buyer_wallet_address": buyer_wallet
-        }, timeout=15)
+            # 4. Trigger the Express.js Solana API running on port 4000
+            try:
+                response = call_mint_service("/transfer", {
+                    "mint_address": mint_address,
+                    "seller_private_key_path": seller_key_path,
+                    "buyer_wallet_address": buyer_wallet
+                }, timeout=15)
         
-        response_data = response.json()
-        if not response.ok or not response_data.get('success'):
-            return _error(f"Blockchain transfer failed: {response_data.get('error', 'Unknown Error')}", 500)
-    except Exception as e:
-        print(f"Express API error: {e}")
-        return _error('Failed to communicate with Solana network engine.', 500)
-
-    # 5. Success! Update transaction to COMPLETED
-    tx['status'] = 'COMPLETED'
-    update_transaction_doc(tx)
-
-    # 6. Update actual property owner in the main DB
-    prop['wallet_address'] = buyer_wallet
-    if 'wallet' in prop:
-        prop['wallet'] = buyer_wallet
-    prop['status'] = 'OWNED'
-    prop['listed_for_sale'] = False
-    update_property(prop)
-
-    return _ok(transaction={"id": tx.get("_id"), "status": tx.get("status"), "message": "Blockchain Transfer Complete"})
+                response_data = response.json()
+                if not response.ok or not response_data.get('success'):
+                    return _error(f"Blockchain transfer failed: {response_data.get('error', 'Unknown Error')}", 500)
+            except Exception as e:
+                logger.error("Mint service transfer error: %s", e)
+                return _error('Failed to communicate with Solana network engine.', 500)
+
+            # 5. Success! Update transaction to COMPLETED
+            tx['status'] = 'COMPLETED'
+            _save_transition(tx, "transfer_completed", 'PENDING_AUTHENTICATOR_APPROVAL', authenticator)
+
+            # 6. Update actual property owner in the main DB
+            prop['wallet_address'] = buyer_wallet
+            if 'wallet' in prop:
+                prop['wallet'] = buyer_wallet
+            prop['status'] = 'OWNED'
+            prop['listed_for_sale'] = False
+            update_property(prop)
+            owner_directory.record_owner(prop_id, buyer_wallet, tx.get('buyer_email'))
+
+            return _ok(transaction={"id": tx.get("_id"), "status": tx.get("status"), "message": "Blockchain Transfer Complete"})
+    except PropertyBusy:
+        return _busy()
 
 
 @csrf_exempt
@@ -511,7 +643,7 @@ def list_transactions(request):
         return _error('user_email is required')
 
     try:
-        docs = find_transactions_for_user(user_email, role=role, status=status)
+        docs = transaction_log.projections.for_user(user_email, role=role, status=status)
         # Format lightweight response for dashboard
         txs = []
         seen_pending_buyer_props = set()
@@ -555,7 +687,30 @@ def list_transactions(request):
                 'counterpart': counterpart,
                 'role_for_user': role_for_user,
             })
-        return _ok(transactions=txs, count=len(txs))
-    except Exception as e:
-        print(f"Error listing transactions: {e}")
+        return _ok(transactions=txs, count=len(txs), open_count=transaction_log.projections.open_count(user_email))
+    except Exception:
+        logger.exception("Error listing transactions")
         return _error('Error listing transactions', 500)
+
+
+@csrf_exempt
+def transaction_sla(request):
+    """
+    Admin view of transfer SLAs: dwell time per state, daily throughput, surveyor backlog.
+    GET ?days=30 with "Authorization: Bearer <token>" issued for role ADMIN
+    (python manage.py transaction_sla --issue-token <you>).
+    """
+    if request.method != 'GET':
+        return _error('GET required', 405)
+    if verify_token(token_from_request(request), role='ADMIN') is None:
+        return _error('Invalid or expired admin token', 401)
+    try:
+        days = int(request.GET.get('days') or 30)
+    except ValueError:
+        return _error('days must be an integer')
+
+    try:
+        return _ok(**tx_analytics.report(days=days))
+    except Exception:
+        logger.exception("Error computing transaction SLA report")
+        return _error('Error computing transaction SLA report', 500)
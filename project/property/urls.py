@@ -10,6 +10,9 @@ urlpatterns = [
     path('flag-property-for-sale/', views.flag_property_for_sale, name='flag_property_for_sale'),
     path('unlist-property/', views.unlist_property, name='unlist_property'),
     path('marketplace/', views.get_marketplace_properties, name='marketplace_properties'),
+    path('marketplace/search/', views.search_marketplace, name='marketplace_search'),
+    path('marketplace/stats/', views.get_market_stats, name='market_stats'),
+    path('marketplace/price-check/', views.check_listing_price, name='check_listing_price'),
     path('user-profile/', views.get_user_profile, name='user_profile'),
     path('dev/seed/', views.dev_seed_data, name='dev_seed_data'),
     
@@ -29,6 +32,7 @@ urlpatterns = [
     path('transactions/buyer-agree/', transaction_views.buyer_agree, name='buyer_agree'),
     path('transactions/authenticator-approve/', transaction_views.authenticator_approve, name='authenticator_approve'),
     path('transactions/list/', transaction_views.list_transactions, name='list_transactions'),
+    path('transactions/sla/', transaction_views.transaction_sla, name='transaction_sla'),
     path('transactions/<str:tx_id>/info/', transaction_views.get_transaction_info, name='get_transaction_info'),
 
  
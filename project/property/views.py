@@ -1,11 +1,27 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-import json
-import requests
+import json, logging, time
 from project.utils.pinata_client import upload_json_to_ipfs
+from project.utils.mint_client import call_mint_service
 
-from project.utils.cloudant_client import find_properties_by_wallet, get_property_by_id, get_all_properties, find_user_by_email, insert_doc, find_app_user_by_aadhaar, update_property, insert_property_for_sale, get_all_properties_for_sale, remove_property_from_sale, unlist_property_from_sale
+from project.utils.cloudant_client import find_properties_by_wallet, count_properties_by_wallet, get_property_by_id, get_all_properties, find_user_by_email, insert_doc, find_app_user_by_aadhaar, update_property, insert_property_for_sale, get_property_sale_details, get_active_sales_for_properties, remove_property_from_sale, unlist_property_from_sale
+from project.utils.resilience import BackendUnavailable, serve_with_fallback
+from project.utils.http_cache import set_validators, version_etag, conditional_response
+from project.utils.marketplace_snapshot import snapshot as marketplace_snapshot
+from project.utils import search_index
+from project.utils import market_stats
+from project.utils.fanout import FanOut
+from project.utils import login_prefetch
+from project.utils.idempotency import idempotent
+from project.utils import property_locks
+from project.utils.property_locks import PropertyBusy
+
+logger = logging.getLogger(__name__)
+
+# (etag, serialized JSON) of the last fresh marketplace response
+_marketplace_body = (None, None)
 
 @csrf_exempt
 def get_user_properties(request):
@@ -19,17 +35,18 @@ def get_user_properties(request):
             return JsonResponse({"success": False, "message": "Wallet address is required"})
         
         try:
-            properties = find_properties_by_wallet(wallet_address)
+            # Annotate our own copies: the rows may be shared with the prefetch entry
+            properties = [dict(p) for p in login_prefetch.cached(f"properties:{wallet_address}", lambda: find_properties_by_wallet(wallet_address))]
             
             # Enrich with active sale data so the frontend knows what's already listed
-            active_sales = get_all_properties_for_sale()
-            sale_map = {s.get("property_id"): s for s in active_sales}
+            # (only this wallet's listings, so the cost does not grow with the market)
+            sale_map = get_active_sales_for_properties((p.get("property_id") for p in properties), columns="sale_status")
             
             for prop in properties:
                 pid = prop.get("property_id")
-                if pid in sale_map:
+                if str(pid) in sale_map:
                     prop["listed_for_sale"] = True
-                    prop["asking_price"] = sale_map[pid].get("asking_price")
+                    prop["asking_price"] = sale_map[str(pid)].get("asking_price")
                     prop["status"] = "FOR_SALE"
                 else:
                     prop["listed_for_sale"] = False
@@ -39,32 +56,42 @@ def get_user_properties(request):
                 # Check if property lacks an NFT and the user has a seemingly valid Solana wallet length
                 if not prop.get("mint_address") and len(wallet_address) > 30:
                     try:
-                        ipfs_uri = upload_json_to_ipfs(prop)
-                        res = requests.post("http://localhost:4000/mint", json={
-                            "metadata_uri": ipfs_uri,
-                            "seller_wallet": wallet_address,
-                            "property_name": f"LandRecord_{pid}"
-                        }, timeout=20)
-                        if res.ok and res.json().get("success"):
-                            prop["mint_address"] = res.json().get("mint_address")
-                            prop["ipfs_uri"] = ipfs_uri
-                            update_property({
-                                "property_id": pid,
-                                "mint_address": prop["mint_address"],
-                                "ipfs_uri": ipfs_uri
-                            })
-                        else:
-                            print(f"Auto-mint API failed for {pid}: {res.text}")
+                        # One mint per property: skip it while another request is minting it,
+                        # and re-read it under the lock in case that request just finished
+                        with property_locks.hold(pid, "auto_mint", timeout_s=0):
+                            fresh = get_property_by_id(pid) or {}
+                            if fresh.get("mint_address"):
+                                prop["mint_address"] = fresh["mint_address"]
+                                prop["ipfs_uri"] = fresh.get("ipfs_uri")
+                            else:
+                                ipfs_uri = upload_json_to_ipfs(prop)
+                                res = call_mint_service("/mint", {
+                                    "metadata_uri": ipfs_uri,
+                                    "seller_wallet": wallet_address,
+                                    "property_name": f"LandRecord_{pid}"
+                                }, timeout=20)
+                                if res.ok and res.json().get("success"):
+                                    prop["mint_address"] = res.json().get("mint_address")
+                                    prop["ipfs_uri"] = ipfs_uri
+                                    update_property({
+                                        "property_id": pid,
+                                        "mint_address": prop["mint_address"],
+                                        "ipfs_uri": ipfs_uri
+                                    })
+                                else:
+                                    logger.warning("Auto-mint API failed for %s: %s", pid, res.text)
+                    except PropertyBusy:
+                        logger.info("Auto-mint for %s already in progress", pid)
                     except Exception as e:
-                        print(f"Auto-mint error for {pid}: {e}")
+                        logger.warning("Auto-mint error for %s: %s", pid, e)
                     
             return JsonResponse({
                 "success": True, 
                 "properties": properties,
                 "count": len(properties)
             })
-        except Exception as e:
-            print(f"Error fetching properties for wallet {wallet_address}: {e}")
+        except Exception:
+            logger.exception("Error fetching properties for wallet %s", wallet_address)
             return JsonResponse({"success": False, "message": "Error fetching properties"})
 
 @csrf_exempt
@@ -74,25 +101,61 @@ def get_property_details(request, property_id):
     """
     if request.method == "GET":
         try:
-            property_data = get_property_by_id(property_id)
+            property_data, stale = serve_with_fallback(f"property:{property_id}", lambda: get_property_by_id(property_id))
             
             if property_data:
-                return JsonResponse({
+                # ETag/304 come from ConditionalGetMiddleware (no cheap version column on property rows)
+                return set_validators(JsonResponse({
                     "success": True,
-                    "property": property_data
-                })
+                    "property": property_data,
+                    **(stale or {})
+                }))
             else:
                 return JsonResponse({"success": False, "message": "Property not found"})
                 
-        except Exception as e:
-            print(f"Error fetching property {property_id}: {e}")
+        except BackendUnavailable as e:
+            logger.warning("Property %s unavailable: %s", property_id, e)
+            return JsonResponse({"success": False, "message": "Property details are temporarily unavailable"}, status=503)
+        except Exception:
+            logger.exception("Error fetching property %s", property_id)
             return JsonResponse({"success": False, "message": "Error fetching property details"})
 
+def _property_busy():
+    """PropertyBusy answer; clients should retry (the idempotency layer does not store it)."""
+    response = JsonResponse({"success": False, "message": "Another update to this property is in progress, please retry"}, status=409)
+    response["Retry-After"] = "1"
+    return response
+
+def _validate_price(prop, price_num):
+    """
+    (problem message or None, price cap, market price check) for listing prop at price_num.
+    The price may not exceed the property's declared value; the market check compares its
+    price per area with listed properties of the same district and only blocks a listing
+    with MARKET_PRICE_POLICY=reject.
+    """
+    raw_val = prop.get("value") or prop.get("total_area") or prop.get("total area") or prop.get("Total Area")
+    max_val = search_index.parse_number(raw_val) if raw_val not in (None, "") else None
+    if max_val is not None and price_num > max_val:
+        return f"Price cannot exceed property value ({max_val}).", max_val, None
+    try:
+        price_check = market_stats.stats.check_price(prop, price_num)
+    except BackendUnavailable as e:
+        logger.warning("Market statistics unavailable, price not checked: %s", e)
+        return None, max_val, None
+    if market_stats.MARKET_PRICE_POLICY == "reject" and price_check["result"] in ("high", "low"):
+        where = ", ".join(str(v) for v in price_check["compared_with"].values() if v)
+        direction = "above" if price_check["result"] == "high" else "below"
+        return (f"Price per area ({price_check['price_per_area']}) is far {direction} listed properties in {where} "
+                f"({price_check['market']['low_fence']} - {price_check['market']['high_fence']})."), max_val, price_check
+    return None, max_val, price_check
+
 @csrf_exempt
+@idempotent
 def flag_property_for_sale(request):
     """
     Mark a property as listed for sale with a given price.
-    Constraints: price must be <= property 'value' (parsed) if available.
+    Constraints: price must be <= property 'value' (parsed) if available. The response's
+    price_check compares the price per area with the district's listings (market_stats).
     Body: { "property_id": str, "price": number }
     
     This now inserts the property into the 'register-for-sale' database
@@ -112,113 +175,226 @@ def flag_property_for_sale(request):
         except Exception:
             return JsonResponse({"success": False, "message": "price must be a number"}, status=400)
         try:
-            # Get the original property to validate and get details
-            prop = get_property_by_id(property_id)
-            if not prop:
-                return JsonResponse({"success": False, "message": "Property not found"}, status=404)
+            with property_locks.hold(property_id, "flag_for_sale"):
+                # Get the original property to validate and get details, and any listing it already has
+                found = (FanOut("flag_property_for_sale")
+                         .add("prop", lambda: get_property_by_id(property_id))
+                         .add("listing", lambda: get_property_sale_details(property_id))
+                         .run())
+                prop, listing = found["prop"], found["listing"]
+                if not prop:
+                    return JsonResponse({"success": False, "message": "Property not found"}, status=404)
+                if listing:
+                    return JsonResponse({"success": False, "message": "Property is already listed for sale",
+                                         "asking_price": listing.get("asking_price")}, status=409)
             
-            # Parse max value for validation
-            raw_val = prop.get("value") or prop.get("total_area") or prop.get("total area") or prop.get("Total Area")
-            max_val = None
-            if isinstance(raw_val, (int, float)):
-                max_val = float(raw_val)
-            elif isinstance(raw_val, str):
-                digits = "".join(ch for ch in raw_val if (ch.isdigit() or ch == '.'))
-                if digits:
-                    try:
-                        max_val = float(digits)
-                    except Exception:
-                        max_val = None
-            
-            # Enforce price cap if we could determine a value
-            if max_val is not None and price_num > max_val:
-                return JsonResponse({"success": False, "message": f"Price cannot exceed property value ({max_val})."}, status=400)
+                # Price cap (declared value) and market check
+                problem, max_val, price_check = _validate_price(prop, price_num)
+                if problem:
+                    return JsonResponse({"success": False, "message": problem, "price_check": price_check}, status=400)
             
-            # Get wallet address from property
-            wallet_address = prop.get("wallet") or prop.get("wallet_address")
+                # Get wallet address from property
+                wallet_address = prop.get("wallet") or prop.get("wallet_address")
             
-            # Insert into register-for-sale database
-            from datetime import datetime
-            sale_result = insert_property_for_sale(
-                property_id=property_id,
-                asking_price=price_num,
-                wallet_address=wallet_address
-            )
+                # Insert into register-for-sale database
+                from datetime import datetime
+                sale_result = insert_property_for_sale(
+                    property_id=property_id,
+                    asking_price=price_num,
+                    wallet_address=wallet_address,
+                    property_row=prop
+                )
             
-            if "error" in sale_result:
-                return JsonResponse({"success": False, "message": f"Failed to register for sale: {sale_result['error']}"}, status=500)
+                if "error" in sale_result:
+                    return JsonResponse({"success": False, "message": f"Failed to register for sale: {sale_result['error']}"}, status=500)
             
-            # Also update the original property document to mark as listed
-            prop["listed_for_sale"] = True
-            prop["asking_price"] = price_num
-            prop["status"] = "FOR_SALE"
-            update_property(prop)
+                # Also update the original property document to mark as listed
+                prop["listed_for_sale"] = True
+                prop["asking_price"] = price_num
+                prop["status"] = "FOR_SALE"
+                update_property(prop)
             
-            return JsonResponse({
-                "success": True, 
-                "message": "Property successfully listed for sale",
-                "property_id": property_id,
-                "asking_price": price_num,
-                "sale_record": sale_result
-            })
+                return JsonResponse({
+                    "success": True, 
+                    "message": "Property successfully listed for sale",
+                    "property_id": property_id,
+                    "asking_price": price_num,
+                    "sale_record": sale_result,
+                    "price_check": price_check
+                })
             
-        except Exception as e:
-            print(f"Error flagging property for sale: {e}")
+        except PropertyBusy:
+            return _property_busy()
+        except Exception:
+            logger.exception("Error flagging property for sale")
             return JsonResponse({"success": False, "message": "Error flagging property"}, status=500)
 
 @csrf_exempt
 def get_marketplace_properties(request):
     """
     Get all properties for marketplace view (public listing)
-    Fetches from register-for-sale database and enriches with property details
+    Served from the maintained marketplace snapshot (register-for-sale joined with property
+    details). If the snapshot could not be reconciled it is served with "stale": true.
     """
     if request.method == "GET":
         try:
-            # Get all properties listed for sale from register-for-sale database
-            sale_listings = get_all_properties_for_sale()
+            marketplace_properties, version, stale = marketplace_snapshot.read()
+            etag = version_etag("marketplace", marketplace_snapshot.epoch, version, bool(stale))
+            response = conditional_response(request, etag)
+            if response is not None:
+                return response
             
-            # Enrich each sale listing with full property details
-            marketplace_properties = []
-            for sale_listing in sale_listings:
-                property_id = sale_listing.get("property_id")
-                if property_id:
-                    # Get full property details from property-details database
-                    property_details = get_property_by_id(property_id)
-                    if property_details:
-                        # Combine sale info with property details
-                        enriched_property = {
-                            **property_details,  # All original property data
-                            "asking_price": sale_listing.get("asking_price"),
-                            "listed_date": sale_listing.get("listed_date"),
-                            "sale_status": sale_listing.get("status", "active"),
-                            "listed_for_sale": True,
-                            "status": "FOR_SALE"
-                        }
-                        marketplace_properties.append(enriched_property)
-                    else:
-                        print(f"Warning: Property details not found for property_id: {property_id}")
-                        # Still include basic sale info even if details missing
-                        marketplace_properties.append({
-                            "property_id": property_id,
-                            "asking_price": sale_listing.get("asking_price"),
-                            "listed_date": sale_listing.get("listed_date"),
-                            "sale_status": sale_listing.get("status", "active"),
-                            "listed_for_sale": True,
-                            "status": "FOR_SALE",
-                            "title": f"Property {property_id}",
-                            "location": "Details unavailable",
-                            "type": "Unknown"
-                        })
+            # The serialized body is reused until the snapshot changes
+            global _marketplace_body
+            cached_etag, body = _marketplace_body
+            if stale or cached_etag != etag:
+                body = json.dumps({
+                    "success": True,
+                    "properties": marketplace_properties,
+                    "count": len(marketplace_properties),
+                    **(stale or {})
+                }, cls=DjangoJSONEncoder)
+                if not stale:
+                    _marketplace_body = (etag, body)
+            return set_validators(HttpResponse(body, content_type="application/json"), etag)
             
+        except BackendUnavailable as e:
+            logger.warning("Marketplace unavailable: %s", e)
+            return JsonResponse({"success": False, "message": "Marketplace is temporarily unavailable"}, status=503)
+        except Exception:
+            logger.exception("Error fetching marketplace properties")
+            return JsonResponse({"success": False, "message": "Error fetching marketplace properties"})
+
+def _float_param(request, name):
+    value = request.GET.get(name, "").strip()
+    return float(value) if value else None
+
+@csrf_exempt
+def search_marketplace(request):
+    """
+    Search listed properties.
+    GET params: q (matches village, district, state, category, current use, plot number;
+    prefixes and single typos are tolerated), min_price, max_price, min_area, max_area,
+    category, sort (relevance, price_asc, price_desc, area_asc, area_desc, newest),
+    page, page_size (max 100).
+    """
+    if request.method == "GET":
+        try:
+            min_price, max_price = _float_param(request, "min_price"), _float_param(request, "max_price")
+            min_area, max_area = _float_param(request, "min_area"), _float_param(request, "max_area")
+            page = max(int(request.GET.get("page") or 1), 1)
+            page_size = min(max(int(request.GET.get("page_size") or 20), 1), 100)
+        except ValueError:
+            return JsonResponse({"success": False, "message": "Invalid numeric parameter"}, status=400)
+        sort = request.GET.get("sort") or "relevance"
+        if sort not in search_index.SORTS:
+            return JsonResponse({"success": False, "message": f"sort must be one of {', '.join(search_index.SORTS)}"}, status=400)
+
+        try:
+            started = time.perf_counter()
+            results, total, version = search_index.index.search(
+                q=request.GET.get("q", ""),
+                min_price=min_price, max_price=max_price,
+                min_area=min_area, max_area=max_area,
+                category=request.GET.get("category") or request.GET.get("type"),
+                sort=sort, page=page, page_size=page_size,
+            )
+            took_ms = round((time.perf_counter() - started) * 1000, 2)
+            stale = marketplace_snapshot.last_error is not None
+            etag = version_etag("search", marketplace_snapshot.epoch, version, stale, request.get_full_path())
+            response = conditional_response(request, etag)
+            if response is not None:
+                return response
+            return set_validators(JsonResponse({
+                "success": True,
+                "results": results,
+                "total": total,
+                "page": page,
+                "page_size": page_size,
+                "has_more": page * page_size < total,
+                "took_ms": took_ms,
+                **({"stale": True} if stale else {})
+            }), etag)
+
+        except BackendUnavailable as e:
+            logger.warning("Marketplace search unavailable: %s", e)
+            return JsonResponse({"success": False, "message": "Marketplace search is temporarily unavailable"}, status=503)
+        except Exception:
+            logger.exception("Error searching marketplace")
+            return JsonResponse({"success": False, "message": "Error searching marketplace"})
+
+@csrf_exempt
+def get_market_stats(request):
+    """
+    Price-per-area distributions of listed properties.
+    GET params: by (district, state, category; default district), state (only groups of
+    that state), min_count, outliers (1 to include the most outlying listings, up to 100).
+    """
+    if request.method == "GET":
+        by = request.GET.get("by") or "district"
+        if by not in market_stats.DIMENSIONS:
+            return JsonResponse({"success": False, "message": f"by must be one of {', '.join(market_stats.DIMENSIONS)}"}, status=400)
+        try:
+            min_count = max(int(request.GET.get("min_count") or 1), 1)
+        except ValueError:
+            return JsonResponse({"success": False, "message": "Invalid numeric parameter"}, status=400)
+
+        try:
+            groups, totals, version = market_stats.stats.summary(by=by, state=request.GET.get("state"), min_count=min_count)
+            stale = marketplace_snapshot.last_error is not None
+            etag = version_etag("market-stats", marketplace_snapshot.epoch, version, stale, request.get_full_path())
+            response = conditional_response(request, etag)
+            if response is not None:
+                return response
+            payload = {"success": True, "by": by, "groups": groups, **totals}
+            if request.GET.get("outliers") in ("1", "true"):
+                payload["outlier_listings"] = market_stats.stats.outliers(limit=100)
+            if stale:
+                payload["stale"] = True
+            return set_validators(JsonResponse(payload), etag)
+
+        except BackendUnavailable as e:
+            logger.warning("Market statistics unavailable: %s", e)
+            return JsonResponse({"success": False, "message": "Market statistics are temporarily unavailable"}, status=503)
+        except Exception:
+            logger.exception("Error computing market statistics")
+            return JsonResponse({"success": False, "message": "Error computing market statistics"}, status=500)
+
+@csrf_exempt
+def check_listing_price(request):
+    """
+    Check an asking price before listing, with the same rules as flag-property-for-sale.
+    GET params: property_id, price.
+    """
+    if request.method == "GET":
+        property_id = request.GET.get("property_id")
+        try:
+            price_num = float(request.GET.get("price"))
+        except (TypeError, ValueError):
+            return JsonResponse({"success": False, "message": "price must be a number"}, status=400)
+        if not property_id:
+            return JsonResponse({"success": False, "message": "property_id is required"}, status=400)
+
+        try:
+            prop = get_property_by_id(property_id)
+            if not prop:
+                return JsonResponse({"success": False, "message": "Property not found"}, status=404)
+            problem, max_val, price_check = _validate_price(prop, price_num)
             return JsonResponse({
                 "success": True,
-                "properties": marketplace_properties,
-                "count": len(marketplace_properties)
+                "property_id": property_id,
+                "price": price_num,
+                "valid": problem is None,
+                "message": problem,
+                "max_price": max_val,
+                "price_check": price_check,
             })
-            
-        except Exception as e:
-            print(f"Error fetching marketplace properties: {e}")
-            return JsonResponse({"success": False, "message": "Error fetching marketplace properties"})
+        except BackendUnavailable as e:
+            logger.warning("Price check unavailable: %s", e)
+            return JsonResponse({"success": False, "message": "Price check is temporarily unavailable"}, status=503)
+        except Exception:
+            logger.exception("Error checking listing price")
+            return JsonResponse({"success": False, "message": "Error checking listing price"}, status=500)
 
 @csrf_exempt
 def unlist_property(request):
@@ -235,23 +411,26 @@ def unlist_property(request):
         if not property_id:
             return JsonResponse({"success": False, "message": "property_id is required"}, status=400)
         try:
-            # Mark listing inactive in registered_for_sale DB
-            res = unlist_property_from_sale(property_id)
-            if isinstance(res, dict) and res.get("error"):
-                # If not found, still proceed to clear flags on property doc
-                pass
-            # Update original property document flags if exists
-            prop = get_property_by_id(property_id)
-            if prop:
-                prop["listed_for_sale"] = False
-                prop.pop("asking_price", None)
-                # Reset status if it was FOR_SALE
-                if (prop.get("status") or "").upper() == "FOR_SALE":
-                    prop["status"] = "OWNED"
-                update_property(prop)
-            return JsonResponse({"success": True, "message": "Property unlisted successfully"})
-        except Exception as e:
-            print(f"Error unlisting property: {e}")
+            with property_locks.hold(property_id, "unlist"):
+                # Mark listing inactive in registered_for_sale DB
+                res = unlist_property_from_sale(property_id)
+                if isinstance(res, dict) and res.get("error"):
+                    # If not found, still proceed to clear flags on property doc
+                    pass
+                # Update original property document flags if exists
+                prop = get_property_by_id(property_id)
+                if prop:
+                    prop["listed_for_sale"] = False
+                    prop.pop("asking_price", None)
+                    # Reset status if it was FOR_SALE
+                    if (prop.get("status") or "").upper() == "FOR_SALE":
+                        prop["status"] = "OWNED"
+                    update_property(prop)
+                return JsonResponse({"success": True, "message": "Property unlisted successfully"})
+        except PropertyBusy:
+            return _property_busy()
+        except Exception:
+            logger.exception("Error unlisting property")
             return JsonResponse({"success": False, "message": "Error unlisting property"}, status=500)
 
 @csrf_exempt
@@ -286,11 +465,11 @@ def dev_seed_data(request):
         try:
             insert_doc(db_name="app-users", doc=user_doc)
         except Exception as e:
-            print(f"Seed user insert error (app-users): {e}")
+            logger.warning("Seed user insert error (app-users): %s", e)
         try:
             insert_doc(db_name="govt-citizen", doc={"Aadhaar": aadhaar_val, "Email": email})
         except Exception as e:
-            print(f"Seed user insert error (govt-citizen): {e}")
+            logger.warning("Seed user insert error (govt-citizen): %s", e)
 
         # Seed property in property-details
         prop_doc = {
@@ -311,7 +490,7 @@ def dev_seed_data(request):
             ipfs_uri = upload_json_to_ipfs(prop_doc)
             
             # 2. Call Node.js API to Mint & Register to Seller
-            res = requests.post("http://localhost:4000/mint", json={
+            res = call_mint_service("/mint", {
                 "metadata_uri": ipfs_uri,
                 "seller_wallet": wallet,
                 "property_name": f"LandRecord_{property_id}"
@@ -322,17 +501,81 @@ def dev_seed_data(request):
                 prop_doc["mint_address"] = mint_address
                 prop_doc["ipfs_uri"] = ipfs_uri
             else:
-                print(f"Mint error: {res.text}")
+                logger.warning("Mint error: %s", res.text)
         except Exception as e:
-            print(f"Blockchain seed error: {e}")
+            logger.warning("Blockchain seed error: %s", e)
 
         try:
             insert_doc(db_name="property-details", doc=prop_doc)
         except Exception as e:
-            print(f"Seed property insert error: {e}")
+            logger.warning("Seed property insert error: %s", e)
 
         return JsonResponse({"success": True, "user": user_doc, "property": prop_doc})
 
+def _user_profile(email):
+    """Dashboard profile for email (None if unknown), with the owned-properties count."""
+    # app_users and govt_citizens are queried concurrently (app_users wins), and the
+    # Aadhaar fallback runs as soon as the user record is known to lack a wallet
+    def wallet_from(doc):
+        return doc and (
+            doc.get("wallet_adrdess")
+            or doc.get("wallet")
+            or doc.get("Wallet")
+            or doc.get("wallet_address")
+            or doc.get("walletAddress")
+        )
+
+    def app_user_by_aadhaar(app_doc, citizen_doc):
+        user_doc = app_doc or citizen_doc
+        if not user_doc or wallet_from(user_doc) or not user_doc.get("Aadhaar"):
+            return None
+        try:
+            return find_app_user_by_aadhaar(user_doc.get("Aadhaar"))
+        except Exception:
+            return None
+
+    def properties_count(app_doc, citizen_doc, aadhaar_doc):
+        wallet = wallet_from(app_doc or citizen_doc) or wallet_from(aadhaar_doc)
+        return count_properties_by_wallet(wallet) if wallet else 0
+
+    fan = FanOut("user_profile")
+    fan.add("app_doc", lambda: find_user_by_email(email, tables=("app_users",)))
+    fan.add("citizen_doc", lambda: find_user_by_email(email, tables=("govt_citizens",)))
+    fan.add("aadhaar_doc", app_user_by_aadhaar, deps=("app_doc", "citizen_doc"))
+    fan.add("properties_count", properties_count, deps=("app_doc", "citizen_doc", "aadhaar_doc"))
+    found = fan.run()
+
+    user_doc = found["app_doc"] or found["citizen_doc"]
+    if not user_doc:
+        return None
+    
+    # Schema uses 'wallet_adrdess' (as provided). Try common variants as fallback.
+    wallet_address = wallet_from(user_doc)
+    
+    # Map of possible fields to return on the dashboard (gracefully handle missing)
+    user_data = {
+        "email": user_doc.get("Email") or email,
+        "wallet_address": wallet_address,
+        "Name": user_doc.get("Name"),
+        "FatherName": user_doc.get("FatherName"),
+        "MotherName": user_doc.get("MotherName"),
+        "DoB": user_doc.get("DoB"),
+        "Gender": user_doc.get("Gender"),
+        "Age": user_doc.get("Age"),
+        "ContactNo": user_doc.get("ContactNo"),
+        "Address": user_doc.get("Address"),
+        "Aadhaar": user_doc.get("Aadhaar"),
+        "Pan": user_doc.get("Pan"),
+        "Nationality": user_doc.get("Nationality"),
+        "properties_count": 0,
+    }
+    
+    # If wallet not present on this doc, it was looked up in app-users by Aadhaar
+    if not wallet_address and found["aadhaar_doc"]:
+        user_data["wallet_address"] = wallet_from(found["aadhaar_doc"])
+    user_data["properties_count"] = found["properties_count"]
+    return user_data
+
 @csrf_exempt
 def get_user_profile(request):
     """
@@ -352,64 +595,27 @@ def get_user_profile(request):
             return JsonResponse({"success": False, "message": "Email is required"})
         
         try:
-            user_doc = find_user_by_email(email)
-            if not user_doc:
+            user_data = login_prefetch.cached(f"profile:{email}", lambda: _user_profile(email))
+            if not user_data:
                 return JsonResponse({"success": False, "message": "User not found"})
             
-            # Schema uses 'wallet_adrdess' (as provided). Try common variants as fallback.
-            wallet_address = (
-                user_doc.get("wallet_adrdess")
-                or user_doc.get("wallet")
-                or user_doc.get("Wallet")
-                or user_doc.get("wallet_address")
-                or user_doc.get("walletAddress")
-            )
-            
-            # Map of possible fields to return on the dashboard (gracefully handle missing)
-            user_data = {
-                "email": user_doc.get("Email") or email,
-                "wallet_address": wallet_address,
-                "Name": user_doc.get("Name"),
-                "FatherName": user_doc.get("FatherName"),
-                "MotherName": user_doc.get("MotherName"),
-                "DoB": user_doc.get("DoB"),
-                "Gender": user_doc.get("Gender"),
-                "Age": user_doc.get("Age"),
-                "ContactNo": user_doc.get("ContactNo"),
-                "Address": user_doc.get("Address"),
-                "Aadhaar": user_doc.get("Aadhaar"),
-                "Pan": user_doc.get("Pan"),
-                "Nationality": user_doc.get("Nationality"),
-                "properties_count": 0,
-            }
-            
-            # If wallet not present on this doc, try to find it from app-users using Aadhaar
-            if not wallet_address:
-                aad = user_doc.get("Aadhaar")
-                if aad:
-                    try:
-                        app_user = find_app_user_by_aadhaar(aad)
-                        if app_user:
-                            wallet_address = (
-                                app_user.get("wallet_adrdess")
-                                or app_user.get("wallet")
-                                or app_user.get("Wallet")
-                                or app_user.get("wallet_address")
-                                or app_user.get("walletAddress")
-                            )
-                            user_data["wallet_address"] = wallet_address
-                    except Exception as _:
-                        pass
-
-            if wallet_address:
-                properties = find_properties_by_wallet(wallet_address)
-                user_data["properties_count"] = len(properties)
-            
             return JsonResponse({
                 "success": True,
                 "user": user_data
             })
             
-        except Exception as e:
-            print(f"Error fetching user profile: {e}")
+        except Exception:
+            logger.exception("Error fetching user profile")
             return JsonResponse({"success": False, "message": "Error fetching user profile"})
+
+
+login_prefetch.register(
+    "profile", key=lambda email: f"profile:{email}", load=_user_profile,
+    tables=("app_users", "govt_citizens", "property_details"),
+)
+login_prefetch.register(
+    "properties",
+    key=lambda email, profile: f"properties:{profile['wallet_address']}" if profile and profile.get("wallet_address") else None,
+    load=lambda email, profile: find_properties_by_wallet(profile["wallet_address"]),
+    tables=("property_details",), deps=("profile",),
+)